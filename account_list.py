@@ -0,0 +1,352 @@
+"""
+account_list.py
+
+This module defines the AccountList class, a virtualized replacement for a CTkScrollableFrame of account
+buttons. It keeps a fixed pool of row buttons sized to the viewport and rebinds them to different accounts
+while scrolling, so the number of widgets and the time to draw them do not grow with the vault.
+
+Saved, renamed and deleted entries are applied to the list one at a time, without reloading it.
+A search box above the rows reports its text once typing pauses for const.SEARCH_DEBOUNCE_MS.
+The selected account can be moved with the Up and Down keys.
+
+Classes:
+    - AccountList: A customtkinter frame showing a scrollable, virtualized list of accounts.
+"""
+import bisect
+import sys
+import customtkinter as ctk
+import constants as const
+
+
+class AccountList(ctk.CTkFrame):
+    """
+    AccountList - A customtkinter frame with a recycled pool of account buttons.
+
+    Attributes:
+        - accounts (list): The loaded (entry_id, account_name) tuples, in display order.
+        - sort_keys (list): The (account_name, entry_id) sort key of every loaded account.
+        - loaded_until (tuple): Sort key of the last account fetched from the database, None before the first page.
+        - first_index (int): Index of the account shown by the first row button.
+        - selected_id (int): Entry ID of the selected account, None when nothing is selected.
+        - exhausted (bool): True once every account of the user has been loaded.
+        - rows (list): The pool of row buttons.
+
+    Methods:
+        - set_accounts(accounts, exhausted): Replaces the listed accounts.
+        - append_accounts(accounts, exhausted): Appends a page of accounts.
+        - insert_account(entry_id, account_name): Adds a single account at its sorted position.
+        - update_account(entry_id, account_name): Renames a single account and moves it into place.
+        - remove_account(entry_id): Removes a single account.
+        - clear(): Removes every account from the list.
+        - clear_search(): Empties the search box.
+        - select(index): Selects the account at the given index and reports it.
+        - move_selection(step): Selects the account above or below the selected one.
+        - neighbours(entry_id, count): Returns the entry IDs listed around an account.
+        - scroll_to(index): Shows the accounts starting at the given index.
+        - render(): Rebinds the row buttons to the accounts currently in view.
+
+    Usage:
+        The command callback receives the entry ID of a clicked or keyboard selected row, load_more is
+        called when the view reaches the end of the loaded accounts and on_search receives the debounced
+        text of the search box.
+    """
+    def __init__(self, master, command, load_more, on_search, label_text="Accounts"):
+        ctk.CTkFrame.__init__(self, master)
+        self.command = command
+        self.load_more = load_more
+        self.on_search = on_search
+        self.pending_search = None
+        # Navigation and modifier keys also fire <KeyRelease>, only a changed text is reported
+        self.last_query = ""
+
+        self.accounts = []
+        self.sort_keys = []
+        self.loaded_until = None
+        self.first_index = 0
+        self.selected_id = None
+        self.selected_index = 0
+        self.exhausted = True
+        self.rows = []
+
+        self.label = ctk.CTkLabel(self, text=label_text)
+        self.label.grid(row=0, column=0, columnspan=2, padx=10, pady=(5, 5), sticky="ew")
+
+        self.search_entry = ctk.CTkEntry(self, placeholder_text="Search")
+        self.search_entry.grid(row=1, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="ew")
+        self.search_entry.bind("<KeyRelease>", self.on_search_key)
+
+        self.rows_frame = ctk.CTkFrame(self, fg_color="transparent",
+                                       height=const.ACCOUNT_LIST_ROWS * const.ACCOUNT_ROW_HEIGHT)
+        self.rows_frame.grid(row=2, column=0, sticky="nsew")
+        self.rows_frame.grid_propagate(False)
+        self.grid_rowconfigure(2, weight=1)
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.grid(row=2, column=1, sticky="ns")
+
+        self.resize_pool(const.ACCOUNT_LIST_ROWS)
+        self.rows_frame.bind("<Configure>", self.on_configure)
+        # Clicking a row focuses the rows frame, the search box hands the arrow keys to the results
+        for widget in (self.rows_frame, self.search_entry):
+            widget.bind("<Up>", lambda event: self.move_selection(-1))
+            widget.bind("<Down>", lambda event: self.move_selection(1))
+        for widget in (self.rows_frame, self.scrollbar):
+            self.bind_mouse_wheel(widget)
+
+    def bind_mouse_wheel(self, widget):
+        """
+        Scrolls the list with the mouse wheel over the given widget.
+        """
+        if sys.platform.startswith("linux"):
+            widget.bind("<Button-4>", lambda event: self.scroll_to(self.first_index - 1))
+            widget.bind("<Button-5>", lambda event: self.scroll_to(self.first_index + 1))
+        else:
+            widget.bind("<MouseWheel>", self.on_mouse_wheel)
+
+    def on_mouse_wheel(self, event):
+        """
+        Scrolls one row per wheel notch, Windows reports 120 per notch.
+        """
+        step = event.delta // 120 if sys.platform.startswith("win") else event.delta
+        self.scroll_to(self.first_index - (1 if step > 0 else -1))
+
+    def on_search_key(self, event):
+        """
+        Restarts the debounce timer of the search box on every keystroke.
+        """
+        if self.pending_search is not None:
+            self.after_cancel(self.pending_search)
+        self.pending_search = self.after(const.SEARCH_DEBOUNCE_MS, self.run_search)
+
+    def run_search(self):
+        """
+        Reports the text of the search box once typing has paused, unless it is the text reported last.
+        """
+        self.pending_search = None
+        query = self.search_entry.get().strip()
+        if query == self.last_query:
+            return
+        self.last_query = query
+        self.on_search(query)
+
+    def clear_search(self):
+        """
+        Empties the search box without reporting a search.
+        """
+        if self.pending_search is not None:
+            self.after_cancel(self.pending_search)
+            self.pending_search = None
+        self.last_query = ""
+        self.search_entry.delete(0, ctk.END)
+
+    def on_configure(self, event):
+        """
+        Sizes the pool of row buttons to the height of the viewport.
+        """
+        self.resize_pool(max(1, event.height // const.ACCOUNT_ROW_HEIGHT))
+
+    def resize_pool(self, row_count):
+        """
+        Grows or shrinks the pool of row buttons to the given number of rows.
+
+        Parameters:
+            - row_count: The number of rows that fit into the viewport.
+        """
+        while len(self.rows) < row_count:
+            slot = len(self.rows)
+            button = ctk.CTkButton(master=self.rows_frame, text="",
+                                   command=lambda slot=slot: self.on_row_command(slot))
+            # The callback looks up the account of the slot when it fires, so it never needs rebinding
+            self.bind_mouse_wheel(button)
+            self.rows.append(button)
+        while len(self.rows) > row_count:
+            self.rows.pop().destroy()
+        self.render()
+
+    def account_at(self, slot):
+        """
+        Returns the (entry_id, account_name) shown by a row slot, None for an empty row.
+        """
+        index = self.first_index + slot
+        return self.accounts[index] if index < len(self.accounts) else None
+
+    def on_row_command(self, slot):
+        if self.account_at(slot) is not None:
+            self.rows_frame.focus_set()
+            self.select(self.first_index + slot)
+
+    def select(self, index):
+        """
+        Selects the account at the given index, scrolls it into view and reports its entry ID.
+
+        Parameters:
+            - index: Index of the account in the loaded accounts.
+        """
+        if not self.accounts:
+            return
+        index = max(0, min(index, len(self.accounts) - 1))
+        self.selected_index = index
+        self.selected_id = self.accounts[index][0]
+        if index < self.first_index:
+            self.scroll_to(index)
+        elif index >= self.first_index + len(self.rows):
+            self.scroll_to(index - len(self.rows) + 1)
+        else:
+            self.render()
+        self.command(self.selected_id)
+
+    def index_of(self, entry_id):
+        """
+        Returns the index of an account in the loaded accounts, None if it is not loaded.
+        """
+        if self.selected_index < len(self.accounts) and self.accounts[self.selected_index][0] == entry_id:
+            return self.selected_index
+        for index, account in enumerate(self.accounts):
+            if account[0] == entry_id:
+                return index
+        return None
+
+    def move_selection(self, step):
+        """
+        Selects the account step rows below the selected one, or the first account if nothing is selected.
+
+        Returns:
+            str: "break", so the key event is not handled further.
+        """
+        index = None if self.selected_id is None else self.index_of(self.selected_id)
+        self.select(0 if index is None else index + step)
+        return "break"
+
+    def neighbours(self, entry_id, count):
+        """
+        Returns the entry IDs of the accounts listed closest to an account, nearest first.
+
+        Parameters:
+            - entry_id: The database ID of the account.
+            - count: Number of accounts taken above and below it.
+        """
+        index = self.index_of(entry_id)
+        if index is None:
+            return []
+        neighbours = []
+        for distance in range(1, count + 1):
+            for neighbour in (index + distance, index - distance):
+                if 0 <= neighbour < len(self.accounts):
+                    neighbours.append(self.accounts[neighbour][0])
+        return neighbours
+
+    def on_scrollbar(self, action, value, units=None):
+        """
+        Handles the CTkScrollbar command, a "moveto" fraction or a "scroll" by rows.
+        """
+        if action == "moveto":
+            self.scroll_to(round(float(value) * len(self.accounts)))
+        else:
+            self.scroll_to(self.first_index + (1 if int(value) > 0 else -1))
+
+    def scroll_to(self, index):
+        """
+        Shows the accounts starting at the given index, loading more accounts near the end of the list.
+
+        Parameters:
+            - index: Index of the account to show in the first row.
+        """
+        self.first_index = max(0, min(index, len(self.accounts) - len(self.rows)))
+        if not self.exhausted and self.first_index + 2 * len(self.rows) >= len(self.accounts):
+            self.load_more()
+        self.render()
+
+    def render(self):
+        """
+        Rebinds the row buttons to the accounts in view and updates the scrollbar.
+        """
+        for slot, button in enumerate(self.rows):
+            account = self.account_at(slot)
+            if account is None:
+                button.grid_remove()
+            else:
+                button.configure(text=account[1], border_width=2 if account[0] == self.selected_id else 0)
+                button.grid(row=slot, column=0, padx=10, pady=(0, 20))
+
+        total = max(len(self.accounts), 1)
+        self.scrollbar.set(self.first_index / total, min(1.0, (self.first_index + len(self.rows)) / total))
+
+    def set_accounts(self, accounts, exhausted):
+        """
+        Replaces the listed accounts and scrolls back to the top.
+
+        Parameters:
+            - accounts: List of (entry_id, account_name) tuples.
+            - exhausted: True if no further accounts can be loaded.
+        """
+        self.accounts = list(accounts)
+        self.sort_keys = [(account_name, entry_id) for entry_id, account_name in self.accounts]
+        self.loaded_until = self.sort_keys[-1] if self.sort_keys else None
+        self.exhausted = exhausted
+        self.first_index = 0
+        self.scroll_to(0)
+
+    def append_accounts(self, accounts, exhausted):
+        """
+        Appends a page of accounts to the end of the list.
+
+        Parameters:
+            - accounts: List of (entry_id, account_name) tuples.
+            - exhausted: True if no further accounts can be loaded.
+        """
+        self.accounts.extend(accounts)
+        self.sort_keys.extend((account_name, entry_id) for entry_id, account_name in accounts)
+        if accounts:
+            self.loaded_until = self.sort_keys[-1]
+        self.exhausted = exhausted
+        self.render()
+
+    def insert_account(self, entry_id, account_name):
+        """
+        Adds a single account at its sorted position. An account sorting after the last loaded page
+        is left to be loaded with a later page.
+
+        Parameters:
+            - entry_id: The database ID of the new entry.
+            - account_name: The name of the new entry.
+        """
+        sort_key = (account_name, entry_id)
+        if not self.exhausted and self.loaded_until is not None and sort_key > self.loaded_until:
+            return
+
+        index = bisect.bisect_left(self.sort_keys, sort_key)
+        self.sort_keys.insert(index, sort_key)
+        self.accounts.insert(index, (entry_id, account_name))
+        self.render()
+
+    def update_account(self, entry_id, account_name):
+        """
+        Renames a single account and moves it to its new sorted position.
+
+        Parameters:
+            - entry_id: The database ID of the updated entry.
+            - account_name: The new name of the entry.
+        """
+        self.remove_account(entry_id)
+        self.insert_account(entry_id, account_name)
+
+    def remove_account(self, entry_id):
+        """
+        Removes a single account from the list.
+
+        Parameters:
+            - entry_id: The database ID of the deleted entry.
+        """
+        for index, account in enumerate(self.accounts):
+            if account[0] == entry_id:
+                del self.accounts[index]
+                del self.sort_keys[index]
+                break
+        self.first_index = max(0, min(self.first_index, len(self.accounts) - len(self.rows)))
+        self.render()
+
+    def clear(self):
+        """
+        Removes every account from the list.
+        """
+        self.set_accounts([], True)
@@ -0,0 +1,234 @@
+"""
+async_database.py
+
+This module defines the AsyncDataBase class, an asyncio facade over the DataBase class. Every public DataBase
+method has an awaitable counterpart with the same name and arguments, so a headless service can issue many
+database operations from one event loop without blocking it.
+
+Writes are put on a bounded queue and run one at a time by a dedicated SQLite writer thread, in the order they
+were submitted. Reads run concurrently on a small pool of reader threads, which WAL mode allows while a write
+is in progress. Each operation borrows its own connection from the shared ConnectionPool.
+
+Classes:
+    - AsyncDataBase: Awaitable versions of every DataBase method.
+
+Module Constants:
+    - READ_METHODS: The DataBase methods that only read, every other public method is treated as a write.
+
+Usage:
+    async with AsyncDataBase() as db:
+        user = await db.login_check("alice")
+        await db.storage_update_user_data(data)
+"""
+import asyncio
+import inspect
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import constants as const
+from database import DataBase
+
+logging.basicConfig(level=logging.INFO, filename=const.LOGGING_PATH,
+                    format="%(asctime)s -  %(levelname)s - Module: %(module)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+READ_METHODS = frozenset({
+    "effective_pragmas",
+    "register_check_username",
+    "register_existing_usernames",
+    "login_check",
+    "login_retrieve_encryption_key",
+    "storage_retrieve_encryption_key",
+    "storage_create_account_buttons",
+    "storage_fetch_account_page",
+    "storage_iter_account_pages",
+    "storage_fetch_search_fields",
+    "search_entries",
+    "storage_fetch_user_data",
+    "storage_fetch_legacy_entries",
+    "storage_fetch_details",
+    "storage_data_version",
+    "storage_changes_since",
+})
+
+# Put on the write queue to stop the writer thread
+_STOP = object()
+
+
+def _run(method_name, args, kwargs):
+    """
+    Runs a DataBase method on a borrowed connection, generator methods are consumed into a list.
+    """
+    with DataBase() as db:
+        result = getattr(db, method_name)(*args, **kwargs)
+        if inspect.isgenerator(result):
+            result = list(result)
+        return result
+
+
+def _resolve(future, result, error, slots=None):
+    """
+    Completes an asyncio future on its event loop, unless the caller has stopped waiting for it, and frees
+    the queue slot of the operation.
+    """
+    if slots is not None:
+        slots.release()
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class AsyncDataBase:
+    """
+    Awaitable versions of every DataBase method, reads run concurrently and writes are serialized.
+
+    Attributes:
+        readers (int): Number of reader threads.
+        queue_size (int): Maximum number of pending writes, and of pending reads.
+        closed (bool): True once close() was called.
+
+    Methods:
+        <every public DataBase method>: Awaitable, takes the same arguments and returns the same value.
+        stats(): Returns the number of pending and completed operations.
+        close(): Waits for the pending writes and stops the worker threads.
+    """
+    def __init__(self, readers=const.ASYNC_DB_READERS, queue_size=const.ASYNC_DB_QUEUE_SIZE):
+        """
+        Initializes the facade, the worker threads are started on first use.
+        """
+        self.readers = readers
+        self.queue_size = queue_size
+        self.reads = 0
+        self.writes = 0
+        self._read_executor = None
+        self._writer = None
+        self._write_queue = queue.Queue(maxsize=queue_size)
+        self._read_slots = None
+        self._write_slots = None
+        self._lock = threading.Lock()
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _start(self):
+        """
+        Starts the reader pool and the writer thread.
+        """
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("The AsyncDataBase has been closed.")
+            if self._writer is None:
+                self._read_executor = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="sqlite-reader")
+                self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+                self._writer.start()
+                # The slots bound the pending operations, so a burst waits here instead of growing the queue
+                self._read_slots = asyncio.Semaphore(self.queue_size)
+                self._write_slots = asyncio.Semaphore(self.queue_size)
+
+    def _write_loop(self):
+        """
+        Runs the queued writes one at a time, in submission order, until the stop marker is queued.
+        """
+        while True:
+            item = self._write_queue.get()
+            if item is _STOP:
+                return
+            method_name, args, kwargs, future, loop, slots = item
+            result, error = None, None
+            try:
+                result = _run(method_name, args, kwargs)
+            except Exception as e:
+                error = e
+            try:
+                loop.call_soon_threadsafe(_resolve, future, result, error, slots)
+            except RuntimeError:
+                # The event loop of the caller was closed before the write finished
+                logger.error(f"Result of {method_name} dropped, its event loop is closed.")
+
+    async def _read(self, method_name, args, kwargs):
+        """
+        Runs a read on the reader pool.
+        """
+        self._start()
+        async with self._read_slots:
+            self.reads += 1
+            return await asyncio.wrap_future(self._read_executor.submit(_run, method_name, args, kwargs))
+
+    async def _write(self, method_name, args, kwargs):
+        """
+        Queues a write for the writer thread and waits for its result.
+        """
+        self._start()
+        # The slot is freed by the writer once the write ran, a cancelled caller does not free it early
+        await self._write_slots.acquire()
+        if self.closed:
+            # The stop marker may already be queued, a write behind it would never run
+            self._write_slots.release()
+            raise RuntimeError("The AsyncDataBase has been closed.")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Never blocks, there are as many slots as places in the queue
+        self._write_queue.put_nowait((method_name, args, kwargs, future, loop, self._write_slots))
+        self.writes += 1
+        return await future
+
+    def stats(self):
+        """
+        Returns the operation counters.
+
+        Returns:
+            dict: The number of reads and writes submitted, and of writes still queued.
+        """
+        return {"reads": self.reads, "writes": self.writes, "queued_writes": self._write_queue.qsize()}
+
+    async def close(self):
+        """
+        Waits for the queued writes to finish and stops the worker threads.
+        """
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            writer, read_executor = self._writer, self._read_executor
+
+        if writer is not None:
+            # A full queue would block the event loop until the writer frees a place, so every wait runs off it
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write_queue.put, _STOP)
+            await loop.run_in_executor(None, writer.join)
+            await loop.run_in_executor(None, read_executor.shutdown, True)
+        logger.info(f"AsyncDataBase closed with stats: {self.stats()}")
+
+
+def _mirror(method_name):
+    """
+    Returns the awaitable counterpart of a DataBase method.
+    """
+    method = getattr(DataBase, method_name)
+    kind = "_read" if method_name in READ_METHODS else "_write"
+
+    async def mirrored(self, *args, **kwargs):
+        return await getattr(self, kind)(method_name, args, kwargs)
+
+    mirrored.__name__ = method_name
+    mirrored.__qualname__ = f"AsyncDataBase.{method_name}"
+    mirrored.__doc__ = method.__doc__
+    return mirrored
+
+
+# Not database operations: the setup runs once per connection, and a transaction spans several calls on one
+# connection, which the facade does not keep between operations
+_NOT_MIRRORED = frozenset({"setup_database", "transaction"})
+
+# Unknown methods are serialized with the writes, which is always safe
+for _name, _method in vars(DataBase).items():
+    if not _name.startswith("_") and callable(_method) and _name not in _NOT_MIRRORED:
+        setattr(AsyncDataBase, _name, _mirror(_name))
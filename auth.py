@@ -0,0 +1,244 @@
+"""
+auth.py
+
+This module holds the authentication and registration logic of the password manager, separated from the GUI
+so it can be used by scripts as well as by the Login and Register frames.
+
+bcrypt is deliberately slow, so the AuthService runs the checks on a worker thread and hands back a
+concurrent.futures.Future. A request identical to one that is still running is coalesced into the
+future that is already in flight.
+
+The bcrypt cost is calibrated once per process so a hash takes about const.BCRYPT_TARGET_SECONDS on
+this host. A user whose stored cost is below it, or more than const.BCRYPT_COST_TOLERANCE steps above it,
+is rehashed after a successful login.
+
+Classes:
+    - AuthResult: The outcome of an authentication.
+    - AuthService: Runs authentication and registration on a worker thread.
+
+Functions:
+    - calibrate_cost(target_seconds): Measures bcrypt and returns the cost matching a target hash time.
+    - target_cost(): Returns the calibrated cost of this process.
+    - authenticate(username, password): Checks a user's credentials.
+    - register(username, password): Registers a new user.
+
+Module Variables:
+    - auth_service: The AuthService shared by the GUI frames.
+"""
+import bcrypt
+import logging
+import secrets
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import constants as const
+from database import DataBase
+
+logging.basicConfig(level=logging.INFO, filename=const.LOGGING_PATH,
+                    format="%(asctime)s -  %(levelname)s - Module: %(module)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Possible values of AuthResult.status and of the status returned by register()
+AUTH_OK = "ok"
+AUTH_INVALID_USERNAME = "invalid_username"
+AUTH_INVALID_PASSWORD = "invalid_password"
+REGISTER_OK = "ok"
+REGISTER_USERNAME_EXISTS = "username_exists"
+
+# user_id and encryption_key are None unless status is AUTH_OK
+AuthResult = namedtuple("AuthResult", ["status", "user_id", "encryption_key"])
+
+
+_target_cost = None
+_target_cost_lock = threading.Lock()
+
+
+def calibrate_cost(target_seconds=const.BCRYPT_TARGET_SECONDS):
+    """
+    Measures bcrypt on this host and returns the highest cost whose hash time stays within the target.
+
+    The hash time doubles with every cost increment, so it is measured once at a cheap cost and
+    extrapolated instead of hashing at every candidate cost.
+
+    Parameters:
+        target_seconds (float): The wanted duration of a single hash.
+
+    Returns:
+        int: A cost between const.BCRYPT_MIN_COST and const.BCRYPT_MAX_COST.
+    """
+    sample_cost = const.BCRYPT_CALIBRATION_COST
+    sample_seconds = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(sample_cost))
+        sample_seconds = min(sample_seconds, time.perf_counter() - start)
+
+    cost = const.BCRYPT_MIN_COST
+    while (cost < const.BCRYPT_MAX_COST
+           and sample_seconds * 2 ** (cost + 1 - sample_cost) <= target_seconds):
+        cost += 1
+
+    estimated_seconds = sample_seconds * 2 ** (cost - sample_cost)
+    logger.info(f"bcrypt calibrated: cost {sample_cost} took {sample_seconds * 1000:.1f}ms, "
+                f"picked cost {cost} (~{estimated_seconds * 1000:.0f}ms, target {target_seconds * 1000:.0f}ms)")
+    return cost
+
+
+def target_cost():
+    """
+    Returns the bcrypt cost of this process, calibrating it on first use.
+
+    Returns:
+        int: The bcrypt cost new hashes are created with.
+    """
+    global _target_cost
+    with _target_cost_lock:
+        if _target_cost is None:
+            _target_cost = calibrate_cost()
+        return _target_cost
+
+
+def authenticate(username, password):
+    """
+    Checks a user's credentials against the stored bcrypt hash, and rehashes the password when it was
+    hashed with a cost below the calibrated one, or too far above it.
+
+    Parameters:
+        username (str): The username to authenticate.
+        password (str): The plaintext password.
+
+    Returns:
+        AuthResult: The status, and the user's ID and encryption key when the credentials are valid.
+    """
+    with DataBase() as db:
+        result = db.login_check(username)
+    if not result:
+        return AuthResult(AUTH_INVALID_USERNAME, None, None)
+
+    user_id, hashed_password, stored_cost = result
+    start = time.perf_counter()
+    password_matches = bcrypt.checkpw(password.encode("utf-8"), hashed_password)
+    logger.info(f"bcrypt check of user {user_id} at cost {stored_cost} took "
+                f"{(time.perf_counter() - start) * 1000:.0f}ms")
+    if not password_matches:
+        return AuthResult(AUTH_INVALID_PASSWORD, None, None)
+
+    cost = target_cost()
+    if stored_cost is None or stored_cost < cost or stored_cost > cost + const.BCRYPT_COST_TOLERANCE:
+        start = time.perf_counter()
+        rehashed_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(cost))
+        with DataBase() as db:
+            db.login_update_password_hash(user_id, rehashed_password, cost)
+        logger.info(f"Password of user {user_id} rehashed from cost {stored_cost} to {cost} in "
+                    f"{(time.perf_counter() - start) * 1000:.0f}ms")
+
+    with DataBase() as db:
+        encryption_key = db.storage_retrieve_encryption_key(user_id)[0]
+    return AuthResult(AUTH_OK, user_id, encryption_key)
+
+
+def register(username, password):
+    """
+    Registers a new user with a password hashed at the calibrated bcrypt cost and a fresh encryption key.
+
+    Parameters:
+        username (str): The username of the new user.
+        password (str): The plaintext password of the new user.
+
+    Returns:
+        str: REGISTER_OK, or REGISTER_USERNAME_EXISTS if the username is already taken.
+    """
+    with DataBase() as db:
+        if db.register_check_username(username):
+            return REGISTER_USERNAME_EXISTS
+
+    cost = target_cost()
+    hashed_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(cost))
+    encryption_key = secrets.token_bytes(32)
+
+    with DataBase() as db:
+        # The username may have been taken while the password was hashed
+        if db.register_check_username(username):
+            return REGISTER_USERNAME_EXISTS
+        db.register_user(username, hashed_password, encryption_key, cost)
+
+    logger.info(f"A new user: {username} has signed up.")
+    return REGISTER_OK
+
+
+class AuthService:
+    """
+    Runs authentication and registration on a worker thread.
+
+    Attributes:
+        max_workers (int): Number of worker threads hashing passwords.
+
+    Methods:
+        authenticate_async(username, password): Returns a Future resolving to an AuthResult.
+        register_async(username, password): Returns a Future resolving to a registration status.
+        shutdown(): Stops the worker threads.
+    """
+    def __init__(self, max_workers=const.AUTH_WORKERS):
+        """
+        Initializes the service, the worker threads are started on first use.
+        """
+        self.max_workers = max_workers
+        self._executor = None
+        self._in_flight = {}
+        # Reentrant, a job that is already done runs its done callback inside _submit
+        self._lock = threading.RLock()
+
+    def _submit(self, key, function, *args):
+        """
+        Submits a job, or returns the future of an identical job that is still running.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None and not future.done():
+                return future
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="auth")
+            future = self._executor.submit(function, *args)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+            return future
+
+    def _forget(self, key, future):
+        """
+        Drops a finished job from the in flight jobs.
+        """
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def authenticate_async(self, username, password):
+        """
+        Authenticates a user on a worker thread.
+
+        Returns:
+            concurrent.futures.Future: Resolves to an AuthResult.
+        """
+        return self._submit(("authenticate", username, password), authenticate, username, password)
+
+    def register_async(self, username, password):
+        """
+        Registers a user on a worker thread.
+
+        Returns:
+            concurrent.futures.Future: Resolves to REGISTER_OK or REGISTER_USERNAME_EXISTS.
+        """
+        return self._submit(("register", username), register, username, password)
+
+    def shutdown(self):
+        """
+        Stops the worker threads, running jobs are allowed to finish.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+auth_service = AuthService()
@@ -2,6 +2,7 @@
 This module holds all the constants used inside the project
 """
 
+import os
 import pathlib
 
 ROOT = pathlib.Path(__file__).parent
@@ -14,11 +15,191 @@ DATABASE_NAME = "DataBase.db"
 DATABASE_FOLDER = ROOT / "database"
 DATABASE_PATH = DATABASE_FOLDER / DATABASE_NAME
 
+# Connections kept idle in the session pool, and the age (seconds) after
+# which an idle connection is closed instead of being handed out again
+POOL_SIZE = 4
+POOL_MAX_CONNECTION_AGE = 30 * 60
+
+# Rows written per executemany call by the batch insert/update methods
+BATCH_CHUNK_SIZE = 500
+
+# Accounts fetched per keyset page when listing a user's entries
+ACCOUNT_PAGE_SIZE = 50
+
+# Row buttons of the virtualized account list before it is sized to its
+# viewport, and the height (px) of one row including its padding
+ACCOUNT_LIST_ROWS = 10
+ACCOUNT_ROW_HEIGHT = 48
+
+# Delay (ms) after the last keystroke before the account search runs, and the
+# maximum number of accounts a search returns
+SEARCH_DEBOUNCE_MS = 150
+SEARCH_RESULT_LIMIT = 200
+
+# Decrypted entry details kept in memory, their lifetime (seconds), and the
+# number of entries above and below the shown one prefetched in the background
+DETAIL_CACHE_SIZE = 32
+DETAIL_CACHE_TTL = 60
+DETAIL_PREFETCH_NEIGHBORS = 2
+
+# Seconds a statement waits for a lock held by another connection or process
+# before SQLite raises "database is locked" (the busy timeout)
+DATABASE_BUSY_TIMEOUT = 5.0
+
+# A DataBase method, or the BEGIN of a transaction, that still finds the
+# database locked after the busy timeout is retried up to DATABASE_LOCK_RETRIES
+# times. The delay (seconds) starts at DATABASE_LOCK_RETRY_DELAY, doubles after
+# every attempt up to DATABASE_LOCK_RETRY_MAX_DELAY, and is jittered so
+# processes waiting on the same lock do not retry in lockstep
+DATABASE_LOCK_RETRIES = 3
+DATABASE_LOCK_RETRY_DELAY = 0.05
+DATABASE_LOCK_RETRY_MAX_DELAY = 1.0
+
+# Showing the Storage frame again applies only the entries changed since the
+# account list was loaded, more changes than this reload the list instead
+CHANGES_RELOAD_THRESHOLD = 200
+
+# Write-behind mode for entry saves and deletes (see write_behind.py). When
+# enabled, a save waits in memory for at most WRITE_BEHIND_FLUSH_INTERVAL
+# seconds, or until WRITE_BEHIND_MAX_PENDING entries are buffered, before it is
+# written. A crash loses at most that window, log out and exit flush it
+WRITE_BEHIND_ENABLED = False
+WRITE_BEHIND_FLUSH_INTERVAL = 2.0
+WRITE_BEHIND_MAX_PENDING = 50
+
+# Reader threads of AsyncDataBase, and the number of pending reads and pending
+# writes each allowed before awaiting callers are held back
+ASYNC_DB_READERS = 4
+ASYNC_DB_QUEUE_SIZE = 256
+
+# ================================
+#   SQLite Performance Profiles
+# ================================
+
+# Every profile runs in WAL mode. The WAL is checkpointed automatically once it
+# holds `wal_autocheckpoint` pages and truncated when the pool is closed.
+# mmap_size and cache_size follow the database file size, bounded by the
+# min_/max_ values (bytes) of the active profile.
+SQLITE_PROFILE = "balanced"
+SQLITE_PROFILES = {
+    # Survives power loss, every commit is synced to disk
+    "safe": {
+        "synchronous": "FULL",
+        "wal_autocheckpoint": 1000,
+        "min_cache_size": 2 * 1024 * 1024,
+        "max_cache_size": 8 * 1024 * 1024,
+        "max_mmap_size": 0,
+    },
+    # Survives application crashes, a power loss may drop the last commits
+    "balanced": {
+        "synchronous": "NORMAL",
+        "wal_autocheckpoint": 1000,
+        "min_cache_size": 2 * 1024 * 1024,
+        "max_cache_size": 32 * 1024 * 1024,
+        "max_mmap_size": 64 * 1024 * 1024,
+    },
+    # Leaves syncing to the operating system, for bulk imports and benchmarks
+    "fast": {
+        "synchronous": "OFF",
+        "wal_autocheckpoint": 4000,
+        "min_cache_size": 8 * 1024 * 1024,
+        "max_cache_size": 128 * 1024 * 1024,
+        "max_mmap_size": 256 * 1024 * 1024,
+    },
+}
+
 # ================================
 #   Logging Variables
 # ================================
 LOGGING_PATH = ROOT / "log.log"
 
+# ================================
+#   Session Settings
+# ================================
+
+# Seconds without activity after which a cached encryption key is zeroized
+SESSION_IDLE_TIMEOUT = 5 * 60
+
+# ================================
+#   Authentication Settings
+# ================================
+
+# Worker threads running bcrypt
+AUTH_WORKERS = 2
+
+# bcrypt work factor: calibrated once per process to the highest cost that hashes
+# within the target login latency (seconds), bounded by the min/max costs.
+# Stored hashes below the cost are rehashed after a successful login, hashes above
+# it only when they exceed it by more than the tolerance, so calibration noise of
+# one cost step does not rehash every login.
+BCRYPT_TARGET_SECONDS = 0.25
+BCRYPT_MIN_COST = 10
+BCRYPT_MAX_COST = 16
+BCRYPT_CALIBRATION_COST = 8
+BCRYPT_COST_TOLERANCE = 1
+
+# ================================
+#   Scheduler Settings
+# ================================
+
+# Worker threads running background work for the frames, how often (ms) their
+# results are delivered on the Tk thread, and the time (ms) from submission to
+# delivery above which a task is logged as slow
+SCHEDULER_WORKERS = 4
+SCHEDULER_POLL_INTERVAL_MS = 15
+SCHEDULER_SLOW_TASK_MS = 250
+
+# ================================
+#   Vault Daemon Settings
+# ================================
+
+# Unix socket of the headless vault service (see vault_daemon.py), created with
+# owner only permissions
+VAULT_DAEMON_SOCKET = DATABASE_FOLDER / "vault.sock"
+
+# Worker threads encrypting and decrypting for the daemon, requests a client may
+# pipeline before the daemon stops reading its connection, and the maximum size
+# (bytes) of one request line
+VAULT_DAEMON_WORKERS = 4
+VAULT_DAEMON_MAX_IN_FLIGHT = 32
+VAULT_DAEMON_MAX_REQUEST_BYTES = 64 * 1024
+
+# ================================
+#   Unlock Agent Settings
+# ================================
+
+# Socket of the unlock agent (see unlock_agent.py), inside a directory only the
+# owner may enter. Clients use the path in the environment variable when it is
+# set, like SSH_AUTH_SOCK for ssh-agent
+UNLOCK_AGENT_SOCKET_ENV = "PASSWORD_MANAGER_AGENT_SOCK"
+UNLOCK_AGENT_SOCKET = (pathlib.Path(os.environ.get("XDG_RUNTIME_DIR") or "/tmp")
+                       / f"password-manager-agent-{os.environ.get('USER', 'user')}" / "agent.sock")
+
+# Seconds an unlocked key is kept (a client may ask for less, or more up to the
+# maximum), and seconds without requests after which every key is zeroized
+UNLOCK_AGENT_KEY_TTL = 15 * 60
+UNLOCK_AGENT_MAX_KEY_TTL = 8 * 60 * 60
+UNLOCK_AGENT_IDLE_LOCK = 5 * 60
+
+# ================================
+#   Encryption Settings
+# ================================
+
+# Pool used by EncryptionManager.encrypt_many/decrypt_many: "thread" or "process",
+# the number of workers and the number of items handed to a worker at once.
+# pycryptodome runs most of each item as Python under the GIL, so only the
+# process pool can scale. Batches below the minimum run inline, where starting
+# the chunks costs more than the pool saves.
+CRYPTO_EXECUTOR = "process"
+CRYPTO_WORKERS = os.cpu_count() or 1
+CRYPTO_CHUNK_SIZE = 256
+CRYPTO_PARALLEL_MIN_ITEMS = 4096
+
+# Legacy CBC entries re-encrypted to GCM per background transaction, and the
+# pause (seconds) between two transactions so the UI is never starved
+FORMAT_MIGRATION_CHUNK_SIZE = 200
+FORMAT_MIGRATION_PAUSE = 0.05
+
 # ================================
 #   Window Settings
 # ================================
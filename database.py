@@ -4,9 +4,30 @@ database.py
 This module defines a Database class for managing SQLite databases. It includes methods for setting up the database,
 managing connections within a context, and logging relevant information.
 
+Connections are borrowed from a session-scoped ConnectionPool, so the database setup runs once per process
+and every `with DataBase() as db:` block reuses an already open connection.
+
+A `with DataBase() as db:` block commits when it ends and rolls back when it raises. Inside it,
+`with db.transaction():` groups several operations into one atomic commit, a nested transaction() becomes a
+savepoint that can fail and roll back on its own. The transaction counters are returned by transaction_stats().
+
+Several processes may use the same database file. A statement waits up to const.DATABASE_BUSY_TIMEOUT seconds
+for a lock held by another connection, and a DataBase method that still finds the database locked is retried
+with a jittered backoff, unless it ran inside a transaction that has to be rolled back as a whole. A method
+that opens its own immediate transaction is retried at its BEGIN only, counted under "transaction". The lock
+waits and retries of every method are returned by lock_stats().
+
 Classes:
+    - ConnectionPool: Hands out reusable SQLite connections and keeps hit/miss and age statistics.
     - DataBase: Represents a SQLite database and provides methods for database management.
 
+Functions:
+    - get_pool(): Returns the process wide ConnectionPool, setting up the database on first use.
+    - close_pool(): Closes every pooled connection.
+    - transaction_stats(): Returns the process wide transaction counters.
+    - lock_stats(): Returns the lock waits and retries of every DataBase method.
+    - is_lock_error(error): Tells whether an exception was raised because the database is locked.
+
 Module Constants:
     - LOGGING_PATH: Path to the log file for recording events.
     - DATABASE_NAME: The name of the database.
@@ -14,21 +35,316 @@ Module Constants:
     - DATABASE_PATH: The full path to the database file.
 
 Dependencies:
+    - migrations
     - sqlite3
     - logging
+    - threading
+    - time
+    - atexit
     - pathlib
     - constants (imported as const)
 """
+import contextlib
+import functools
+import inspect
+import random
 import sqlite3
 import logging
+import threading
+import time
+import atexit
 from pathlib import Path
 import constants as const
+import migrations
 
 logging.basicConfig(level=logging.INFO, filename=const.LOGGING_PATH,
                     format="%(asctime)s -  %(levelname)s - Module: %(module)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 
+class ConnectionPool:
+    """
+    A session-scoped pool of reusable SQLite connections.
+
+    Attributes:
+        path (str): The full path to the database file.
+        size (int): The maximum number of idle connections kept open.
+        max_age (float): Seconds after which an idle connection is recycled.
+        profile (str): Name of the SQLite performance profile from const.SQLITE_PROFILES.
+        hits (int): Number of acquires served by an idle connection.
+        misses (int): Number of acquires that had to open a new connection.
+        data_versions (dict): Per connection, the (data_version, total_changes) it last read user versions
+            at and those versions, see DataBase.storage_data_version.
+
+    Methods:
+        acquire(): Returns an idle connection or opens a new one.
+        release(connection): Returns a connection to the pool.
+        close(): Checkpoints the WAL and closes every idle connection.
+        stats(): Returns hit/miss counters and connection age statistics.
+    """
+    def __init__(self, path, size=const.POOL_SIZE, max_age=const.POOL_MAX_CONNECTION_AGE,
+                 profile=const.SQLITE_PROFILE):
+        """
+        Initializes a new, empty pool for the database at the given path.
+        """
+        self.path = path
+        self.size = size
+        self.max_age = max_age
+        self.profile = profile
+        self.hits = 0
+        self.misses = 0
+        self.data_versions = {}
+        self._idle = []
+        self._created = {}
+        self._lock = threading.Lock()
+
+    def _open_connection(self):
+        """
+        Opens a new connection and records its creation time.
+        """
+        # Connections may be borrowed by different threads, never by two at once
+        connection = sqlite3.connect(self.path, timeout=const.DATABASE_BUSY_TIMEOUT, check_same_thread=False)
+        self._apply_profile(connection)
+        self._created[id(connection)] = time.monotonic()
+        return connection
+
+    def _apply_profile(self, connection):
+        """
+        Applies the PRAGMA values of the pool's performance profile to a new connection.
+
+        The page cache and memory map are sized from the current database file size, so a small vault
+        does not reserve the full amount allowed by the profile.
+        """
+        settings = const.SQLITE_PROFILES[self.profile]
+        try:
+            file_size = Path(self.path).stat().st_size
+        except FileNotFoundError:
+            file_size = 0
+
+        cache_size = min(max(file_size, settings["min_cache_size"]), settings["max_cache_size"])
+        mmap_size = min(file_size * 2, settings["max_mmap_size"])
+
+        # PRAGMA does not accept bound parameters, every value comes from constants or is an int
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+        connection.execute(f"PRAGMA wal_autocheckpoint = {int(settings['wal_autocheckpoint'])}")
+        # A negative cache_size is expressed in KiB instead of pages
+        connection.execute(f"PRAGMA cache_size = {-(int(cache_size) // 1024)}")
+        connection.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+
+    def _discard(self, connection):
+        """
+        Closes a connection and forgets its creation time.
+        """
+        self._created.pop(id(connection), None)
+        self.data_versions.pop(id(connection), None)
+        connection.close()
+
+    def acquire(self):
+        """
+        Returns an idle connection, opening a new one when none are available.
+
+        Returns:
+            sqlite3.Connection: A connection owned by the caller until released.
+        """
+        with self._lock:
+            while self._idle:
+                connection = self._idle.pop()
+                if time.monotonic() - self._created[id(connection)] < self.max_age:
+                    self.hits += 1
+                    return connection
+                self._discard(connection)
+
+            self.misses += 1
+            return self._open_connection()
+
+    def release(self, connection):
+        """
+        Returns a connection to the pool, closing it if the pool is already full.
+
+        Parameters:
+            connection (sqlite3.Connection): The connection obtained from acquire().
+        """
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+            else:
+                self._discard(connection)
+
+    def close(self):
+        """
+        Checkpoints the WAL back into the database file and closes every idle connection held by the pool.
+        """
+        with self._lock:
+            if self._idle:
+                try:
+                    self._idle[-1].execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except sqlite3.Error as e:
+                    logger.error(f"An error occurred while checkpointing the database: {e}")
+            while self._idle:
+                self._discard(self._idle.pop())
+
+    def stats(self):
+        """
+        Returns the pool statistics.
+
+        Returns:
+            dict: Hits, misses, open and idle connection counts and connection ages in seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            ages = [now - created for created in self._created.values()]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "open": len(self._created),
+                "idle": len(self._idle),
+                "oldest_age": max(ages, default=0.0),
+                "mean_age": sum(ages) / len(ages) if ages else 0.0,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+_transaction_counters = {"transactions": 0, "commits": 0, "rollbacks": 0, "savepoints": 0,
+                         "savepoint_rollbacks": 0, "begin_retries": 0}
+_transaction_counters_lock = threading.Lock()
+
+_lock_counters = {}
+_lock_counters_lock = threading.Lock()
+
+# Tokenizer of the UserDataSearch index, read from the schema on the first search
+_search_tokenizer = None
+
+
+def get_pool():
+    """
+    Returns the process wide connection pool, setting up the database the first time it is called.
+
+    Returns:
+        ConnectionPool: The shared connection pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            database = DataBase()
+            database.setup_database()
+            _pool = ConnectionPool(database.path)
+            logger.info(f"Connection pool created for: {database.path}")
+        return _pool
+
+
+def close_pool():
+    """
+    Closes every pooled connection, the next get_pool() call starts a new pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            logger.info(f"Connection pool closed with stats: {_pool.stats()}, transactions: {transaction_stats()}")
+            if _lock_counters:
+                logger.info(f"Lock contention per method: {lock_stats()}")
+            _pool.close()
+            _pool = None
+
+
+atexit.register(close_pool)
+
+
+def _count(counter):
+    with _transaction_counters_lock:
+        _transaction_counters[counter] += 1
+
+
+def transaction_stats():
+    """
+    Returns the transaction counters of this process, a growing number of begin retries points at
+    lock contention between connections.
+
+    Returns:
+        dict: Transactions, both those begun by transaction() and those opened implicitly by a write, their
+            commits and rollbacks, savepoints, savepoints rolled back and retries of BEGIN IMMEDIATE.
+    """
+    with _transaction_counters_lock:
+        return dict(_transaction_counters)
+
+
+def is_lock_error(error):
+    """
+    Tells whether an exception was raised because another connection held a lock for longer than the
+    busy timeout.
+
+    Parameters:
+        error (BaseException): The exception to check.
+
+    Returns:
+        bool: True for "database is locked" and "database is busy" errors.
+    """
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+
+def _retry_delay(attempt):
+    """
+    Returns the jittered delay before the given retry, doubling per attempt up to the configured maximum.
+    """
+    delay = min(const.DATABASE_LOCK_RETRY_DELAY * 2 ** attempt, const.DATABASE_LOCK_RETRY_MAX_DELAY)
+    return random.uniform(delay / 2, delay)
+
+
+def _record_lock(method_name, retried, waited):
+    with _lock_counters_lock:
+        counters = _lock_counters.setdefault(method_name, {"lock_waits": 0, "retries": 0, "failures": 0,
+                                                           "wait_time": 0.0})
+        counters["lock_waits"] += 1
+        counters["retries" if retried else "failures"] += 1
+        counters["wait_time"] += waited
+
+
+def lock_stats():
+    """
+    Returns the lock contention of every DataBase method that found the database locked in this process.
+
+    Returns:
+        dict: Per method name, the number of busy timeouts it ran into, how many were retried and how many
+            were raised to the caller, and the seconds spent waiting in busy timeouts and retry delays.
+    """
+    with _lock_counters_lock:
+        return {method_name: dict(counters) for method_name, counters in _lock_counters.items()}
+
+
+def _retry_on_lock(method):
+    """
+    Wraps a DataBase method so it is retried while the database stays locked past the busy timeout.
+
+    Only a call that started outside a transaction is retried, after rolling back what it began. Inside a
+    transaction the earlier statements would be lost, so the error is raised for the transaction to roll back.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        for attempt in range(const.DATABASE_LOCK_RETRIES + 1):
+            own_transaction = not self.connection.in_transaction
+            start = time.monotonic()
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                waited = time.monotonic() - start
+                if not own_transaction or attempt == const.DATABASE_LOCK_RETRIES:
+                    _record_lock(method.__name__, False, waited)
+                    logger.error(f"{method.__name__} gave up after {attempt} retries: {e}")
+                    raise
+                delay = _retry_delay(attempt)
+                _record_lock(method.__name__, True, waited + delay)
+                if self.connection.in_transaction:
+                    self.connection.rollback()
+                logger.warning(f"{method.__name__} found the database locked, retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    return wrapper
+
+
 class DataBase:
     """
     A class representing a SQLite database.
@@ -40,9 +356,11 @@ class DataBase:
 
     Methods:
         __init__(): Initializes the DataBase object.
-        __enter__(): Enters a context to manage the database connection.
-        __exit__(): Exits the context and commits changes to the database.
+        __enter__(): Borrows a connection from the pool.
+        __exit__(): Commits changes, or rolls them back on an exception, and returns the connection to the pool.
+        transaction(immediate): Groups operations into one atomic commit, or a savepoint when nested.
         setup_database(): Sets up the database by creating folders and tables if they do not exist.
+        effective_pragmas(): Returns the PRAGMA values active on the borrowed connection.
     """
     def __init__(self):
         """
@@ -51,29 +369,124 @@ class DataBase:
         self.name = const.DATABASE_NAME
         self.folder = const.DATABASE_FOLDER
         self.path = const.DATABASE_PATH
+        self.pool = None
+        self.connection = None
+        self.savepoint_depth = 0
 
     def __enter__(self):
         """
-        Enters a context to manage the database connection.
+        Enters a context to manage the database connection, borrowing it from the pool.
 
         Returns:
             DataBase: The current instance of the DataBase class.
         """
-        self.setup_database()
-        self.connection = sqlite3.connect(self.path)
+        self.pool = get_pool()
+        self.connection = self.pool.acquire()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         """
-        Exits the context and commits changes to the database.
+        Exits the context, commits changes to the database, or rolls them back if the block raised an
+        exception, and returns the connection to the pool.
         """
         if self.connection:
-            self.connection.commit()
-            self.connection.close()
+            try:
+                in_transaction = self.connection.in_transaction
+                # An implicit transaction opened by a write outside transaction() ends here
+                if in_transaction:
+                    _count("transactions")
+                if exc_type is None:
+                    self.connection.commit()
+                    if in_transaction:
+                        _count("commits")
+                else:
+                    self.connection.rollback()
+                    if in_transaction:
+                        _count("rollbacks")
+                        logger.error(f"Transaction rolled back after an error: {exc_value!r}")
+            finally:
+                self.pool.release(self.connection)
+                self.connection = None
+
+    @contextlib.contextmanager
+    def transaction(self, immediate=False):
+        """
+        Groups the operations of a block into one atomic commit. The transaction is committed when the block
+        ends and rolled back when it raises.
+
+        Inside a transaction, or after a write in the same `with DataBase()` block, a nested transaction()
+        becomes a savepoint: an exception rolls back the operations of the nested block only, then propagates.
+
+        Parameters:
+            immediate (bool): Start with BEGIN IMMEDIATE, which takes the write lock up front instead of at
+                the first write. Use it for blocks that write, so they never fail half way on a lock.
+
+        Usage:
+            with DataBase() as db:
+                with db.transaction(immediate=True):
+                    entry_id = db.generator_save_user_data(values)
+                    db.storage_update_user_data(data)
+        """
+        connection = self.connection
+        if connection.in_transaction:
+            self.savepoint_depth += 1
+            name = f"savepoint_{self.savepoint_depth}"
+            connection.execute(f"SAVEPOINT {name}")
+            _count("savepoints")
+            try:
+                yield self
+            except BaseException:
+                connection.execute(f"ROLLBACK TO {name}")
+                connection.execute(f"RELEASE {name}")
+                _count("savepoint_rollbacks")
+                raise
+            else:
+                connection.execute(f"RELEASE {name}")
+            finally:
+                self.savepoint_depth -= 1
+            return
+
+        self._begin("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        _count("transactions")
+        try:
+            yield self
+        except BaseException:
+            connection.rollback()
+            _count("rollbacks")
+            raise
+        else:
+            connection.commit()
+            _count("commits")
+
+    def _begin(self, statement):
+        """
+        Starts a transaction, retrying with a jittered backoff while another connection holds the write lock.
+        Nothing has run inside the transaction yet, so the retry is always safe.
+        """
+        for attempt in range(const.DATABASE_LOCK_RETRIES + 1):
+            start = time.monotonic()
+            try:
+                self.connection.execute(statement)
+                return
+            except sqlite3.OperationalError as e:
+                waited = time.monotonic() - start
+                if not is_lock_error(e) or attempt == const.DATABASE_LOCK_RETRIES:
+                    if is_lock_error(e):
+                        _record_lock("transaction", False, waited)
+                    raise
+                delay = _retry_delay(attempt)
+                _count("begin_retries")
+                _record_lock("transaction", True, waited + delay)
+                logger.warning(f"{statement} found the database locked, retrying in {delay:.2f}s")
+                time.sleep(delay)
 
     def setup_database(self):
         """
-        Sets up the database by creating folders and tables if they do not exist.
+        Sets up the database by creating the folder if it does not exist and applying pending schema migrations.
+
+        Raises:
+            RuntimeError: If a migration failed. The queries expect the latest schema, so the application must
+                not start on an older one.
         """
         try:
             if not Path(self.folder).is_dir():
@@ -83,23 +496,28 @@ class DataBase:
             logger.error(f"An error occurred while setting up the folder: {e}")
 
         try:
-            if not Path(self.path).is_file():
-                Path(self.path).touch()
-                logger.info(f"Created database file at address: {self.path}")
-
-                with sqlite3.connect(self.path) as connection:
-                    cursor = connection.cursor()
-                    cursor.execute("""
-                        CREATE TABLE IF NOT EXISTS Users (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            username VARCHAR(256) NOT NULL,
-                            password VARCHAR(256) NOT NULL,
-                            encryption_key BLOB
-                        )
-                    """)
-                logger.info(f"Table Users was created inside: {self.name} at address {self.path}")
+            connection = sqlite3.connect(self.path, timeout=const.DATABASE_BUSY_TIMEOUT, isolation_level=None)
+            try:
+                version = migrations.migrate(connection)
+            finally:
+                connection.close()
+            logger.info(f"Database {self.name} at address {self.path} is at schema version {version}")
         except Exception as e:
             logger.error(f"An error occurred while setting up the database: {e}")
+            raise RuntimeError(f"The database {self.path} could not be upgraded to the current schema: {e}") from e
+
+    def effective_pragmas(self):
+        """
+        Returns the PRAGMA values active on the borrowed connection, to confirm which profile is applied.
+
+        Returns:
+            dict: The journal mode, synchronous level, WAL checkpoint interval, cache size and mmap size.
+        """
+        cursor = self.connection.cursor()
+        pragmas = {"profile": self.pool.profile if self.pool else None}
+        for pragma in ("journal_mode", "synchronous", "wal_autocheckpoint", "cache_size", "mmap_size"):
+            pragmas[pragma] = cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+        return pragmas
 
     def register_check_username(self, username):
         """
@@ -120,7 +538,7 @@ class DataBase:
             user_exists = False
         return user_exists
     
-    def register_user(self, username, hashed_password, encryption_key):
+    def register_user(self, username, hashed_password, encryption_key, bcrypt_cost=None):
         """
         Registers a new user with a username and hashed password.
 
@@ -128,26 +546,93 @@ class DataBase:
             username (str): Username of the new user.
             hashed_password (bytes): Hashed password of the new user.
             encryption_key(bytes): Encryption key of the new user
+            bcrypt_cost (int): The bcrypt cost the password was hashed with.
         """
         cursor = self.connection.cursor()
-        cursor.execute("INSERT INTO Users (username, password, encryption_key) VALUES (?, ?, ?)",
-                                    (username, hashed_password, encryption_key))
+        cursor.execute("INSERT INTO Users (username, password, encryption_key, bcrypt_cost) VALUES (?, ?, ?, ?)",
+                                    (username, hashed_password, encryption_key, bcrypt_cost))
         
+    def register_existing_usernames(self, usernames, chunk_size=const.BATCH_CHUNK_SIZE):
+        """
+        Checks which of the given usernames already exist, with one IN query per chunk instead of one
+        query per username.
+
+        Parameters:
+            usernames (iterable): Usernames to check for existence.
+            chunk_size (int): Number of usernames checked per query.
+
+        Returns:
+            set: The usernames that already exist.
+        """
+        cursor = self.connection.cursor()
+        usernames = list(usernames)
+        existing = set()
+        for offset in range(0, len(usernames), chunk_size):
+            chunk = usernames[offset:offset + chunk_size]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT username FROM Users WHERE username IN ({placeholders})", chunk)
+            existing.update(username for username, in cursor.fetchall())
+        return existing
+
+    def register_users_many(self, users, chunk_size=const.BATCH_CHUNK_SIZE):
+        """
+        Registers many users inside a single transaction. A username that was taken after it was
+        checked is skipped instead of aborting the whole batch.
+
+        Parameters:
+            users (iterable): Tuples containing username, hashed password, encryption key and bcrypt cost.
+            chunk_size (int): Number of rows written per executemany call.
+
+        Returns:
+            set: The usernames that were skipped because they already existed.
+        """
+        cursor = self.connection.cursor()
+        users = list(users)
+        query = "INSERT OR IGNORE INTO Users (username, password, encryption_key, bcrypt_cost) VALUES (?, ?, ?, ?)"
+        # A row that holds another hash than the one given was not inserted by this batch
+        hashes = {username: hashed_password for username, hashed_password, _, _ in users}
+        skipped = set()
+        with self.transaction(immediate=True):
+            for offset in range(0, len(users), chunk_size):
+                cursor.executemany(query, users[offset:offset + chunk_size])
+
+            for offset in range(0, len(users), chunk_size):
+                chunk = [user[0] for user in users[offset:offset + chunk_size]]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(f"SELECT username, password FROM Users WHERE username IN ({placeholders})", chunk)
+                skipped.update(username for username, hashed_password in cursor.fetchall()
+                               if hashed_password != hashes[username])
+        return skipped
+
     def login_check(self, username):
         """
-        Checks if a given username exists in the database and retrieves the user's ID and hashed password.
+        Checks if a given username exists in the database and retrieves the user's ID, hashed password
+        and bcrypt cost.
 
         Parameters:
             username (str): Username to check.
 
         Returns:
-            tuple: Tuple containing user's ID and hashed password if the username exists, else None.
+            tuple: Tuple containing user's ID, hashed password and bcrypt cost if the username exists, else None.
         """
         cursor = self.connection.cursor()
-        cursor.execute("SELECT ID, Password FROM Users WHERE Username=?", (username,))
+        cursor.execute("SELECT ID, Password, bcrypt_cost FROM Users WHERE Username=?", (username,))
         result = cursor.fetchone()
         return result
 
+    def login_update_password_hash(self, user_id, hashed_password, bcrypt_cost):
+        """
+        Replaces a user's password hash after it was rehashed with a different bcrypt cost.
+
+        Parameters:
+            user_id (int): ID of the user.
+            hashed_password (bytes): The new hashed password.
+            bcrypt_cost (int): The bcrypt cost of the new hash.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("UPDATE Users SET password=?, bcrypt_cost=? WHERE id=?",
+                       (hashed_password, bcrypt_cost, user_id))
+
     def login_retrieve_encryption_key(self, username):
         """
         Retrieves the encryption key associated with a given username.
@@ -171,6 +656,9 @@ class DataBase:
 
         Parameters:
             values (tuple): Tuple containing entry name, username, password, website, and user ID.
+
+        Returns:
+            int: The entry ID of the new row.
         """
         cursor = self.connection.cursor()
         query = """
@@ -178,6 +666,47 @@ class DataBase:
             VALUES (?, ?, ?, ?, ?, ?)
         """
         cursor.execute(query, values)
+        return cursor.lastrowid
+
+    def generator_save_user_data_many(self, entries, user_id, encryption_manager,
+                                      chunk_size=const.BATCH_CHUNK_SIZE):
+        """
+        Saves many entries into the UserData table inside a single transaction.
+
+        The passwords are encrypted in one encrypt_many pass before any row is written, the rows are then
+        inserted with chunked executemany calls.
+
+        Parameters:
+            entries (iterable): Tuples containing entry name, username, plaintext password and website.
+            user_id (int): ID of the user owning the entries.
+            encryption_manager (EncryptionManager): Encryption manager holding the user's key.
+            chunk_size (int): Number of rows written per executemany call.
+
+        Returns:
+            list: The entry IDs of the new rows, in the order of the given entries.
+        """
+        start = time.perf_counter()
+        entries = list(entries)
+        encrypted = self._encrypt_passwords(encryption_manager, [entry[2] for entry in entries])
+        rows = [(name, username, encrypted_password, website, iv, user_id)
+                for (name, username, _, website), (iv, encrypted_password) in zip(entries, encrypted)]
+
+        cursor = self.connection.cursor()
+        query = """
+            INSERT INTO UserData (entry_name, entry_username, entry_password, entry_website, iv, User_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """
+        entry_ids = []
+        with self.transaction(immediate=True):
+            for offset in range(0, len(rows), chunk_size):
+                chunk = rows[offset:offset + chunk_size]
+                cursor.executemany(query, chunk)
+                # AUTOINCREMENT ids of rows inserted by one statement in one transaction are consecutive
+                last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+                entry_ids.extend(range(last_id - len(chunk) + 1, last_id + 1))
+
+        self._log_throughput("Inserted", len(rows), start)
+        return entry_ids
 
     def storage_retrieve_encryption_key(self, id):
         """
@@ -196,36 +725,130 @@ class DataBase:
 
     def storage_create_account_buttons(self, user_id):
         """
-        Creates the UserData table if it doesn't exist and retrieves account names associated with a user ID.
+        Retrieves the entry IDs and account names associated with a user ID, ordered by name.
 
         Parameters:
             user_id (int): ID of the user.
 
         Returns:
-            list: List of account names associated with the user ID.
+            list: List of (entry ID, account name) tuples associated with the user ID.
         """
         cursor = self.connection.cursor()
-        cursor.execute('SELECT name FROM sqlite_master WHERE type="table" AND name="UserData"')
-        table_exists = cursor.fetchone()
-
-        if not table_exists:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS UserData (
-                    entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    entry_name VARCHAR(256),
-                    entry_username VARCHAR(256),
-                    entry_password VARCHAR(256),
-                    entry_website VARCHAR(256),
-                    iv BLOB,
-                    User_id INTEGER,
-                    FOREIGN KEY (User_id) REFERENCES Users(id)
-                )
-            ''')
-        cursor.execute("SELECT entry_name FROM UserData WHERE User_id=?", [user_id])
+        cursor.execute("SELECT entry_id, entry_name FROM UserData WHERE User_id=? "
+                       "ORDER BY entry_name, entry_id", [user_id])
         account_names = cursor.fetchall()
         return account_names
 
 
+    def storage_fetch_account_page(self, user_id, after=None, limit=const.ACCOUNT_PAGE_SIZE):
+        """
+        Retrieves one page of a user's accounts ordered by name and entry ID, using keyset pagination.
+
+        Parameters:
+            user_id (int): ID of the user.
+            after (tuple): (account name, entry ID) of the last row of the previous page, None for the first page.
+            limit (int): Maximum number of accounts in the page.
+
+        Returns:
+            list: List of (entry ID, account name) tuples.
+        """
+        cursor = self.connection.cursor()
+        if after is None:
+            cursor.execute("SELECT entry_id, entry_name FROM UserData WHERE User_id=? "
+                           "ORDER BY entry_name, entry_id LIMIT ?", (user_id, limit))
+        else:
+            after_name, after_id = after
+            cursor.execute("SELECT entry_id, entry_name FROM UserData "
+                           "WHERE User_id=? AND (entry_name, entry_id) > (?, ?) "
+                           "ORDER BY entry_name, entry_id LIMIT ?", (user_id, after_name, after_id, limit))
+        return cursor.fetchall()
+
+    def storage_iter_account_pages(self, user_id, page_size=const.ACCOUNT_PAGE_SIZE):
+        """
+        Yields a user's accounts page by page, only one page is held in memory at a time.
+        The generator must be consumed while the DataBase context is open.
+
+        Parameters:
+            user_id (int): ID of the user.
+            page_size (int): Number of accounts per page.
+
+        Yields:
+            list: List of (entry ID, account name) tuples.
+        """
+        after = None
+        while True:
+            page = self.storage_fetch_account_page(user_id, after, page_size)
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            entry_id, account_name = page[-1]
+            after = (account_name, entry_id)
+
+    def storage_fetch_search_fields(self, user_id):
+        """
+        Retrieves the searchable fields of every entry of a user, used to build the search index.
+
+        Parameters:
+            user_id (int): ID of the user.
+
+        Returns:
+            list: List of (entry ID, name, username, website) tuples.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT entry_id, entry_name, entry_username, entry_website FROM UserData "
+                       "WHERE User_id=?", (user_id,))
+        return cursor.fetchall()
+
+    def search_entries(self, user_id, query, limit=const.SEARCH_RESULT_LIMIT):
+        """
+        Searches the name, username and website of a user's entries with the UserDataSearch full-text index.
+        Every whitespace separated term of the query has to match, anywhere inside a field.
+
+        The trigram index cannot match terms shorter than three characters, such queries fall back to a LIKE
+        filter over the user's entries.
+
+        Parameters:
+            user_id (int): ID of the user.
+            query (str): The search text.
+            limit (int): Maximum number of entry IDs returned.
+
+        Returns:
+            list: Entry IDs ordered by relevance, or by name for the LIKE fallback.
+        """
+        terms = query.split()
+        if not terms:
+            return []
+
+        cursor = self.connection.cursor()
+        trigram = self._search_tokenizer(cursor) == "trigram"
+        if trigram and min(len(term) for term in terms) < 3:
+            patterns = ["%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                        for term in terms]
+            condition = " AND ".join(["(entry_name LIKE ? ESCAPE '\\' OR entry_username LIKE ? ESCAPE '\\' "
+                                      "OR entry_website LIKE ? ESCAPE '\\')"] * len(terms))
+            parameters = [pattern for pattern in patterns for _ in range(3)]
+            cursor.execute(f"SELECT entry_id FROM UserData WHERE User_id=? AND {condition} "
+                           f"ORDER BY entry_name, entry_id LIMIT ?", (user_id, *parameters, limit))
+        else:
+            # Terms are quoted so FTS5 operators typed by the user are matched literally
+            match = " ".join('"' + term.replace('"', '""') + '"' + ("" if trigram else "*") for term in terms)
+            cursor.execute("SELECT rowid FROM UserDataSearch WHERE UserDataSearch MATCH ? AND User_id=? "
+                           "ORDER BY rank LIMIT ?", (match, user_id, limit))
+        return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _search_tokenizer(cursor):
+        """
+        Returns the tokenizer the UserDataSearch index was created with, trigram or unicode61.
+        """
+        global _search_tokenizer
+        if _search_tokenizer is None:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name='UserDataSearch'")
+            row = cursor.fetchone()
+            _search_tokenizer = "trigram" if row and "trigram" in row[0] else "unicode61"
+        return _search_tokenizer
+
     def storage_fetch_user_data(self, account_name, user_id):
         """
         Fetches user data for a specific account name and user ID.
@@ -262,22 +885,104 @@ class DataBase:
         )
         cursor.execute(query, data)
 
-    def storage_fetch_details(self, account_index):
+    def storage_update_user_data_many(self, entries, encryption_manager, chunk_size=const.BATCH_CHUNK_SIZE):
+        """
+        Updates many entries in the UserData table inside a single transaction.
+
+        Parameters:
+            entries (iterable): Tuples containing entry name, username, plaintext password, website and entry ID.
+            encryption_manager (EncryptionManager): Encryption manager holding the user's key.
+            chunk_size (int): Number of rows written per executemany call.
+
+        Returns:
+            list: The entry IDs that were updated.
+        """
+        start = time.perf_counter()
+        entries = list(entries)
+        encrypted = self._encrypt_passwords(encryption_manager, [entry[2] for entry in entries])
+        rows = [(name, username, encrypted_password, website, iv, entry_id)
+                for (name, username, _, website, entry_id), (iv, encrypted_password) in zip(entries, encrypted)]
+
+        cursor = self.connection.cursor()
+        query = (
+            "UPDATE UserData SET entry_name=?, entry_username=?, "
+            "entry_password=?, entry_website=?, iv=? WHERE entry_id=?"
+        )
+        with self.transaction(immediate=True):
+            for offset in range(0, len(rows), chunk_size):
+                cursor.executemany(query, rows[offset:offset + chunk_size])
+
+        self._log_throughput("Updated", len(rows), start)
+        return [row[-1] for row in rows]
+
+    @staticmethod
+    def _encrypt_passwords(encryption_manager, passwords):
+        """
+        Encrypts the passwords of a batch, raising the first error so no row of a failed batch is written.
+        """
+        results = encryption_manager.encrypt_many(passwords)
+        for result in results:
+            if result.error is not None:
+                raise result.error
+        return [result.value for result in results]
+
+    @staticmethod
+    def _log_throughput(action, row_count, start):
+        """
+        Logs the number of rows written by a batch method and its throughput in rows per second.
+        """
+        elapsed = time.perf_counter() - start
+        rows_per_second = row_count / elapsed if elapsed > 0 else float("inf")
+        logger.info(f"{action} {row_count} rows in {elapsed:.3f}s ({rows_per_second:.0f} rows/s)")
+
+    def storage_fetch_legacy_entries(self, user_id, after_id=0, limit=const.FORMAT_MIGRATION_CHUNK_SIZE):
+        """
+        Fetches entries of a user that are still stored in the legacy CBC format, ordered by entry ID.
+
+        Parameters:
+            user_id (int): ID of the user.
+            after_id (int): Only entries with a greater entry ID are fetched.
+            limit (int): Maximum number of entries to fetch.
+
+        Returns:
+            list: List of (entry ID, encrypted password, iv) tuples.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT entry_id, entry_password, iv FROM UserData "
+                       "WHERE User_id=? AND iv IS NOT NULL AND entry_id>? "
+                       "ORDER BY entry_id LIMIT ?", (user_id, after_id, limit))
+        return cursor.fetchall()
+
+    def storage_replace_legacy_entries(self, rows):
         """
-        Fetches user data for a specific account index.
+        Replaces legacy CBC passwords with their GCM tokens. A row is only replaced if it still holds the
+        IV it was read with, so an entry saved by the user in the meantime is left untouched.
 
         Parameters:
-            account_index (int): Index of the account to fetch data for.
+            rows (list): List of (GCM token, entry ID, legacy iv) tuples.
+        """
+        cursor = self.connection.cursor()
+        with self.transaction(immediate=True):
+            cursor.executemany("UPDATE UserData SET entry_password=?, iv=NULL WHERE entry_id=? AND iv=?", rows)
+
+    def storage_fetch_details(self, entry_id, user_id):
+        """
+        Fetches user data for a specific entry ID, scoped to the user owning it.
+
+        Parameters:
+            entry_id (int): ID of the entry to fetch data for.
+            user_id (int): ID of the user.
 
         Returns:
-            tuple: Tuple containing entry name, username, password, and website.
+            tuple: Tuple containing entry name, username, password, website and iv, None if the user
+            does not own an entry with that ID.
         """
         cursor = self.connection.cursor()
         query = (
             "SELECT entry_name, entry_username, entry_password, entry_website, iv "
-            "FROM UserData LIMIT 1 OFFSET ?"
+            "FROM UserData WHERE entry_id=? AND User_id=?"
         )
-        data = (account_index,)
+        data = (entry_id, user_id)
         cursor.execute(query, data)
         account_details = cursor.fetchone()
         return account_details
@@ -292,4 +997,81 @@ class DataBase:
         cursor = self.connection.cursor()
         cursor.execute("DELETE FROM UserData WHERE entry_id = ?", (entry_id,))
 
+    def storage_data_version(self, user_id):
+        """
+        Returns the change version of a user's entries, incremented by the triggers of every insert, update
+        and delete of one of them.
+
+        `PRAGMA data_version` only changes when another connection, of this or any other process, committed,
+        and total_changes only when this connection wrote. While neither changed the version read last on this
+        connection is still current and is returned without reading a table.
+
+        Parameters:
+            user_id (int): ID of the user.
+
+        Returns:
+            int: The version, 0 for a user whose entries never changed.
+        """
+        return self._data_version(user_id)
+
+    def _data_version(self, user_id):
+        """
+        Reads the change version for storage_data_version and storage_changes_since. It is not wrapped in
+        _retry_on_lock, so calling it from another query method does not nest the retries.
+        """
+        cursor = self.connection.cursor()
+        marker = (cursor.execute("PRAGMA data_version").fetchone()[0], self.connection.total_changes)
+        seen = self.pool.data_versions.get(id(self.connection)) if self.pool is not None else None
+        if seen is not None and seen[0] == marker and user_id in seen[1]:
+            return seen[1][user_id]
+
+        cursor.execute("SELECT version FROM UserDataVersion WHERE User_id=?", (user_id,))
+        row = cursor.fetchone()
+        version = row[0] if row else 0
+        # A version read inside an open transaction may still be rolled back, which moves neither marker
+        if self.pool is not None and not self.connection.in_transaction:
+            versions = seen[1] if seen is not None and seen[0] == marker else {}
+            versions[user_id] = version
+            self.pool.data_versions[id(self.connection)] = (marker, versions)
+        return version
+
+    def storage_changes_since(self, user_id, version):
+        """
+        Returns the entries of a user that were inserted, updated or deleted after the given version.
+        When nothing changed this costs a single PRAGMA read, see storage_data_version.
+
+        Parameters:
+            user_id (int): ID of the user.
+            version (int): The version the caller's copy of the entries is at.
+
+        Returns:
+            tuple: The current version and a list of (entry ID, name, username, website) tuples in the order of
+                their changes, name, username and website are None for a deleted entry.
+        """
+        current_version = self._data_version(user_id)
+        if current_version == version:
+            return current_version, []
+
+        # A change committed after the version was read may be listed as well, it is listed again next time
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            SELECT c.entry_id, d.entry_name, d.entry_username, d.entry_website
+            FROM UserDataChanges c
+            LEFT JOIN UserData d ON d.entry_id = c.entry_id AND d.User_id = c.User_id
+            WHERE c.User_id=? AND c.version>?
+            ORDER BY c.version
+        """, (user_id, version))
+        return current_version, cursor.fetchall()
+
+
+# Methods that open their own transaction(immediate=True). Its BEGIN IMMEDIATE already retries in _begin and
+# nothing after it can hit a lock, so wrapping them would multiply the retries and count every wait twice
+_OWN_TRANSACTION_METHODS = ("register_users_many", "generator_save_user_data_many", "storage_update_user_data_many",
+                            "storage_replace_legacy_entries")
 
+# Every other query method retries on lock errors. transaction() and setup_database() handle locks themselves,
+# a generator method runs its queries after it returned, outside of any wrapper
+for _name, _method in list(vars(DataBase).items()):
+    if (not _name.startswith("_") and inspect.isfunction(_method) and not inspect.isgeneratorfunction(_method)
+            and _name not in ("setup_database", "transaction") + _OWN_TRANSACTION_METHODS):
+        setattr(DataBase, _name, _retry_on_lock(_method))
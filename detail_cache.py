@@ -0,0 +1,125 @@
+"""
+detail_cache.py
+
+This module defines the DetailCache class, a small LRU cache of decrypted entry details used by the Storage
+frame. Showing an entry that is cached skips the database query and the decryption, which is what makes
+moving through the account list with the arrow keys instant once the neighbours have been prefetched.
+
+Records hold decrypted passwords, so they expire after const.DETAIL_CACHE_TTL seconds and the whole cache is
+cleared when the user logs out.
+
+Classes:
+    - DetailCache: A thread safe LRU cache with a time to live, keyed by entry ID.
+"""
+import threading
+import time
+from collections import OrderedDict
+import constants as const
+
+
+class DetailCache:
+    """
+    A thread safe LRU cache of decrypted entry details with a time to live.
+
+    Attributes:
+        capacity (int): Maximum number of cached records.
+        ttl (float): Seconds after which a record expires.
+        generation (int): Incremented on every invalidation, used to drop prefetched records that went stale.
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of lookups that found no fresh record.
+
+    Methods:
+        get(entry_id): Returns the cached record of an entry, None if it is missing or expired.
+        put(entry_id, record, generation): Caches the record of an entry.
+        invalidate(entry_id): Drops the record of an entry.
+        clear(): Drops every record.
+        stats(): Returns the cache counters.
+    """
+    def __init__(self, capacity=const.DETAIL_CACHE_SIZE, ttl=const.DETAIL_CACHE_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, entry_id):
+        with self._lock:
+            return self._fresh(entry_id) is not None
+
+    def _fresh(self, entry_id):
+        """
+        Returns the record of an entry if it has not expired, dropping it otherwise. Needs the lock.
+        """
+        cached = self._records.get(entry_id)
+        if cached is None:
+            return None
+        record, stored_at = cached
+        if time.monotonic() - stored_at > self.ttl:
+            del self._records[entry_id]
+            return None
+        return record
+
+    def get(self, entry_id):
+        """
+        Returns the cached record of an entry and marks it as recently used.
+
+        Parameters:
+            entry_id (int): The database ID of the entry.
+
+        Returns:
+            tuple: The (name, username, password, website) of the entry, None if it is missing or expired.
+        """
+        with self._lock:
+            record = self._fresh(entry_id)
+            if record is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._records.move_to_end(entry_id)
+            return record
+
+    def put(self, entry_id, record, generation=None):
+        """
+        Caches the record of an entry, evicting the least recently used record when the cache is full.
+
+        Parameters:
+            entry_id (int): The database ID of the entry.
+            record (tuple): The (name, username, password, website) of the entry.
+            generation (int): The generation read before the record was fetched, the record is dropped
+                if an invalidation happened since. None stores it unconditionally.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._records[entry_id] = (record, time.monotonic())
+            self._records.move_to_end(entry_id)
+            while len(self._records) > self.capacity:
+                self._records.popitem(last=False)
+
+    def invalidate(self, entry_id):
+        """
+        Drops the record of an entry that was changed or deleted.
+        """
+        with self._lock:
+            self.generation += 1
+            self._records.pop(entry_id, None)
+
+    def clear(self):
+        """
+        Drops every record, used when the user logs out.
+        """
+        with self._lock:
+            self.generation += 1
+            self._records.clear()
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The number of hits, misses and cached records.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._records)}
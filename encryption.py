@@ -1,6 +1,79 @@
 from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
 from Crypto.Util.Padding import pad, unpad
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import atexit
 import base64
+import multiprocessing
+import threading
+import constants as const
+
+# Stored ciphertext formats. Legacy CBC rows keep a base64 IV and ciphertext in text columns,
+# GCM rows are a single BLOB: version byte | 12 byte nonce | 16 byte tag | ciphertext
+FORMAT_CBC = 1
+FORMAT_GCM = 2
+GCM_NONCE_SIZE = 12
+GCM_TAG_SIZE = 16
+
+# Outcome of one item of a batch operation, error is None when the item succeeded
+CryptoResult = namedtuple("CryptoResult", ["value", "error"])
+
+# Long-lived pools of encrypt_many and decrypt_many, keyed by (executor, workers), started on first use
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _shared_pool(executor, workers):
+    """
+    Returns the pool of the given kind and size, starting it on first use. Process workers are spawned rather
+    than forked, the GUI and the daemon fork while other threads hold locks.
+    """
+    with _pools_lock:
+        pool = _pools.get((executor, workers))
+        if pool is None:
+            if executor == "process":
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crypto")
+            _pools[(executor, workers)] = pool
+        return pool
+
+
+@atexit.register
+def _shutdown_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(cancel_futures=True)
+        _pools.clear()
+
+
+def _encrypt_chunk(key, plaintexts):
+    """
+    Encrypts a chunk of plaintexts, used by the thread and process pools of encrypt_many.
+    """
+    encryption_manager = EncryptionManager(key)
+    results = []
+    for plaintext in plaintexts:
+        try:
+            results.append(CryptoResult(encryption_manager.encrypt(plaintext), None))
+        except Exception as e:
+            results.append(CryptoResult(None, e))
+    return results
+
+
+def _decrypt_chunk(key, pairs):
+    """
+    Decrypts a chunk of (iv, ciphertext) pairs, used by the thread and process pools of decrypt_many.
+    """
+    encryption_manager = EncryptionManager(key)
+    results = []
+    for iv, ciphertext in pairs:
+        try:
+            results.append(CryptoResult(encryption_manager.decrypt(iv, ciphertext), None))
+        except Exception as e:
+            results.append(CryptoResult(None, e))
+    return results
 
 
 class EncryptionManager:
@@ -9,7 +82,37 @@ class EncryptionManager:
 
     def encrypt(self, plaintext):
         """
-        Encrypts plaintext using AES encryption.
+        Encrypts plaintext using AES-GCM.
+        Returns the pair (None, token), the nonce is part of the binary token so there is no separate IV.
+        """
+        nonce = get_random_bytes(GCM_NONCE_SIZE)
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce, mac_len=GCM_TAG_SIZE)
+        ct_bytes, tag = cipher.encrypt_and_digest(plaintext.encode('utf-8'))
+        return None, bytes([FORMAT_GCM]) + nonce + tag + ct_bytes
+
+    def decrypt(self, iv, ciphertext):
+        """
+        Decrypts a GCM token or a legacy CBC ciphertext.
+        Legacy ciphertexts require the initialization vector (IV), a tampered GCM token raises ValueError.
+        """
+        if self.is_gcm_token(ciphertext):
+            nonce_end = 1 + GCM_NONCE_SIZE
+            tag_end = nonce_end + GCM_TAG_SIZE
+            cipher = AES.new(self.key, AES.MODE_GCM, nonce=ciphertext[1:nonce_end], mac_len=GCM_TAG_SIZE)
+            pt = cipher.decrypt_and_verify(ciphertext[tag_end:], ciphertext[nonce_end:tag_end])
+            return pt.decode('utf-8')
+        return self.decrypt_legacy(iv, ciphertext)
+
+    @staticmethod
+    def is_gcm_token(ciphertext):
+        """
+        Returns True if the stored ciphertext is in the GCM format, legacy CBC ciphertexts are base64 text.
+        """
+        return isinstance(ciphertext, (bytes, bytearray)) and ciphertext[:1] == bytes([FORMAT_GCM])
+
+    def encrypt_legacy(self, plaintext):
+        """
+        Encrypts plaintext using AES-CBC, the format used before GCM.
         Returns the initialization vector (IV) and the ciphertext.
         """
         cipher = AES.new(self.key, AES.MODE_CBC)
@@ -18,9 +121,9 @@ class EncryptionManager:
         ct = base64.b64encode(ct_bytes).decode('utf-8')
         return iv, ct
 
-    def decrypt(self, iv, ciphertext):
+    def decrypt_legacy(self, iv, ciphertext):
         """
-        Decrypts ciphertext using AES encryption.
+        Decrypts ciphertext using AES-CBC, the format used before GCM.
         Requires the initialization vector (IV).
         """
         iv = base64.b64decode(iv)
@@ -28,3 +131,34 @@ class EncryptionManager:
         cipher = AES.new(self.key, AES.MODE_CBC, iv)
         pt = unpad(cipher.decrypt(ct), AES.block_size)
         return pt.decode('utf-8')
+
+    def encrypt_many(self, plaintexts, workers=const.CRYPTO_WORKERS, executor=const.CRYPTO_EXECUTOR,
+                     chunk_size=const.CRYPTO_CHUNK_SIZE):
+        """
+        Encrypts a sequence of plaintexts on a thread or process pool.
+        Returns a list of CryptoResult in the order of the input, the value of a successful item is
+        the (IV, ciphertext) pair and a failed item carries its exception instead.
+        """
+        return self._run_batch(_encrypt_chunk, list(plaintexts), workers, executor, chunk_size)
+
+    def decrypt_many(self, pairs, workers=const.CRYPTO_WORKERS, executor=const.CRYPTO_EXECUTOR,
+                     chunk_size=const.CRYPTO_CHUNK_SIZE):
+        """
+        Decrypts a sequence of (IV, ciphertext) pairs on a thread or process pool.
+        Returns a list of CryptoResult in the order of the input, the value of a successful item is
+        the plaintext and a failed item carries its exception instead.
+        """
+        return self._run_batch(_decrypt_chunk, list(pairs), workers, executor, chunk_size)
+
+    def _run_batch(self, function, items, workers, executor, chunk_size):
+        """
+        Splits the items into chunks and maps them over the shared pool of the chosen kind, keeping the input
+        order. Batches below const.CRYPTO_PARALLEL_MIN_ITEMS, a single chunk or a single worker run inline,
+        where the pool's overhead would outweigh its gain.
+        """
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        if len(items) < const.CRYPTO_PARALLEL_MIN_ITEMS or len(chunks) <= 1 or workers <= 1:
+            return [result for chunk in chunks for result in function(self.key, chunk)]
+
+        chunk_results = _shared_pool(executor, workers).map(function, [self.key] * len(chunks), chunks)
+        return [result for chunk in chunk_results for result in chunk]
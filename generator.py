@@ -15,7 +15,6 @@ import random
 import string
 import pyperclip
 from database import DataBase 
-from encryption import EncryptionManager
 
 
 class Generator(ctk.CTkToplevel):
@@ -23,7 +22,7 @@ class Generator(ctk.CTkToplevel):
     Initialize the Password Generator GUI.
 
     Parameters:
-    - master: The master widget (toplevel frame) for this GUI.
+    - master: The master widget (toplevel frame) for this GUI, its scheduler runs the clipboard copy.
     """
     def __init__(self, master):
         super().__init__(master)
@@ -182,7 +181,7 @@ class Generator(ctk.CTkToplevel):
         Copy the password to the clipboard.
         """
         password = self.textbox.get("2.0", "end-1c")
-        pyperclip.copy(password)
+        self.master.scheduler.submit(pyperclip.copy, password, key="clipboard")
 
     def update_length_display(self):
         """
@@ -196,15 +195,18 @@ class EntryFrame(ctk.CTkToplevel):
     Initialize the EntryFrame for adding new items inside the user's database
 
     Parameters:
-    - master: The master(toplevel window) for this EntryFrame.
-    - refresh_callback: Callback function to refresh the scrollable frame inside Storage module
+    - master: The master(toplevel window) for this EntryFrame, its scheduler runs the encryption and the insert.
+    - refresh_callback: Callback function receiving the entry ID, name, username and website of a
+      saved entry, used to add it to the account list and search index inside Storage module
     - user_id: The ID associated with the user_id from the database, obtained during login
+    - session: The session of the user, holding the cached encryption key
     """
-    def __init__(self, master, refresh_callback, user_id):
+    def __init__(self, master, refresh_callback, user_id, session):
         super().__init__(master)
         self.title("New Entry")
         self.resizable(False, False)
         self.user_id = user_id
+        self.session = session
 
         self.name_label = ctk.CTkLabel(self, text="Name:")
         self.name_label.grid(row=0, column=0, padx=10, pady=10, sticky="e")
@@ -232,29 +234,33 @@ class EntryFrame(ctk.CTkToplevel):
 
     def save_entry(self, refresh_callback):
         """
-        Save the entry details to the database and refresh the display.
+        Save the entry details to the database and add the new entry to the display.
 
         Parameters:
-        - refresh_callback: Callback function to refresh the display.
+        - refresh_callback: Callback function receiving the entry ID, name, username and website of the saved entry.
         """
 
         if self.user_id is not None:
-            with DataBase() as db:
-                encryption_key_tuple = db.storage_retrieve_encryption_key(self.user_id)
-                encryption_key = encryption_key_tuple[0]
-                encryption_manager = EncryptionManager(encryption_key)
-                iv, encrypted_password = encryption_manager.encrypt(self.password_entry.get())
-
-                values = (
-                    self.name_entry.get(),
-                    self.username_entry.get(),
-                    encrypted_password,
-                    self.website_entry.get(),
-                    iv,
-                    self.user_id
-                )
-                db.generator_save_user_data(values)
-
-        #calling create_account_buttons() from storage module to refresh the buttons
-        refresh_callback()
+            password = self.password_entry.get()
+            name = self.name_entry.get()
+            username = self.username_entry.get()
+            website = self.website_entry.get()
+
+            def insert_entry():
+                # Runs on a scheduler worker thread
+                iv, encrypted_password = self.session.encrypt(password)
+                with DataBase() as db:
+                    values = (
+                        name,
+                        username,
+                        encrypted_password,
+                        website,
+                        iv,
+                        self.user_id
+                    )
+                    return db.generator_save_user_data(values)
+
+            #calling account_added() from storage module to add the button of the new entry
+            self.master.scheduler.submit(insert_entry, name="save_entry", serial=True,
+                                         on_done=lambda entry_id: refresh_callback(entry_id, name, username, website))
 
@@ -4,6 +4,8 @@ Login Module
 This module defines the Login class, which represents the logic behind user authentication.
 It utilizes the customtkinter library for GUI components
 and integrates with SQLite for user data storage.
+The password check itself runs on a worker thread through the auth module, the remembered
+credentials are read and saved through the application's task scheduler.
 
 
 Classes:
@@ -11,13 +13,15 @@ Classes:
 """
 
 
-import bcrypt
 import customtkinter as ctk
 from sidebar import SideBarFrame
 import json
+import base64
 import logging
-from database import DataBase
+from database import DataBase, is_lock_error
 from encryption import EncryptionManager
+from session import Session
+from auth import auth_service, AUTH_OK, AUTH_INVALID_PASSWORD
 import constants as const
 
 
@@ -34,19 +38,29 @@ class Login(ctk.CTkFrame):
 
     Attributes:
         user_id (int): The user ID associated with the authenticated user.
+        session (Session): The session of the authenticated user, holding the cached encryption key.
 
     Methods:
         - login(self, controller, storage_class):
-            Handles the login process, validates user credentials, and navigates to the
-            specified storage frame upon successful authentication.
+            Validates the input and starts the authentication on a worker thread.
+
+        - finish_login(self, controller, storage_class, username, password, result):
+            Applies the authentication result and navigates to the specified storage
+            frame upon successful authentication.
+
+        - login_failed(self, error):
+            Shows an error when the authentication could not be completed.
 
         - save_credentials(self, username, password):
             Encrypts and saves user credentials, including the username and password,
             to a JSON file for future use.
 
         - check_credentials_file(self):
-            Checks for the existence of a credentials file, retrieves stored credentials,
-            and populates the username and password fields if found.
+            Loads the stored credentials in the background and populates the username
+            and password fields if found.
+
+        - load_credentials():
+            Reads and decrypts the stored credentials.
 
         - delete_credentials(self):
             Deletes the stored credentials file, removing any saved login information.
@@ -60,6 +74,9 @@ class Login(ctk.CTkFrame):
 
         - get_user_id(self):
             Retrieves the user ID associated with the authenticated user.
+
+        - get_session(self):
+            Retrieves the session of the authenticated user.
     """
     def __init__(self, parent, controller, user_id):
         ctk.CTkFrame.__init__(self, parent)
@@ -69,6 +86,9 @@ class Login(ctk.CTkFrame):
         sidebar.label("Login")
 
         self.user_id = None
+        self.session = None
+        self.pending_login = None
+        self.scheduler = controller.scheduler
         
         self.login_frame = ctk.CTkFrame(self, fg_color="transparent")
         self.login_frame.grid(row=1, column=1, padx=(20, 20), pady=(20, 20), sticky="nsw")
@@ -103,44 +123,81 @@ class Login(ctk.CTkFrame):
 
     def login(self, controller, storage_class):
         """
-        Handles user authentication.
+        Handles user authentication. The bcrypt check runs on a worker thread while the
+        login button shows a busy state, clicks made while a check is running are ignored.
 
         Parameters:
         - controller: An instance of the application controller used for frame switching.
         - storage_class: The class representing the storage frame in the application.
         """
+        if self.pending_login is not None:
+            return
 
-        checkbox_execute = self.checkbox_var.get()
         username = self.username_entry.get()
         password = self.password_entry.get()
 
-        try:
-            if not username or not password:
-                self.verification_label.configure(text="Please enter username and password",
-                                                  fg_color="red")
-                return
+        if not username or not password:
+            self.verification_label.configure(text="Please enter username and password",
+                                              fg_color="red")
+            return
+
+        self.login_button.configure(state="disabled", text="Logging in...")
+        self.verification_label.configure(text="Checking credentials...", fg_color="transparent")
+        self.pending_login = self.scheduler.watch(
+            auth_service.authenticate_async(username, password), key="login", name="authenticate",
+            on_done=lambda result: self.finish_login(controller, storage_class, username, password, result),
+            on_error=self.login_failed)
+
+    def finish_login(self, controller, storage_class, username, password, result):
+        """
+        Applies the result of the authentication started by login(), called on the Tk thread.
+
+        Parameters:
+        - controller: An instance of the application controller used for frame switching.
+        - storage_class: The class representing the storage frame in the application.
+        - username: The username that is being authenticated.
+        - password: The password that is being authenticated.
+        - result: The AuthResult of the authentication.
+        """
+        self.pending_login = None
+        self.login_button.configure(state="normal", text="Login")
+        checkbox_execute = self.checkbox_var.get()
 
-            with DataBase() as db: 
-                result = db.login_check(username)
-            if result:
-                user_id, hashed_password = result
-                if bcrypt.checkpw(password.encode("utf-8"), hashed_password):
-                    self.save_user_id(user_id)
-                    controller.show_frame(storage_class)
-
-                    # Save credentials if the "Remember Me" checkbox is checked
-                    if checkbox_execute:
-                        self.save_credentials(username, password)
-                    else:
-                        self.delete_credentials()
-                        self.clear_login()
+        try:
+            if result.status == AUTH_OK:
+                self.verification_label.configure(text="", fg_color="transparent")
+                self.save_user_id(result.user_id)
+                self.session = Session(result.user_id, result.encryption_key)
+                self.session.start_format_migration()
+                controller.show_frame(storage_class)
+
+                # Save credentials if the "Remember Me" checkbox is checked
+                if checkbox_execute:
+                    self.scheduler.submit(self.save_credentials, username, password, key="credentials")
                 else:
-                    self.verification_label.configure(text="Invalid password", fg_color="red")
+                    self.delete_credentials()
+                    self.clear_login()
+            elif result.status == AUTH_INVALID_PASSWORD:
+                self.verification_label.configure(text="Invalid password", fg_color="red")
             else:
                 self.verification_label.configure(text="Invalid username", fg_color="red")
         except Exception as e:
-            self.verification_label.configure(text="An error occurred during registration.", fg_color="red")
-            logger.error(f"An error occurred while setting up the database: {e}")
+            self.login_failed(e)
+
+    def login_failed(self, error):
+        """
+        Shows an error when the authentication raised an exception, called on the Tk thread.
+
+        Parameters:
+        - error: The exception raised by the authentication.
+        """
+        self.pending_login = None
+        self.login_button.configure(state="normal", text="Login")
+        if is_lock_error(error):
+            self.verification_label.configure(text="The database is busy, please try again.", fg_color="red")
+        else:
+            self.verification_label.configure(text="An error occurred during login.", fg_color="red")
+        logger.error(f"An error occurred during login: {error}")
 
     @staticmethod
     def save_credentials(username, password):
@@ -157,9 +214,10 @@ class Login(ctk.CTkFrame):
             encryption_key = db.login_retrieve_encryption_key(username)
 
         encryption_manager = EncryptionManager(encryption_key)
-        iv, encrypted_password = encryption_manager.encrypt(password)
+        _, token = encryption_manager.encrypt(password)
 
-        credentials = {"username": username, "password": encrypted_password, "iv": iv}
+        # The binary GCM token is stored as base64 text, an empty iv marks the GCM format
+        credentials = {"username": username, "password": base64.b64encode(token).decode("utf-8"), "iv": ""}
         
         const.CREDENTIALS_FOLDER.mkdir(exist_ok=True)
         with open(const.CREDENTIALS_PATH, "w", encoding="utf-8") as f:
@@ -167,32 +225,51 @@ class Login(ctk.CTkFrame):
 
     def check_credentials_file(self):
         """
-        Checks if there is a stored credentials file. If found, reads the credentials,
-        decrypts the password, and populates the username and password entry fields accordingly.
+        Checks if there is a stored credentials file. If found, the credentials are read and
+        decrypted in the background, then the username and password entry fields are populated.
         Also sets the "Remember Me" checkbox if credentials are loaded successfully.
         """
+        if not const.CREDENTIALS_PATH.is_file():
+            self.checkbox_var.set(False)
+            return
+
+        def fill_fields(credentials):
+            if credentials is None:
+                self.checkbox_var.set(False)
+                return
+            username, decrypted_password = credentials
+            self.username_entry.insert(ctk.END, username)
+            self.password_entry.insert(ctk.END, decrypted_password)
+            self.checkbox_var.set(True)
 
+        self.scheduler.submit(self.load_credentials, key="credentials", on_done=fill_fields)
+
+    @staticmethod
+    def load_credentials():
+        """
+        Reads the stored credentials file and decrypts the password, runs on a worker thread.
+
+        Returns:
+        - A (username, password) tuple, None if there is no credentials file.
+        """
         try:
             with open(const.CREDENTIALS_PATH, "r", encoding="utf-8") as f:
                 credentials = json.load(f)
-                username = credentials.get("username", "")
-                encrypted_password = credentials.get("password", "")
-                # iv = initialization vector.
-                iv = credentials.get("iv", "")
-
-                with DataBase() as db:
-                    encryption_key = db.login_retrieve_encryption_key(username)
-
-                    encryption_manager = EncryptionManager(encryption_key)
-                    decrypted_password = encryption_manager.decrypt(iv, encrypted_password)
+        except FileNotFoundError:
+            return None
 
-                self.username_entry.insert(ctk.END, username)
-                self.password_entry.insert(ctk.END, decrypted_password)
+        username = credentials.get("username", "")
+        encrypted_password = credentials.get("password", "")
+        # iv = initialization vector, only present in credentials saved in the legacy CBC format
+        iv = credentials.get("iv", "")
+        if not iv:
+            encrypted_password = base64.b64decode(encrypted_password)
 
-                self.checkbox_var.set(True)
+        with DataBase() as db:
+            encryption_key = db.login_retrieve_encryption_key(username)
 
-        except FileNotFoundError:
-            self.checkbox_var.set(False)
+        encryption_manager = EncryptionManager(encryption_key)
+        return username, encryption_manager.decrypt(iv, encrypted_password)
 
     @staticmethod
     def delete_credentials():
@@ -231,3 +308,10 @@ class Login(ctk.CTkFrame):
         """
         return self.user_id
 
+    def get_session(self):
+        """
+        Returns:
+        - The session of the authenticated user.
+        """
+        return self.session
+
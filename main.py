@@ -19,6 +19,8 @@ from login import Login
 from register import Register
 from storage import Storage
 from database import DataBase
+from scheduler import TaskScheduler
+from write_behind import write_behind
 import constants as const
 
 ctk.set_appearance_mode("system")
@@ -38,9 +40,12 @@ class MainApp(ctk.CTk):
     Attributes:
         - frames (dict): A dictionary to store instances of different frames
             for switching between windows.
+        - scheduler (TaskScheduler): Runs the background work of every frame and
+            delivers its results on the Tk thread.
 
     Methods:
         show_frame: Displays the specified frame within the Tkinter application.
+        on_close: Stops the background work and closes the window.
         setup_database: Sets up the SQLite database for user registration.
 
     Usage:
@@ -55,6 +60,9 @@ class MainApp(ctk.CTk):
         self.title(const.APP_NAME)
         self.geometry("960x540")
         self.resizable(False, False)
+        # Created before the frames, which submit their background work to it
+        self.scheduler = TaskScheduler(self)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         container = ctk.CTkFrame(self)
         container.grid()
@@ -85,9 +93,10 @@ class MainApp(ctk.CTk):
         Behavior:
             - If switching to the "Storage" frame, pass the user_id
                 to generate user data buttons inside the scrollable frame.
-            - Calls the `set_user_id` method on the target frame to set the user_id.
-            - Calls the `create_account_buttons` method on the "Storage" frame
-                to generate account buttons.
+            - Calls the `set_user_id` and `set_session` methods on the target frame to set
+                the user_id and the session holding the cached encryption key.
+            - Calls the `refresh_account_buttons` method on the "Storage" frame, which loads
+                the account buttons or applies only the entries changed since they were loaded.
             - Raises the specified frame to the front.
 
         Args:
@@ -100,11 +109,25 @@ class MainApp(ctk.CTk):
         if window == "Storage":
             user_id = self.frames["Login"].get_user_id()
             frame.set_user_id(user_id)
-            self.frames["Storage"].create_account_buttons()
+            frame.set_session(self.frames["Login"].get_session())
+            self.frames["Storage"].refresh_account_buttons()
 
         frame.tkraise()
 
+    def on_close(self):
+        """
+        Stops the task scheduler, writes the buffered saves and closes the application window. The scheduler
+        finishes the saves and deletes still on its write lane first, so the flush below writes all of them.
+        """
+        self.scheduler.shutdown()
+        write_behind.flush()
+        self.destroy()
+
 
 if __name__ == "__main__":
-    app = MainApp()
+    try:
+        app = MainApp()
+    except RuntimeError as e:
+        # A database that could not be migrated is not opened, the queries would fail on the old schema
+        raise SystemExit(f"{const.APP_NAME} cannot start: {e}")
     app.mainloop()
@@ -0,0 +1,231 @@
+"""
+migrations.py
+
+This module holds the versioned schema migrations of the password manager database. The schema version is
+stored inside the database with `PRAGMA user_version`, every migration that is newer than the stored version
+is applied inside its own transaction and bumps the version when it succeeds. Existing database files are
+upgraded in place.
+
+Functions:
+    - migrate(connection): Applies every pending migration to the given connection.
+    - schema_version(connection): Returns the schema version stored inside the database.
+
+Module Constants:
+    - MIGRATIONS: Ordered list of (version, description, function) tuples.
+    - LATEST_VERSION: The schema version reached after every migration is applied.
+"""
+import logging
+import sqlite3
+import constants as const
+
+logging.basicConfig(level=logging.INFO, filename=const.LOGGING_PATH,
+                    format="%(asctime)s -  %(levelname)s - Module: %(module)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def _create_tables_and_indexes(cursor):
+    """
+    Version 1: creates the Users and UserData tables and the indexes used by every lookup.
+
+    Older versions checked a username before inserting it, so two registrations racing each other could store
+    the same username twice. Such a file is refused with the duplicate usernames named, merging or renaming
+    them is left to the owner because each one has its own entries and password.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username VARCHAR(256) NOT NULL,
+            password VARCHAR(256) NOT NULL,
+            encryption_key BLOB
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS UserData (
+            entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entry_name VARCHAR(256),
+            entry_username VARCHAR(256),
+            entry_password VARCHAR(256),
+            entry_website VARCHAR(256),
+            iv BLOB,
+            User_id INTEGER,
+            FOREIGN KEY (User_id) REFERENCES Users(id)
+        )
+    """)
+    cursor.execute("SELECT username FROM Users GROUP BY username HAVING count(*) > 1")
+    duplicates = [row[0] for row in cursor.fetchall()]
+    if duplicates:
+        raise sqlite3.IntegrityError(f"Usernames stored more than once, rename or remove the extra accounts: "
+                                     f"{', '.join(duplicates)}")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON Users(username)")
+    # entry_id is the rowid, so this index also covers the account listing of a user
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_userdata_user_entry ON UserData(User_id, entry_name)")
+
+
+def _index_legacy_entries(cursor):
+    """
+    Version 2: indexes the entries still stored in the legacy CBC format, GCM entries have no IV.
+    """
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_userdata_legacy ON UserData(User_id) WHERE iv IS NOT NULL")
+
+
+def _add_bcrypt_cost(cursor):
+    """
+    Version 3: stores the bcrypt cost of each user, existing rows take it from their hash ($2b$<cost>$...).
+    """
+    cursor.execute("ALTER TABLE Users ADD COLUMN bcrypt_cost INTEGER")
+    cursor.execute("UPDATE Users SET bcrypt_cost = CAST(substr(password, 5, 2) AS INTEGER)")
+
+
+def _create_search_index(cursor):
+    """
+    Version 4: creates the UserDataSearch FTS5 index over the entry metadata, keeps it in sync with triggers
+    and backfills the existing entries with the FTS5 'rebuild' command. The backfill runs in the migration's
+    transaction, so other connections wait for it and a crash redoes it from the start, the index is never
+    left half built.
+
+    The index is an external content table, it stores no copy of the metadata, only the tokens. The trigram
+    tokenizer matches substrings anywhere in a field, SQLite builds older than 3.34 fall back to unicode61.
+    """
+    for tokenizer in ("trigram", "unicode61 remove_diacritics 2"):
+        try:
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE UserDataSearch USING fts5(
+                    entry_name, entry_username, entry_website, User_id UNINDEXED,
+                    content='UserData', content_rowid='entry_id', tokenize='{tokenizer}'
+                )
+            """)
+            break
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 tokenizer {tokenizer} is not available: {e}")
+    else:
+        raise sqlite3.OperationalError("No FTS5 tokenizer is available.")
+
+    cursor.execute("""
+        CREATE TRIGGER UserDataSearch_insert AFTER INSERT ON UserData BEGIN
+            INSERT INTO UserDataSearch (rowid, entry_name, entry_username, entry_website, User_id)
+            VALUES (new.entry_id, new.entry_name, new.entry_username, new.entry_website, new.User_id);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER UserDataSearch_delete AFTER DELETE ON UserData BEGIN
+            INSERT INTO UserDataSearch (UserDataSearch, rowid, entry_name, entry_username, entry_website, User_id)
+            VALUES ('delete', old.entry_id, old.entry_name, old.entry_username, old.entry_website, old.User_id);
+        END
+    """)
+    # Password and format migration updates do not touch the indexed columns and skip this trigger
+    cursor.execute("""
+        CREATE TRIGGER UserDataSearch_update
+        AFTER UPDATE OF entry_name, entry_username, entry_website, User_id ON UserData BEGIN
+            INSERT INTO UserDataSearch (UserDataSearch, rowid, entry_name, entry_username, entry_website, User_id)
+            VALUES ('delete', old.entry_id, old.entry_name, old.entry_username, old.entry_website, old.User_id);
+            INSERT INTO UserDataSearch (rowid, entry_name, entry_username, entry_website, User_id)
+            VALUES (new.entry_id, new.entry_name, new.entry_username, new.entry_website, new.User_id);
+        END
+    """)
+
+    # Indexes every row of the content table in one statement
+    cursor.execute("INSERT INTO UserDataSearch (UserDataSearch) VALUES ('rebuild')")
+    logger.info("Full-text index backfilled from the existing entries.")
+
+
+def _create_change_tracking(cursor):
+    """
+    Version 5: tracks the changes to the entries of each user. UserDataVersion holds a per user version that
+    every inserted, updated or deleted entry increments, UserDataChanges holds per entry the version of its
+    latest change. A client that loaded the entries at version V reloads only the entries changed after V.
+
+    Existing entries start at version 0, a client without a version loads every entry anyway.
+    """
+    cursor.execute("""
+        CREATE TABLE UserDataVersion (
+            User_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    # One row per entry ever changed, the row of a deleted entry tells clients to remove it
+    cursor.execute("""
+        CREATE TABLE UserDataChanges (
+            User_id INTEGER NOT NULL,
+            entry_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (User_id, entry_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX UserDataChanges_version ON UserDataChanges (User_id, version)")
+
+    for event, row in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+        cursor.execute(f"""
+            CREATE TRIGGER UserDataChanges_{event.lower()} AFTER {event} ON UserData BEGIN
+                INSERT INTO UserDataVersion (User_id, version) VALUES ({row}.User_id, 1)
+                ON CONFLICT (User_id) DO UPDATE SET version = version + 1;
+                INSERT INTO UserDataChanges (User_id, entry_id, version)
+                VALUES ({row}.User_id, {row}.entry_id,
+                        (SELECT version FROM UserDataVersion WHERE User_id = {row}.User_id))
+                ON CONFLICT (User_id, entry_id) DO UPDATE SET version = excluded.version;
+            END
+        """)
+
+
+MIGRATIONS = [
+    (1, "create tables and lookup indexes", _create_tables_and_indexes),
+    (2, "index legacy CBC entries", _index_legacy_entries),
+    (3, "store the bcrypt cost of each user", _add_bcrypt_cost),
+    (4, "full-text index over the entry metadata", _create_search_index),
+    (5, "change tracking of the entries of each user", _create_change_tracking),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(connection):
+    """
+    Returns the schema version stored inside the database.
+
+    Parameters:
+        connection (sqlite3.Connection): An open connection to the database.
+
+    Returns:
+        int: The value of `PRAGMA user_version`.
+    """
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(connection):
+    """
+    Applies every migration newer than the stored schema version.
+
+    Each migration runs inside its own transaction, a failing migration is rolled back and its exception
+    is raised again so the database is never left half upgraded. The version is read again once the write
+    lock is held, so a migration another process applied meanwhile is skipped instead of run twice.
+
+    Parameters:
+        connection (sqlite3.Connection): A connection opened with isolation_level=None.
+
+    Returns:
+        int: The schema version after the migrations were applied.
+    """
+    current_version = schema_version(connection)
+    cursor = connection.cursor()
+
+    for version, description, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            current_version = schema_version(connection)
+            if version <= current_version:
+                cursor.execute("COMMIT")
+                continue
+            migration(cursor)
+            # PRAGMA does not accept bound parameters, version is always an int from MIGRATIONS
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+
+        current_version = version
+        logger.info(f"Database migrated to version {version}: {description}")
+
+    return current_version
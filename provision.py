@@ -0,0 +1,141 @@
+"""
+Bulk User Provisioning
+
+This module is a headless command that registers many users at once from a CSV or JSON file,
+without going through the Register frame one user at a time.
+
+- Usernames are checked for existence with set based queries instead of one query per user.
+- Passwords are hashed with bcrypt in parallel on a process pool, at the calibrated cost.
+- Encryption keys are generated in a single batch.
+- Users are inserted in one transaction, a user that fails is reported without aborting the batch.
+
+Input formats:
+    CSV: a header row with the columns "username" and "password".
+    JSON: a list of objects with the keys "username" and "password".
+
+Usage:
+    python provision.py users.csv
+    python provision.py users.json --workers 8
+"""
+import argparse
+import csv
+import json
+import logging
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import bcrypt
+import constants as const
+from auth import target_cost
+from database import DataBase
+
+logging.basicConfig(level=logging.INFO, filename=const.LOGGING_PATH,
+                    format="%(asctime)s -  %(levelname)s - Module: %(module)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+KEY_SIZE = 32
+
+
+def load_users(path, file_format=None):
+    """
+    Reads the users to provision from a CSV or JSON file.
+
+    Parameters:
+        path (Path): The input file.
+        file_format (str): "csv" or "json", taken from the file extension when None.
+
+    Returns:
+        list: List of (username, password) tuples.
+    """
+    file_format = file_format or path.suffix.lstrip(".").lower()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if file_format == "json":
+            records = json.load(f)
+        elif file_format == "csv":
+            records = list(csv.DictReader(f))
+        else:
+            raise ValueError(f"Unsupported input format: {file_format}")
+    return [(record.get("username") or "", record.get("password") or "") for record in records]
+
+
+def hash_password(password, cost):
+    """
+    Hashes a password with bcrypt, runs inside the worker processes.
+    """
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(cost))
+
+
+def provision(users, workers=None):
+    """
+    Registers a batch of users.
+
+    Parameters:
+        users (list): List of (username, password) tuples.
+        workers (int): Number of hashing processes, defaults to the number of CPUs.
+
+    Returns:
+        list: List of (username, status) tuples in input order, status is "ok" or the reason it failed.
+    """
+    statuses = [None] * len(users)
+    candidates = {}
+    for row, (username, password) in enumerate(users):
+        if not username or not password:
+            statuses[row] = "missing username or password"
+        elif username in candidates:
+            statuses[row] = "duplicate username in input"
+        else:
+            candidates[username] = row
+
+    with DataBase() as db:
+        existing = db.register_existing_usernames(candidates)
+    for username in existing:
+        statuses[candidates.pop(username)] = "username already exists"
+
+    if candidates:
+        cost = target_cost()
+        start = time.perf_counter()
+        hashed_users = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(username, pool.submit(hash_password, users[row][1], cost))
+                       for username, row in candidates.items()]
+            for username, future in futures:
+                try:
+                    hashed_users.append((username, future.result()))
+                except Exception as e:
+                    statuses[candidates[username]] = f"hashing failed: {e}"
+        logger.info(f"Hashed {len(hashed_users)} passwords at cost {cost} in {time.perf_counter() - start:.2f}s")
+
+        keys = secrets.token_bytes(KEY_SIZE * len(hashed_users))
+        rows = [(username, hashed_password, keys[i * KEY_SIZE:(i + 1) * KEY_SIZE], cost)
+                for i, (username, hashed_password) in enumerate(hashed_users)]
+
+        with DataBase() as db:
+            skipped = db.register_users_many(rows)
+        for username, _ in hashed_users:
+            statuses[candidates[username]] = "username already exists" if username in skipped else "ok"
+
+    results = [(username, status) for (username, _), status in zip(users, statuses)]
+    logger.info(f"Provisioned {sum(status == 'ok' for _, status in results)} users, "
+                f"{sum(status != 'ok' for _, status in results)} failed.")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registers many users at once from a CSV or JSON file.")
+    parser.add_argument("input", type=Path, help="CSV or JSON file with username and password fields")
+    parser.add_argument("--format", choices=["csv", "json"], help="input format, defaults to the file extension")
+    parser.add_argument("--workers", type=int, help="number of hashing processes, defaults to the CPU count")
+    args = parser.parse_args()
+
+    results = provision(load_users(args.input, args.format), args.workers)
+    failures = [(username, status) for username, status in results if status != "ok"]
+    for username, status in failures:
+        print(f"{username or '<empty>'}: {status}")
+    print(f"{len(results) - len(failures)} users provisioned, {len(failures)} failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
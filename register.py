@@ -4,19 +4,18 @@ Register Module
 This module defines the Register class, which represents the registration form
 for user accounts. It utilizes the customtkinter library for GUI components
 and integrates with SQLite for user data storage. User passwords are hashed
-using the bcrypt library for security.
+using the bcrypt library for security, on a worker thread through the auth module.
 
 Classes:
     Register: A customtkinter frame for user registration.
 """
 
 import customtkinter as ctk
-import bcrypt
 import logging
 import constants as const
 from sidebar import SideBarFrame
-from database import DataBase
-import secrets
+from auth import auth_service, REGISTER_USERNAME_EXISTS
+from database import is_lock_error
 
 
 logging.basicConfig(level=logging.INFO, filename=const.LOGGING_PATH,
@@ -42,7 +41,9 @@ class Register(ctk.CTkFrame):
         - verification_label (ctk.CTkLabel): Label for displaying error messages during registration.
 
     Methods:
-        - button_register_event: Handles the registration process.
+        - button_register_event: Validates the input and starts the registration.
+        - finish_registration: Shows the result of the registration.
+        - registration_failed: Shows an error when the registration failed.
         - reveal_password: Toggles the visibility of password.
     """
     def __init__(self, parent, controller, user_id):
@@ -53,6 +54,8 @@ class Register(ctk.CTkFrame):
         sidebar.grid(row=0, column=0, rowspan=4, sticky="ns")
         sidebar.label("Register Form")
         self.cursor = None
+        self.pending_registration = None
+        self.scheduler = controller.scheduler
 
         self.back_to_login = ctk.CTkButton(sidebar.frame, text="Back To Login",
                                            command=lambda: controller.show_frame("Login"))
@@ -95,46 +98,66 @@ class Register(ctk.CTkFrame):
 
         - Retrieves the entered username and passwords
         - validates the inputs
-        - checks for existing usernames
-        - registers a new user if the inputs are valid and the username is not already taken.
+        - starts the registration on a worker thread, which checks for existing usernames
+          and registers the new user if the username is not already taken.
 
-        Raises:
-            Exception: An error occurred during the registration process.
+        Clicks made while a registration is running are ignored.
 
         Note:
             - This method assumes the existence of the "Users" table in the database.
             - Passwords are hashed using bcrypt before being stored in the database.
             - This methode assigns the user an encryption key to the password
         """
+        if self.pending_registration is not None:
+            return
+
         username = self.username.get()
         password = self.password.get()
         repeat_password = self.repeat_password.get()
 
-        try:
-            if not all((username, password, repeat_password)):
-                self.verification_label.configure(text="Please fill in all fields", fg_color="red")
-                return
-
-            if password != repeat_password:
-                self.verification_label.configure(text="Passwords do not match", fg_color="red")
-                return
-
-            with DataBase() as db:
-                if db.register_check_username(username):
-                    self.verification_label.configure(text="Username already exists", fg_color="red")
-                else:
-                    encoded_password = password.encode("utf-8")
-                    hashed_password = bcrypt.hashpw(encoded_password, bcrypt.gensalt())
-                    encryption_key = secrets.token_bytes(32)
-
-                    db.register_user(username, hashed_password, encryption_key)
-                    
-                    self.verification_label.configure(text="Account has been created", fg_color="green")
-                    logger.info(f"A new user: {username} has signed up.")
-
-        except Exception as e:
+        if not all((username, password, repeat_password)):
+            self.verification_label.configure(text="Please fill in all fields", fg_color="red")
+            return
+
+        if password != repeat_password:
+            self.verification_label.configure(text="Passwords do not match", fg_color="red")
+            return
+
+        self.button_register.configure(state="disabled", text="Registering...")
+        self.verification_label.configure(text="Creating account...", fg_color="transparent")
+        self.pending_registration = self.scheduler.watch(
+            auth_service.register_async(username, password), key="register", name="register",
+            on_done=self.finish_registration, on_error=self.registration_failed)
+
+    def finish_registration(self, status):
+        """
+        Shows the result of the registration started by button_register_event(), called on the Tk thread.
+
+        Parameters:
+            status: REGISTER_OK, or REGISTER_USERNAME_EXISTS if the username is already taken.
+        """
+        self.pending_registration = None
+        self.button_register.configure(state="normal", text="Register")
+
+        if status == REGISTER_USERNAME_EXISTS:
+            self.verification_label.configure(text="Username already exists", fg_color="red")
+        else:
+            self.verification_label.configure(text="Account has been created", fg_color="green")
+
+    def registration_failed(self, error):
+        """
+        Shows an error when the registration raised an exception, called on the Tk thread.
+
+        Parameters:
+            error: The exception raised during the registration process.
+        """
+        self.pending_registration = None
+        self.button_register.configure(state="normal", text="Register")
+        if is_lock_error(error):
+            self.verification_label.configure(text="The database is busy, please try again.", fg_color="red")
+        else:
             self.verification_label.configure(text="An error occurred during registration.", fg_color="red")
-            logger.error(f"An error occurred while setting up the database: {e}")
+        logger.error(f"An error occurred while setting up the database: {error}")
 
     def reveal_password(self):
         """
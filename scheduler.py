@@ -0,0 +1,295 @@
+"""
+scheduler.py
+
+This module defines the TaskScheduler shared by every frame of the application. Database, crypto and clipboard
+work is submitted to a thread pool so it never runs inside a Tk callback, and its result is handed back to a
+callback on the Tk thread, where widgets may be touched.
+
+Tk is not thread safe, so workers never call into it: finished tasks are queued and a single `after()` timer
+drains the queue while tasks are outstanding.
+
+A task may carry a key. Submitting a new task with the key of an unfinished one cancels the old task, a task
+that already runs is left to finish but its result is dropped. With coalesce=True an identical request (same
+function and arguments) joins the unfinished task instead, so a burst of identical requests runs once.
+Keys are meant for reads, whose superseded results can be dropped.
+
+Writes are submitted with serial=True and run one at a time on a separate write lane, in the order they were
+submitted, so two saves of one entry, or a save and a delete, never run at the same time or finish out of
+order.
+
+Classes:
+    - Task: A job submitted to the scheduler.
+    - TaskScheduler: Runs jobs on a thread pool and delivers their results on the Tk thread.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import constants as const
+
+logging.basicConfig(level=logging.INFO, filename=const.LOGGING_PATH,
+                    format="%(asctime)s -  %(levelname)s - Module: %(module)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+class Task:
+    """
+    A job submitted to the scheduler.
+
+    Attributes:
+        name (str): Name the latency statistics of the task are grouped under.
+        key (hashable): Cancellation and coalescing key, None for an independent task.
+        signature (tuple): The function and arguments, compared when coalescing.
+        future (concurrent.futures.Future): The future of the running job.
+        callbacks (list): (on_done, on_error) pairs called on the Tk thread.
+        submitted_at (float): time.monotonic() at submission.
+        started_at (float): time.monotonic() when a worker picked the job up, None while queued.
+        finished_at (float): time.monotonic() when the job returned, None until then.
+        cancelled (bool): True once the task was cancelled, its callbacks are never called.
+    """
+    def __init__(self, name, key, signature, callbacks, owns_future=True):
+        self.name = name
+        self.key = key
+        self.signature = signature
+        self.future = None
+        self.callbacks = callbacks
+        self.owns_future = owns_future
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Cancels the task, a queued job is removed from the pool and the result of a running one is dropped.
+        A watched future belongs to its caller and is left alone.
+        """
+        self.cancelled = True
+        if self.owns_future and self.future is not None:
+            self.future.cancel()
+
+
+class TaskScheduler:
+    """
+    Runs jobs on a thread pool and delivers their results on the Tk thread.
+
+    Attributes:
+        root (tkinter.Misc): The widget whose `after()` timer delivers the results.
+        workers (int): Number of worker threads.
+        poll_interval_ms (int): Interval (ms) at which finished tasks are delivered.
+
+    Methods:
+        submit(function, *args, key, coalesce, on_done, on_error, name, serial): Runs a function on the pool,
+            or on the write lane.
+        watch(future, key, on_done, on_error, name): Delivers the result of a future started elsewhere.
+        cancel(key): Cancels the unfinished task with the given key.
+        stats(): Returns the queue depth, counters and per task latencies.
+        shutdown(): Finishes the queued writes, cancels every other task and stops the worker threads.
+    """
+    def __init__(self, root, workers=const.SCHEDULER_WORKERS, poll_interval_ms=const.SCHEDULER_POLL_INTERVAL_MS):
+        self.root = root
+        self.workers = workers
+        self.poll_interval_ms = poll_interval_ms
+        self._executor = None
+        self._write_executor = None
+        self._pending = set()
+        self._keyed = {}
+        # Appended to by worker threads, drained on the Tk thread
+        self._finished = deque()
+        self._drain_id = None
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "coalesced": 0}
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args, key=None, coalesce=False, on_done=None, on_error=None, name=None,
+               serial=False):
+        """
+        Runs a function with the given arguments on the thread pool. Must be called on the Tk thread.
+
+        Parameters:
+            function (callable): The job, it must not touch any widget.
+            *args: Arguments passed to the function.
+            key (hashable): Cancels, or with coalesce joins, the unfinished task with the same key.
+            coalesce (bool): Join an unfinished task with the same key, function and arguments.
+            on_done (callable): Called on the Tk thread with the return value of the function.
+            on_error (callable): Called on the Tk thread with the exception raised by the function,
+                the exception is logged when no on_error is given.
+            name (str): Name of the task in the statistics, defaults to the function name.
+            serial (bool): Run the function on the write lane, after every serial task submitted before it.
+
+        Returns:
+            Task: The submitted task, or the unfinished task it was coalesced into.
+        """
+        signature = (function, args)
+        current = self._keyed.get(key) if key is not None else None
+        if current is not None and coalesce and current.signature == signature and not current.cancelled:
+            current.callbacks.append((on_done, on_error))
+            self._counters["coalesced"] += 1
+            return current
+
+        task = Task(name or getattr(function, "__name__", "task"), key, signature, [(on_done, on_error)])
+        if serial:
+            if self._write_executor is None:
+                self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scheduler-write")
+            task.future = self._write_executor.submit(self._run, task, function, args)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scheduler")
+            task.future = self._executor.submit(self._run, task, function, args)
+        self._track(task)
+        return task
+
+    def watch(self, future, key=None, on_done=None, on_error=None, name="watched"):
+        """
+        Delivers the result of a concurrent.futures.Future started elsewhere, such as by the AuthService,
+        on the Tk thread. Must be called on the Tk thread.
+
+        Returns:
+            Task: The task delivering the future's result.
+        """
+        task = Task(name, key, None, [(on_done, on_error)], owns_future=False)
+        task.future = future
+        self._track(task)
+        return task
+
+    def _track(self, task):
+        """
+        Registers a new task under its key, cancelling the task it replaces, and starts the delivery timer.
+        """
+        if task.key is not None:
+            replaced = self._keyed.get(task.key)
+            if replaced is not None and not replaced.cancelled:
+                replaced.cancel()
+                self._counters["cancelled"] += 1
+            self._keyed[task.key] = task
+
+        self._pending.add(task)
+        self._counters["submitted"] += 1
+        task.future.add_done_callback(lambda future: self._finished.append(task))
+        if self._drain_id is None:
+            self._drain_id = self.root.after(self.poll_interval_ms, self._drain)
+
+    @staticmethod
+    def _run(task, function, args):
+        """
+        Runs a job on a worker thread and records when it started and finished.
+        """
+        task.started_at = time.monotonic()
+        try:
+            return function(*args)
+        finally:
+            task.finished_at = time.monotonic()
+
+    def _drain(self):
+        """
+        Delivers every finished task on the Tk thread, and keeps polling while tasks are outstanding.
+        """
+        self._drain_id = None
+        while self._finished:
+            task = self._finished.popleft()
+            self._pending.discard(task)
+            if task.key is not None and self._keyed.get(task.key) is task:
+                del self._keyed[task.key]
+            if task.cancelled:
+                continue
+            self._deliver(task)
+
+        if self._pending:
+            self._drain_id = self.root.after(self.poll_interval_ms, self._drain)
+
+    def _deliver(self, task):
+        """
+        Calls the callbacks of a finished task and records its latencies.
+        """
+        error = task.future.exception()
+        self._counters["failed" if error is not None else "completed"] += 1
+        self._record_latency(task)
+
+        for on_done, on_error in task.callbacks:
+            try:
+                if error is None:
+                    if on_done is not None:
+                        on_done(task.future.result())
+                elif on_error is not None:
+                    on_error(error)
+                else:
+                    logger.error(f"Task {task.name} failed: {error!r}")
+            except Exception as e:
+                logger.error(f"Callback of task {task.name} failed: {e!r}")
+
+    def _record_latency(self, task):
+        """
+        Adds the queue wait, run time and total time of a delivered task to the statistics of its name,
+        and logs a task whose result took longer than const.SCHEDULER_SLOW_TASK_MS to arrive.
+        """
+        delivered_at = time.monotonic()
+        started_at = task.started_at or task.submitted_at
+        finished_at = task.finished_at or delivered_at
+        wait, run, total = started_at - task.submitted_at, finished_at - started_at, delivered_at - task.submitted_at
+
+        with self._lock:
+            latency = self._latencies.setdefault(task.name, {"count": 0, "wait": 0.0, "run": 0.0, "total": 0.0,
+                                                             "max_total": 0.0})
+            latency["count"] += 1
+            latency["wait"] += wait
+            latency["run"] += run
+            latency["total"] += total
+            latency["max_total"] = max(latency["max_total"], total)
+
+        if total * 1000 > const.SCHEDULER_SLOW_TASK_MS:
+            logger.warning(f"Slow task {task.name}: {total * 1000:.0f}ms (queued {wait * 1000:.0f}ms, "
+                           f"ran {run * 1000:.0f}ms)")
+
+    def cancel(self, key):
+        """
+        Cancels the unfinished task with the given key, if there is one.
+        """
+        task = self._keyed.pop(key, None)
+        if task is not None and not task.cancelled:
+            task.cancel()
+            self._counters["cancelled"] += 1
+
+    def stats(self):
+        """
+        Returns the scheduler statistics.
+
+        Returns:
+            dict: The number of queued and running tasks, the task counters, and per task name the mean
+                queue wait, mean run time, mean and max time to delivery in milliseconds.
+        """
+        queued = sum(1 for task in self._pending if task.started_at is None and not task.future.done())
+        running = sum(1 for task in self._pending if task.started_at is not None and task.finished_at is None)
+        with self._lock:
+            latencies = {
+                name: {
+                    "count": latency["count"],
+                    "mean_wait_ms": latency["wait"] / latency["count"] * 1000,
+                    "mean_run_ms": latency["run"] / latency["count"] * 1000,
+                    "mean_total_ms": latency["total"] / latency["count"] * 1000,
+                    "max_total_ms": latency["max_total"] * 1000,
+                }
+                for name, latency in self._latencies.items()
+            }
+        return {"queue_depth": queued, "running": running, **self._counters, "latency": latencies}
+
+    def shutdown(self):
+        """
+        Runs every write still on the write lane, then cancels every other outstanding task and stops the
+        worker threads, running jobs are allowed to finish. Blocks until the queued writes are done.
+        """
+        # A write is never dropped, even when the window closes right after a save
+        if self._write_executor is not None:
+            self._write_executor.shutdown(wait=True)
+            self._write_executor = None
+        for task in list(self._pending):
+            task.cancel()
+        self._pending.clear()
+        self._keyed.clear()
+        if self._drain_id is not None:
+            self.root.after_cancel(self._drain_id)
+            self._drain_id = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        logger.info(f"Task scheduler stopped with stats: {self.stats()}")
@@ -0,0 +1,67 @@
+"""
+bulk_insert_benchmark.py
+
+Measures the throughput of the batch insert API against one-row-per-transaction inserts on a scratch
+database, for several chunk sizes.
+
+Usage:
+    python scripts/bulk_insert_benchmark.py --rows 5000 --chunk-sizes 1 100 500 2000
+"""
+import argparse
+import secrets
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import constants as const  # noqa: E402
+
+
+def use_scratch_database(folder):
+    """
+    Points the database constants at a scratch folder so the real vault is never touched.
+    """
+    const.DATABASE_FOLDER = Path(folder)
+    const.DATABASE_PATH = const.DATABASE_FOLDER / const.DATABASE_NAME
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[1, 100, const.BATCH_CHUNK_SIZE, 2000])
+    parser.add_argument("--profile", choices=sorted(const.SQLITE_PROFILES), default=const.SQLITE_PROFILE)
+    args = parser.parse_args()
+
+    use_scratch_database(tempfile.mkdtemp())
+    const.SQLITE_PROFILE = args.profile
+
+    from database import DataBase
+    from encryption import EncryptionManager
+
+    key = secrets.token_bytes(32)
+    with DataBase() as db:
+        db.register_user("benchmark", b"hash", key)
+        user_id = db.login_check("benchmark")[0]
+    encryption_manager = EncryptionManager(key)
+    entries = [(f"Entry {i}", f"user{i}", secrets.token_urlsafe(12), f"site{i}.com") for i in range(args.rows)]
+
+    start = time.perf_counter()
+    for name, username, password, website in entries:
+        with DataBase() as db:
+            iv, encrypted_password = encryption_manager.encrypt(password)
+            db.generator_save_user_data((name, username, encrypted_password, website, iv, user_id))
+    elapsed = time.perf_counter() - start
+    print(f"one transaction per row: {args.rows / elapsed:10.0f} rows/s")
+
+    for chunk_size in args.chunk_sizes:
+        start = time.perf_counter()
+        with DataBase() as db:
+            db.generator_save_user_data_many(entries, user_id, encryption_manager, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        print(f"batch, chunk size {chunk_size:5}: {args.rows / elapsed:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
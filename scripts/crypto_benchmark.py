@@ -0,0 +1,63 @@
+"""
+crypto_benchmark.py
+
+Measures how EncryptionManager.encrypt_many and decrypt_many scale with the number of workers of the
+thread and process pools, compared to calling encrypt/decrypt in a loop. The pools are long-lived, so each
+one is started and warmed up before it is measured. A speed-up can only show with more than one CPU.
+
+Usage:
+    python scripts/crypto_benchmark.py --items 20000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import secrets
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import constants as const  # noqa: E402
+from encryption import EncryptionManager  # noqa: E402
+
+
+def measure(function, item_count):
+    """
+    Runs a function once and returns the items processed per second.
+    """
+    start = time.perf_counter()
+    function()
+    return item_count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--chunk-size", type=int, default=const.CRYPTO_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    encryption_manager = EncryptionManager(secrets.token_bytes(32))
+    plaintexts = [secrets.token_urlsafe(16) for _ in range(args.items)]
+    pairs = [encryption_manager.encrypt(plaintext) for plaintext in plaintexts]
+
+    print(f"{os.cpu_count()} CPUs, {args.items} items, chunks of {args.chunk_size}")
+    serial_encrypt = measure(lambda: [encryption_manager.encrypt(p) for p in plaintexts], args.items)
+    serial_decrypt = measure(lambda: [encryption_manager.decrypt(iv, ct) for iv, ct in pairs], args.items)
+    print(f"{'serial loop':>16}: encrypt {serial_encrypt:10.0f}/s  decrypt {serial_decrypt:10.0f}/s")
+
+    for executor in ("thread", "process"):
+        for workers in args.workers:
+            encryption_manager.encrypt_many(plaintexts, workers=workers, executor=executor,
+                                            chunk_size=args.chunk_size)
+            encrypt_rate = measure(lambda: encryption_manager.encrypt_many(
+                plaintexts, workers=workers, executor=executor, chunk_size=args.chunk_size), args.items)
+            decrypt_rate = measure(lambda: encryption_manager.decrypt_many(
+                pairs, workers=workers, executor=executor, chunk_size=args.chunk_size), args.items)
+            print(f"{executor:>8} x {workers:<5}: encrypt {encrypt_rate:10.0f}/s ({encrypt_rate / serial_encrypt:4.1f}x)"
+                  f"  decrypt {decrypt_rate:10.0f}/s ({decrypt_rate / serial_decrypt:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+db_stress.py
+
+Runs several processes against one scratch database file, each mixing page reads with entry inserts and
+updates, and reports the throughput, the p50 and p99 latency of reads and writes, and the lock waits,
+retries and failures counted by the DataBase methods.
+
+Usage:
+    python scripts/db_stress.py --processes 8 --duration 10 --write-ratio 0.3
+    python scripts/db_stress.py --processes 8 --busy-timeout 0.1 --retries 5
+"""
+import argparse
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import constants as const  # noqa: E402
+
+
+def use_scratch_database(folder, busy_timeout, retries):
+    """
+    Points the database constants at a scratch folder so the real vault is never touched.
+    """
+    const.DATABASE_FOLDER = Path(folder)
+    const.DATABASE_PATH = const.DATABASE_FOLDER / const.DATABASE_NAME
+    const.DATABASE_BUSY_TIMEOUT = busy_timeout
+    const.DATABASE_LOCK_RETRIES = retries
+
+
+def percentiles(timings):
+    """
+    Returns the p50 and p99 of a list of durations, in milliseconds.
+    """
+    if not timings:
+        return 0.0, 0.0
+    timings = sorted(timings)
+    return timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.99)] * 1000
+
+
+def worker(worker_id, args, user_id, start_at, results):
+    """
+    Reads and writes until the duration has passed, then puts its timings and lock counters on the queue.
+    """
+    use_scratch_database(args.folder, args.busy_timeout, args.retries)
+    from database import DataBase, lock_stats, is_lock_error
+
+    rng = random.Random(args.seed + worker_id)
+    reads, writes, errors = [], [], 0
+    entry_ids = []
+    time.sleep(max(0.0, start_at - time.time()))
+    end = time.monotonic() + args.duration
+
+    while time.monotonic() < end:
+        write = rng.random() < args.write_ratio
+        start = time.perf_counter()
+        try:
+            with DataBase() as db:
+                if not write:
+                    db.storage_fetch_account_page(user_id, limit=50)
+                elif entry_ids and rng.random() < 0.5:
+                    db.storage_update_user_data((f"updated {worker_id}", "user", b"password", "site", None,
+                                                 rng.choice(entry_ids)))
+                else:
+                    entry_ids.append(db.generator_save_user_data(
+                        (f"entry {worker_id} {len(entry_ids)}", "user", b"password", "site", None, user_id)))
+        except Exception as e:
+            if not is_lock_error(e):
+                raise
+            errors += 1
+            continue
+        (writes if write else reads).append(time.perf_counter() - start)
+
+    results.put((reads, writes, errors, lock_stats()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--busy-timeout", type=float, default=const.DATABASE_BUSY_TIMEOUT)
+    parser.add_argument("--retries", type=int, default=const.DATABASE_LOCK_RETRIES)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    args.folder = tempfile.mkdtemp()
+
+    use_scratch_database(args.folder, args.busy_timeout, args.retries)
+    from database import DataBase, close_pool
+    with DataBase() as db:
+        db.register_user("stress", b"hash", b"k" * 32)
+        user_id = db.login_check("stress")[0]
+        db.connection.executemany(
+            "INSERT INTO UserData (entry_name, entry_username, entry_password, entry_website, iv, User_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)", [(f"seed {i}", "user", b"password", "site", None, user_id)
+                                          for i in range(1000)])
+    close_pool()
+
+    results = multiprocessing.Queue()
+    start_at = time.time() + 0.5
+    processes = [multiprocessing.Process(target=worker, args=(i, args, user_id, start_at, results))
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    reads = [timing for outcome in outcomes for timing in outcome[0]]
+    writes = [timing for outcome in outcomes for timing in outcome[1]]
+    errors = sum(outcome[2] for outcome in outcomes)
+    locks = {}
+    for *_, stats in outcomes:
+        for method_name, counters in stats.items():
+            total = locks.setdefault(method_name, dict.fromkeys(counters, 0))
+            for counter, value in counters.items():
+                total[counter] += value
+
+    print(f"{args.processes} processes, {args.duration:.0f}s, write ratio {args.write_ratio}, "
+          f"busy timeout {args.busy_timeout}s, {args.retries} retries")
+    print(f"throughput: {(len(reads) + len(writes)) / args.duration:.0f} ops/s "
+          f"({len(reads)} reads, {len(writes)} writes, {errors} failed on a lock)")
+    for kind, timings in (("reads", reads), ("writes", writes)):
+        p50, p99 = percentiles(timings)
+        print(f"{kind:>7}: p50 {p50:.2f}ms, p99 {p99:.2f}ms")
+    for method_name, counters in sorted(locks.items()):
+        print(f"{method_name:>30}: {counters['lock_waits']} lock waits, {counters['retries']} retries, "
+              f"{counters['failures']} failures, {counters['wait_time']:.2f}s waited")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+fts_benchmark.py
+
+Compares DataBase.search_entries, backed by the UserDataSearch FTS5 index, with a LIKE scan over the same
+entries on scratch databases of several vault sizes.
+
+Usage:
+    python scripts/fts_benchmark.py --sizes 1000 10000 100000 --queries 200
+"""
+import argparse
+import random
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import constants as const  # noqa: E402
+
+SITES = ["github", "gitlab", "google", "amazon", "netflix", "paypal", "reddit", "spotify", "steam", "twitter"]
+
+LIKE_QUERY = ("SELECT entry_id FROM UserData WHERE User_id=? AND (entry_name LIKE ? OR entry_username LIKE ? "
+              "OR entry_website LIKE ?) ORDER BY entry_name, entry_id LIMIT ?")
+
+
+def use_scratch_database(folder):
+    """
+    Points the database constants at a scratch folder so the real vault is never touched.
+    """
+    const.DATABASE_FOLDER = Path(folder)
+    const.DATABASE_PATH = const.DATABASE_FOLDER / const.DATABASE_NAME
+
+
+def random_word(rng, length):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def percentiles(timings):
+    """
+    Returns the p50 and p99 of a list of durations, in milliseconds.
+    """
+    timings = sorted(timings)
+    return timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.99)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    use_scratch_database(tempfile.mkdtemp())
+    from database import DataBase
+
+    rng = random.Random(args.seed)
+    with DataBase() as db:
+        db.register_user("benchmark", b"hash", b"k" * 32)
+        user_id = db.login_check("benchmark")[0]
+
+    entries = []
+    inserted = 0
+    for size in sorted(args.sizes):
+        # Each size adds to the entries of the previous one, the FTS index is kept in sync by its triggers
+        while len(entries) < size:
+            site = rng.choice(SITES)
+            entries.append((f"{site.capitalize()} {random_word(rng, 6)}", f"{random_word(rng, 8)}@mail.com",
+                            "", f"https://{site}.com/{random_word(rng, 4)}", None, user_id))
+        with DataBase() as db:
+            db.connection.executemany(
+                "INSERT INTO UserData (entry_name, entry_username, entry_password, entry_website, iv, User_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)", entries[inserted:])
+        inserted = len(entries)
+
+        # Substrings from the middle of usernames, which a prefix index cannot find
+        queries = [username[2:6] for _, username, *_ in rng.sample(entries, min(args.queries, len(entries)))]
+
+        fts_timings, like_timings = [], []
+        with DataBase() as db:
+            for query in queries:
+                start = time.perf_counter()
+                fts_ids = db.search_entries(user_id, query)
+                fts_timings.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                pattern = f"%{query}%"
+                like_ids = [row[0] for row in db.connection.execute(
+                    LIKE_QUERY, (user_id, pattern, pattern, pattern, const.SEARCH_RESULT_LIMIT))]
+                like_timings.append(time.perf_counter() - start)
+
+                if set(fts_ids) != set(like_ids) and len(like_ids) < const.SEARCH_RESULT_LIMIT:
+                    print(f"  results differ for {query!r}: fts {len(fts_ids)}, like {len(like_ids)}")
+
+        fts_p50, fts_p99 = percentiles(fts_timings)
+        like_p50, like_p99 = percentiles(like_timings)
+        print(f"{size:>8} entries: fts p50 {fts_p50:7.3f}ms p99 {fts_p99:7.3f}ms | "
+              f"like p50 {like_p50:7.3f}ms p99 {like_p99:7.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+query_plan_check.py
+
+Runs every public DataBase method against a scratch database with the latest schema, captures the SQL it
+executes and checks the EXPLAIN QUERY PLAN of each statement. The script exits with a non zero status when
+any statement falls back to a full table scan, so an index regression is caught before it ships.
+
+Usage:
+    python scripts/query_plan_check.py
+"""
+import inspect
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import migrations  # noqa: E402
+from database import DataBase  # noqa: E402
+from encryption import EncryptionManager  # noqa: E402
+
+SAMPLE_ENCRYPTION_MANAGER = EncryptionManager(b"k" * 32)
+
+# Arguments used to exercise every DataBase method against the seeded scratch database
+SAMPLE_CALLS = {
+    "register_check_username": ("alice",),
+    "register_user": ("bob", b"hash", b"k" * 32),
+    "register_existing_usernames": (["alice", "bob"],),
+    "register_users_many": ([("bob", b"hash", b"k" * 32, 12)],),
+    "login_check": ("alice",),
+    "login_update_password_hash": (1, b"hash", 12),
+    "login_retrieve_encryption_key": ("alice",),
+    "generator_save_user_data": (("Github", "alice", "secret", "github.com", "iv", 1),),
+    "generator_save_user_data_many": ([("Gitlab", "alice", "secret", "gitlab.com")], 1,
+                                      SAMPLE_ENCRYPTION_MANAGER),
+    "storage_retrieve_encryption_key": (1,),
+    "storage_create_account_buttons": (1,),
+    "storage_fetch_account_page": (1, ("Github", 1), 10),
+    "storage_iter_account_pages": (1, 1),
+    "storage_fetch_search_fields": (1,),
+    "search_entries": (1, "hub"),
+    "storage_fetch_user_data": ("Github", 1),
+    "storage_update_user_data": (("Github", "alice", "secret", "github.com", "iv", 1),),
+    "storage_update_user_data_many": ([("Github", "alice", "secret", "github.com", 1)],
+                                      SAMPLE_ENCRYPTION_MANAGER),
+    "storage_fetch_legacy_entries": (1, 0, 10),
+    "storage_replace_legacy_entries": ([(b"token", 1, "iv")],),
+    "storage_fetch_details": (1, 1),
+    "storage_delete_details": (1,),
+    "storage_data_version": (1,),
+    "storage_changes_since": (1, 0),
+}
+
+# Methods that are allowed to scan, with the reason they still do
+KNOWN_SCANS = {}
+
+# Methods that are not queries against the vault tables
+SKIPPED_METHODS = {"setup_database", "effective_pragmas", "transaction"}
+
+
+def seed(connection):
+    """
+    Creates the latest schema and a user with a single entry.
+    """
+    migrations.migrate(connection)
+    connection.execute("INSERT INTO Users (username, password, encryption_key) VALUES ('alice', 'hash', 'key')")
+    connection.execute(
+        "INSERT INTO UserData (entry_name, entry_username, entry_password, entry_website, iv, User_id) "
+        "VALUES ('Github', 'alice', 'secret', 'github.com', 'iv', 1)"
+    )
+
+
+def capture_statements(connection, method, args):
+    """
+    Calls a DataBase method on the given connection and returns the SQL statements it executed.
+    """
+    statements = []
+    database = DataBase()
+    database.connection = connection
+    connection.set_trace_callback(statements.append)
+    try:
+        result = getattr(database, method)(*args)
+        # Generator methods only run their queries when consumed
+        if inspect.isgenerator(result):
+            list(result)
+    finally:
+        connection.set_trace_callback(None)
+    return [statement for statement in statements
+            if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT", "WITH"))]
+
+
+def table_scans(connection, statement):
+    """
+    Returns the EXPLAIN QUERY PLAN lines of a statement that scan a whole table. Virtual table lookups are
+    answered by the FTS5 index and schema lookups read the small sqlite_master table, neither is reported.
+    """
+    plan = connection.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+    return [detail for *_, detail in plan
+            if detail.startswith("SCAN ") and detail != "SCAN CONSTANT ROW"
+            and "VIRTUAL TABLE" not in detail and detail not in ("SCAN sqlite_master", "SCAN sqlite_schema")]
+
+
+def public_methods():
+    """
+    Returns the names of every public DataBase method that should be checked.
+    """
+    return sorted(name for name in vars(DataBase)
+                  if not name.startswith("_") and callable(getattr(DataBase, name))
+                  and name not in SKIPPED_METHODS)
+
+
+def main():
+    failures = []
+    for method in public_methods():
+        if method not in SAMPLE_CALLS:
+            failures.append(f"{method}: no sample call, add one to SAMPLE_CALLS")
+            continue
+
+        connection = sqlite3.connect(":memory:", isolation_level=None)
+        seed(connection)
+        for statement in capture_statements(connection, method, SAMPLE_CALLS[method]):
+            scans = table_scans(connection, statement)
+            if not scans:
+                print(f"ok    {method}")
+            elif method in KNOWN_SCANS:
+                print(f"known {method}: {', '.join(scans)} ({KNOWN_SCANS[method]})")
+            else:
+                failures.append(f"{method}: {', '.join(scans)} in {statement.strip()}")
+        connection.close()
+
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+search_benchmark.py
+
+Measures the build time of the Storage search index, the latency of prefix searches over synthetic entries
+and the cost of updating one entry. A short prefix matching thousands of entries sorts or walks all of its
+matches, so the tail latency is set by the broadest queries.
+
+Usage:
+    python scripts/search_benchmark.py --entries 100000 --queries 2000
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from search_index import PrefixIndex  # noqa: E402
+
+SITES = ["github", "gitlab", "google", "amazon", "netflix", "paypal", "reddit", "spotify", "steam", "twitter"]
+
+
+def random_word(rng, length):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def synthetic_entries(count, rng):
+    """
+    Yields (entry_id, name, username, website) tuples resembling real vault entries.
+    """
+    for entry_id in range(1, count + 1):
+        site = rng.choice(SITES)
+        name = f"{site.capitalize()} {random_word(rng, 6)}"
+        username = f"{random_word(rng, 8)}@{random_word(rng, 5)}.com"
+        yield entry_id, name, username, f"https://{site}.com/{random_word(rng, 4)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = list(synthetic_entries(args.entries, rng))
+
+    index = PrefixIndex()
+    start = time.perf_counter()
+    index.build(rows)
+    print(f"built index of {len(index)} entries ({len(index.words)} words) in {time.perf_counter() - start:.2f}s")
+
+    # Queries as typed one character at a time: short prefixes match many entries, long ones few
+    queries = []
+    for _ in range(args.queries):
+        _, name, username, _ = rng.choice(rows)
+        word = rng.choice([name.split()[1], username.split("@")[0], name.split()[0]])
+        queries.append(word[:rng.randint(1, len(word))])
+
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[int(len(timings) * 0.99)] * 1000
+    print(f"{len(queries)} searches: p50 {p50:.3f}ms, p99 {p99:.3f}ms, max {timings[-1] * 1000:.3f}ms")
+
+    updated = rows[:1000]
+    start = time.perf_counter()
+    for entry_id, name, username, website in updated:
+        index.update(entry_id, name + " renamed", username, website)
+    print(f"incremental update: {(time.perf_counter() - start) * 1000 / len(updated):.3f}ms per entry")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+vault_loadgen.py
+
+Starts a vault daemon on a synthetic vault in a scratch folder and drives it with concurrent, pipelining
+clients, then reports the requests per second and the p50, p90 and p99 latency of every API method.
+
+Every client logs in once and keeps up to --pipeline requests in flight on its connection, a mix of fetches,
+list pages and updates.
+
+Usage:
+    python scripts/vault_loadgen.py --entries 10000 --clients 8 --pipeline 16 --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import constants as const  # noqa: E402
+
+USERNAME = "loadgen"
+PASSWORD = "loadgen-password"
+# Share of each method in the generated requests
+METHOD_MIX = (("fetch", 0.7), ("list", 0.2), ("update", 0.1))
+
+
+def use_scratch_database(folder):
+    """
+    Points the database constants at a scratch folder so the real vault is never touched.
+    """
+    const.DATABASE_FOLDER = Path(folder)
+    const.DATABASE_PATH = const.DATABASE_FOLDER / const.DATABASE_NAME
+
+
+def seed_vault(entry_count):
+    """
+    Registers the load generator user and gives it entry_count encrypted entries.
+
+    Returns:
+        list: The entry IDs of the entries.
+    """
+    from auth import register, authenticate
+    from database import DataBase
+    from encryption import EncryptionManager
+
+    register(USERNAME, PASSWORD)
+    result = authenticate(USERNAME, PASSWORD)
+    entries = [(f"Site {i:06d}", f"user{i}@mail.com", f"password-{i}", f"https://site{i}.com")
+               for i in range(entry_count)]
+    with DataBase() as db:
+        return db.generator_save_user_data_many(entries, result.user_id, EncryptionManager(result.encryption_key))
+
+
+def run_daemon(folder, socket_path, workers):
+    """
+    Serves the scratch vault, runs in its own process.
+    """
+    use_scratch_database(folder)
+    from vault_daemon import VaultDaemon
+    asyncio.run(VaultDaemon(socket_path, workers).serve_forever())
+
+
+def percentile(timings, fraction):
+    return timings[min(int(len(timings) * fraction), len(timings) - 1)] * 1000
+
+
+async def client(socket_path, request_count, pipeline, entry_ids, rng, timings, errors):
+    """
+    Logs in and sends request_count requests, keeping up to pipeline of them in flight.
+    """
+    reader, writer = await asyncio.open_unix_connection(str(socket_path))
+    request_id = 0
+    pending = {}
+    in_flight = asyncio.Semaphore(pipeline)
+
+    async def send(method, params):
+        nonlocal request_id
+        await in_flight.acquire()
+        request_id += 1
+        pending[request_id] = (method, time.perf_counter())
+        request = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    async def receive(count):
+        for _ in range(count):
+            response = json.loads(await reader.readline())
+            method, sent_at = pending.pop(response["id"])
+            timings.setdefault(method, []).append(time.perf_counter() - sent_at)
+            if "error" in response:
+                errors.append(response["error"]["message"])
+            in_flight.release()
+            if method == "login":
+                return response["result"]["token"]
+
+    await send("login", {"username": USERNAME, "password": PASSWORD})
+    token = await receive(1)
+
+    receiver = asyncio.create_task(receive(request_count))
+    methods, weights = zip(*METHOD_MIX)
+    for method in rng.choices(methods, weights, k=request_count):
+        entry_id = rng.choice(entry_ids)
+        if method == "fetch":
+            params = {"token": token, "entry_id": entry_id}
+        elif method == "list":
+            params = {"token": token, "limit": const.ACCOUNT_PAGE_SIZE}
+        else:
+            params = {"token": token, "entry_id": entry_id, "name": f"Site {entry_id:06d}",
+                      "username": f"user{entry_id}@mail.com", "password": f"rotated-{rng.random()}"}
+        await send(method, params)
+    await receiver
+    writer.close()
+
+
+async def drive(args, entry_ids):
+    timings, errors = {}, []
+    per_client = args.requests // args.clients
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args.socket, per_client, args.pipeline, entry_ids, random.Random(args.seed + i),
+                                  timings, errors) for i in range(args.clients)))
+    return timings, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--pipeline", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=const.VAULT_DAEMON_WORKERS)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    args.socket = Path(folder) / "vault.sock"
+    use_scratch_database(folder)
+    start = time.perf_counter()
+    entry_ids = seed_vault(args.entries)
+    print(f"seeded {len(entry_ids)} entries in {time.perf_counter() - start:.1f}s")
+
+    daemon = multiprocessing.Process(target=run_daemon, args=(folder, args.socket, args.workers), daemon=True)
+    daemon.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not args.socket.exists():
+            if time.monotonic() > deadline or not daemon.is_alive():
+                raise SystemExit("The vault daemon did not start.")
+            time.sleep(0.05)
+
+        timings, errors, elapsed = asyncio.run(drive(args, entry_ids))
+    finally:
+        daemon.terminate()
+        daemon.join()
+
+    request_count = sum(len(method_timings) for method_timings in timings.values())
+    print(f"{args.clients} clients, pipeline {args.pipeline}, {args.workers} workers: "
+          f"{request_count} requests in {elapsed:.2f}s, {request_count / elapsed:.0f} req/s, {len(errors)} errors")
+    for method, method_timings in sorted(timings.items()):
+        method_timings.sort()
+        print(f"{method:>7}: {len(method_timings):>6} requests, p50 {percentile(method_timings, 0.5):.2f}ms, "
+              f"p90 {percentile(method_timings, 0.9):.2f}ms, p99 {percentile(method_timings, 0.99):.2f}ms")
+    if errors:
+        print(f"first error: {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
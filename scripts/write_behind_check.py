@@ -0,0 +1,71 @@
+"""
+write_behind_check.py
+
+Buffers sequences of entry updates and deletes in a WriteBehindQueue on a scratch database, flushes them and
+checks the stored entries. The script exits with a non zero status when a flush leaves an entry in another
+state than the last write meant, such as an update buffered after a delete bringing the entry back.
+
+Usage:
+    python scripts/write_behind_check.py
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import constants as const  # noqa: E402
+
+
+def use_scratch_database(folder):
+    """
+    Points the database constants at a scratch folder so the real vault is never touched.
+    """
+    const.DATABASE_FOLDER = Path(folder)
+    const.DATABASE_PATH = const.DATABASE_FOLDER / const.DATABASE_NAME
+
+
+def main():
+    use_scratch_database(tempfile.mkdtemp())
+    from database import DataBase
+    from write_behind import WriteBehindQueue
+
+    with DataBase() as db:
+        db.register_user("alice", b"hash", b"k" * 32)
+        user_id = db.login_check("alice")[0]
+        entry_ids = [db.generator_save_user_data((f"Site {i}", "alice", b"secret", "site.com", None, user_id))
+                     for i in range(3)]
+
+    def update(entry_id, name):
+        return (name, "alice", b"secret", "site.com", None, entry_id)
+
+    # The flush interval is long enough that only the explicit flush writes
+    queue = WriteBehindQueue(enabled=True, flush_interval=3600)
+    deleted, updated, recreated = entry_ids
+
+    queue.delete(deleted)
+    queue.update(update(deleted, "Saved after delete"))
+
+    queue.update(update(updated, "First save"))
+    queue.update(update(updated, "Second save"))
+
+    queue.update(update(recreated, "Saved before delete"))
+    queue.delete(recreated)
+    queue.flush()
+
+    with DataBase() as db:
+        results = {
+            "delete then update stays deleted": db.storage_fetch_details(deleted, user_id) is None,
+            "repeated updates keep the last one": db.storage_fetch_details(updated, user_id)[0] == "Second save",
+            "update then delete is deleted": db.storage_fetch_details(recreated, user_id) is None,
+        }
+    queue.close()
+
+    for check, passed in results.items():
+        print(f"{'ok' if passed else 'FAIL':<5} {check}")
+    if not all(results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+search_index.py
+
+This module defines the PrefixIndex class, an in-memory index used by the Storage search box. It holds the
+lowercased words of every entry's name, username and website in a sorted list, so a prefix query is a binary
+search followed by a walk over the matching words instead of a query against SQLite on each keystroke.
+
+The index is built once per session and updated one entry at a time when entries are saved or deleted. The
+sorted lists are split into buckets of about BUCKET_SIZE items, so an insert or delete shifts one bucket
+instead of the whole list.
+
+Classes:
+    - SortedList: A sorted list of tuples split into buckets.
+    - PrefixIndex: A sorted word index over the entries of one user.
+"""
+import bisect
+import heapq
+import re
+from operator import itemgetter
+import constants as const
+
+WORD_PATTERN = re.compile(r"\w+")
+# Items per bucket of SortedList, a bucket is split once it holds twice as many
+BUCKET_SIZE = 1000
+# Joins the words of an entry, it never occurs inside a word
+WORD_SEPARATOR = "\x00"
+# Sorts after every character, the words starting with w lie between w and w + LAST_CHARACTER
+LAST_CHARACTER = "\U0010ffff"
+# A search matching more than one entry in this many takes its first matches from the account list order
+DENSE_MATCH_RATIO = 10
+
+
+def entry_words(*fields):
+    """
+    Returns the words an entry can be found by: each lowercased field as a whole and each word in it.
+    """
+    words = set()
+    for field in fields:
+        if field:
+            field = field.lower()
+            words.add(field)
+            words.update(WORD_PATTERN.findall(field))
+    return words
+
+
+class SortedList:
+    """
+    A sorted list of tuples split into buckets, each bucket a sorted list. The last item of every bucket is
+    kept in a separate list, which a binary search uses to find the bucket of an item.
+
+    Methods:
+        add(item): Inserts an item.
+        discard(item): Removes an item if it is present.
+        slices(low, high): Yields the items between low and high, one list slice per bucket.
+    """
+    def __init__(self, items=()):
+        """
+        Parameters:
+            items (list): Items already sorted.
+        """
+        self._buckets = [items[i:i + BUCKET_SIZE] for i in range(0, len(items), BUCKET_SIZE)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(items)
+
+    def __len__(self):
+        return self._len
+
+    def add(self, item):
+        if not self._buckets:
+            self._buckets.append([item])
+            self._maxes.append(item)
+            self._len = 1
+            return
+
+        index = min(bisect.bisect_left(self._maxes, item), len(self._maxes) - 1)
+        bucket = self._buckets[index]
+        bisect.insort(bucket, item)
+        self._maxes[index] = bucket[-1]
+        if len(bucket) > 2 * BUCKET_SIZE:
+            self._buckets[index:index + 1] = [bucket[:BUCKET_SIZE], bucket[BUCKET_SIZE:]]
+            self._maxes[index:index + 1] = [bucket[BUCKET_SIZE - 1], bucket[-1]]
+        self._len += 1
+
+    def discard(self, item):
+        index = bisect.bisect_left(self._maxes, item)
+        if index == len(self._maxes):
+            return
+        bucket = self._buckets[index]
+        position = bisect.bisect_left(bucket, item)
+        if position == len(bucket) or bucket[position] != item:
+            return
+
+        del bucket[position]
+        self._len -= 1
+        if bucket:
+            self._maxes[index] = bucket[-1]
+        else:
+            del self._buckets[index]
+            del self._maxes[index]
+
+    def slices(self, low, high):
+        """
+        Yields the items from low, included, to high, excluded, as one list slice per bucket.
+        """
+        index = bisect.bisect_left(self._maxes, low)
+        start = bisect.bisect_left(self._buckets[index], low) if index < len(self._buckets) else 0
+        while index < len(self._buckets):
+            bucket = self._buckets[index]
+            end = bisect.bisect_left(bucket, high)
+            yield bucket[start:end]
+            if end < len(bucket):
+                return
+            index += 1
+            start = 0
+
+
+class PrefixIndex:
+    """
+    A sorted word index over a user's entries.
+
+    Attributes:
+        words (SortedList): Sorted (word, entry_id) tuples.
+        names (SortedList): Sorted (name, entry_id) tuples, the order of the account list.
+        entries (dict): The name, words and joined words of every indexed entry, keyed by entry ID.
+
+    Methods:
+        build(rows): Replaces the index with the given entries.
+        add(entry_id, name, username, website): Indexes a single entry.
+        remove(entry_id): Removes a single entry.
+        update(entry_id, name, username, website): Re-indexes a single entry.
+        search(query, limit): Returns the entries matching every word of the query.
+    """
+    def __init__(self):
+        self.words = SortedList()
+        self.names = SortedList()
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _index_entry(name, username, website):
+        entry = entry_words(name, username, website)
+        # A word starts with q exactly when the joined words contain the separator followed by q
+        return name, entry, WORD_SEPARATOR + WORD_SEPARATOR.join(entry)
+
+    def build(self, rows):
+        """
+        Replaces the index with the given entries, sorting the words once.
+
+        Parameters:
+            rows (iterable): Tuples containing entry ID, name, username and website.
+        """
+        self.entries = {}
+        words = []
+        for entry_id, name, username, website in rows:
+            indexed = self._index_entry(name, username, website)
+            self.entries[entry_id] = indexed
+            words.extend((word, entry_id) for word in indexed[1])
+        words.sort()
+        self.words = SortedList(words)
+        self.names = SortedList(sorted((indexed[0], entry_id) for entry_id, indexed in self.entries.items()))
+
+    def add(self, entry_id, name, username, website):
+        """
+        Indexes a single entry.
+        """
+        indexed = self._index_entry(name, username, website)
+        self.entries[entry_id] = indexed
+        for word in indexed[1]:
+            self.words.add((word, entry_id))
+        self.names.add((name, entry_id))
+
+    def remove(self, entry_id):
+        """
+        Removes a single entry from the index.
+        """
+        indexed = self.entries.pop(entry_id, None)
+        if indexed is None:
+            return
+        name, entry, _ = indexed
+        for word in entry:
+            self.words.discard((word, entry_id))
+        self.names.discard((name, entry_id))
+
+    def update(self, entry_id, name, username, website):
+        """
+        Re-indexes a single entry after it was edited.
+        """
+        self.remove(entry_id)
+        self.add(entry_id, name, username, website)
+
+    def search(self, query, limit=const.SEARCH_RESULT_LIMIT):
+        """
+        Returns the entries with a word starting with each word of the query. Every match is collected before
+        the limit is applied, so the entries returned are the first ones in the order of the account list.
+
+        Parameters:
+            query (str): The text typed into the search box.
+            limit (int): Maximum number of entries returned.
+
+        Returns:
+            list: List of (entry_id, name) tuples sorted by name and entry ID.
+        """
+        query_words = WORD_PATTERN.findall(query.lower())
+        if not query_words:
+            return []
+
+        # The longest word has the fewest matches, the others are checked against the entry's joined words
+        first, *others = sorted(query_words, key=len, reverse=True)
+        candidates = set()
+        for words in self.words.slices((first,), (first + LAST_CHARACTER,)):
+            candidates.update(map(itemgetter(1), words))
+
+        entries = self.entries
+        if others:
+            prefixes = [WORD_SEPARATOR + other for other in others]
+            candidates = {entry_id for entry_id in candidates
+                          if all(prefix in entries[entry_id][2] for prefix in prefixes)}
+        if len(candidates) * DENSE_MATCH_RATIO < len(entries):
+            matches = heapq.nsmallest(limit, ((entries[entry_id][0], entry_id) for entry_id in candidates))
+            return [(entry_id, name) for name, entry_id in matches]
+
+        # Common matches are found sooner by walking the account list order than by sorting all of them
+        matches = []
+        for names in self.names.slices((), (LAST_CHARACTER,)):
+            matches.extend(item for item in names if item[1] in candidates)
+            if len(matches) >= limit:
+                break
+        return [(entry_id, name) for name, entry_id in matches[:limit]]
@@ -0,0 +1,247 @@
+"""
+session.py
+
+This module defines the Session class, which holds the state of a logged in user. The user's encryption key
+is loaded once at login and cached, so the Storage and EntryFrame actions no longer query the key and build a
+new EncryptionManager on every click.
+
+The cached key is kept in a bytearray so it can be overwritten with zeros when it is evicted, which happens
+after the session has been idle for const.SESSION_IDLE_TIMEOUT seconds or when the user logs out. An access
+after an idle eviction reloads the key from the database and counts as a cache miss. The key is only used
+through the encrypt and decrypt methods of the session, which hold its lock for the whole operation, so an
+eviction or a log out never zeroizes the key in the middle of an encryption. The idle timer only runs
+while a key is cached, so an evicted session that is never used again holds no thread.
+
+A session also re-encrypts the user's legacy AES-CBC entries to the AES-GCM format in a background thread,
+in short transactions so the UI keeps working while it runs.
+
+Classes:
+    - Session: A logged in user with a cached, self evicting encryption key.
+"""
+import logging
+import threading
+import time
+import constants as const
+from database import DataBase
+from encryption import EncryptionManager
+
+logging.basicConfig(level=logging.INFO, filename=const.LOGGING_PATH,
+                    format="%(asctime)s -  %(levelname)s - Module: %(module)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    """
+    A logged in user with a cached encryption key.
+
+    Attributes:
+        user_id (int): The ID of the authenticated user.
+        idle_timeout (float): Seconds without access after which the key is evicted, None leaves the eviction
+            to the owner of the session.
+        hits (int): Number of key accesses served from the cache.
+        misses (int): Number of key accesses that had to load the key from the database.
+
+    Methods:
+        encrypt(plaintext): Encrypts a password with the cached key.
+        decrypt(iv, ciphertext): Decrypts a password with the cached key.
+        start_format_migration(): Re-encrypts the user's legacy CBC entries in a background thread.
+        evict(): Zeroizes and drops the cached key.
+        close(): Evicts the key and ends the session.
+        stats(): Returns the cache counters.
+    """
+    def __init__(self, user_id, encryption_key, idle_timeout=const.SESSION_IDLE_TIMEOUT):
+        """
+        Initializes the session with the encryption key retrieved at login.
+
+        Parameters:
+            user_id (int): The ID of the authenticated user.
+            encryption_key (bytes): The user's encryption key.
+            idle_timeout (float): Seconds without access after which the key is evicted, None for no timer.
+        """
+        self.user_id = user_id
+        self.idle_timeout = idle_timeout
+        self.hits = 0
+        self.misses = 0
+        self.closed = False
+        self._key = bytearray(encryption_key)
+        self._encryption_manager = EncryptionManager(self._key)
+        self._last_access = time.monotonic()
+        self._timer = None
+        self._lock = threading.Lock()
+        self._schedule_eviction()
+
+    def encrypt(self, plaintext):
+        """
+        Encrypts a password with the user's key, reloading the key if it was evicted.
+
+        Parameters:
+            plaintext (str): The password to encrypt.
+
+        Returns:
+            tuple: The (iv, token) pair returned by EncryptionManager.encrypt.
+
+        Raises:
+            RuntimeError: If the session has been closed.
+        """
+        with self._lock:
+            return self._cached_manager().encrypt(plaintext)
+
+    def decrypt(self, iv, ciphertext):
+        """
+        Decrypts a password with the user's key, reloading the key if it was evicted.
+
+        Parameters:
+            iv: The IV of a legacy CBC ciphertext, None for a GCM token.
+            ciphertext: The stored ciphertext.
+
+        Returns:
+            str: The password.
+
+        Raises:
+            RuntimeError: If the session has been closed.
+        """
+        with self._lock:
+            return self._cached_manager().decrypt(iv, ciphertext)
+
+    def _cached_manager(self):
+        """
+        Returns the EncryptionManager of the cached key, reloading the key if it was evicted. Must be called
+        with the lock held, and the manager used before it is released.
+        """
+        if self.closed:
+            raise RuntimeError("The session has been closed.")
+
+        if self._encryption_manager is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            with DataBase() as db:
+                encryption_key = db.storage_retrieve_encryption_key(self.user_id)[0]
+            self._key = bytearray(encryption_key)
+            self._encryption_manager = EncryptionManager(self._key)
+            self._schedule_eviction()
+
+        self._last_access = time.monotonic()
+        return self._encryption_manager
+
+    def start_format_migration(self):
+        """
+        Starts a daemon thread that re-encrypts the user's legacy CBC entries to GCM.
+
+        Returns:
+            threading.Thread: The started migration thread.
+        """
+        thread = threading.Thread(target=self._migrate_legacy_entries, daemon=True,
+                                  name=f"format-migration-{self.user_id}")
+        thread.start()
+        return thread
+
+    def _migrate_legacy_entries(self):
+        """
+        Re-encrypts legacy entries chunk by chunk, each chunk is read and written in its own short transaction.
+        The migration stops when the key is evicted or the session is closed and resumes at the next login.
+        """
+        migrated = 0
+        after_id = 0
+        while True:
+            # Each chunk works on its own copy of the key, so an eviction cannot zeroize it mid-chunk
+            with self._lock:
+                chunk_key = None if self._encryption_manager is None or self.closed else bytearray(self._key)
+            if chunk_key is None:
+                logger.info(f"Format migration of user {self.user_id} paused after {migrated} entries.")
+                return
+
+            try:
+                with DataBase() as db:
+                    legacy_entries = db.storage_fetch_legacy_entries(self.user_id, after_id)
+                if not legacy_entries:
+                    break
+
+                encryption_manager = EncryptionManager(chunk_key)
+                rows = []
+                for entry_id, encrypted_password, iv in legacy_entries:
+                    try:
+                        password = encryption_manager.decrypt_legacy(iv, encrypted_password)
+                    except (ValueError, TypeError) as e:
+                        logger.error(f"Entry {entry_id} could not be migrated to the GCM format: {e}")
+                        continue
+                    _, token = encryption_manager.encrypt(password)
+                    rows.append((token, entry_id, iv))
+            finally:
+                chunk_key[:] = bytes(len(chunk_key))
+
+            with DataBase() as db:
+                db.storage_replace_legacy_entries(rows)
+            migrated += len(rows)
+            after_id = legacy_entries[-1][0]
+            time.sleep(const.FORMAT_MIGRATION_PAUSE)
+
+        if migrated:
+            logger.info(f"Format migration of user {self.user_id} finished, {migrated} entries re-encrypted.")
+
+    def _schedule_eviction(self):
+        """
+        Starts a timer that evicts the key once the session has been idle long enough.
+        """
+        if self.idle_timeout is None:
+            return
+        self._timer = threading.Timer(self.idle_timeout, self._evict_if_idle)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _evict_if_idle(self):
+        """
+        Evicts the key if it was not accessed during the idle timeout, otherwise waits for the rest of it.
+        The timer is started again when the evicted key is reloaded.
+        """
+        with self._lock:
+            if self.closed or self._encryption_manager is None:
+                self._timer = None
+                return
+            idle_time = time.monotonic() - self._last_access
+            if idle_time >= self.idle_timeout:
+                self._zeroize()
+                self._timer = None
+                logger.info(f"Encryption key of user {self.user_id} evicted after {idle_time:.0f}s idle.")
+                return
+
+            self._timer = threading.Timer(self.idle_timeout - idle_time, self._evict_if_idle)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _zeroize(self):
+        """
+        Overwrites the cached key with zeros and drops the encryption manager using it.
+        """
+        self._key[:] = bytes(len(self._key))
+        self._encryption_manager = None
+
+    def evict(self):
+        """
+        Zeroizes and drops the cached key, the next access reloads it from the database.
+        """
+        with self._lock:
+            self._zeroize()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def close(self):
+        """
+        Zeroizes the cached key and ends the session, used when the user logs out.
+        """
+        with self._lock:
+            self._zeroize()
+            self.closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+        logger.info(f"Session of user {self.user_id} closed with stats: {self.stats()}")
+
+    def stats(self):
+        """
+        Returns the key cache counters.
+
+        Returns:
+            dict: The number of cache hits and misses.
+        """
+        return {"hits": self.hits, "misses": self.misses}
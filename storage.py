@@ -31,17 +31,135 @@ Note:
 import customtkinter as ctk
 from sidebar import SideBarFrame
 from generator import Generator, EntryFrame
+from account_list import AccountList
 import pyperclip
 import webbrowser
 import constants as const
 import logging
 from database import DataBase
-from encryption import EncryptionManager
+from detail_cache import DetailCache
+from search_index import PrefixIndex
+from write_behind import write_behind
 
 logging.basicConfig(level=logging.DEBUG, filename=const.LOGGING_PATH,
                     format="%(asctime)s -  %(levelname)s - Module: %(module)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# Keys of the background tasks that belong to the logged in user, cancelled at log out
+USER_TASK_KEYS = ("account-page", "changes", "search-index", "search", "details", "prefetch")
+
+
+# The functions below run on the scheduler's worker threads and never touch a widget. Reads flush the
+# write-behind queue first, so they always see the user's own saves
+
+def fetch_account_page(user_id, after):
+    """
+    Returns the page of accounts following the given sort key.
+    """
+    write_behind.flush()
+    with DataBase() as db:
+        return db.storage_fetch_account_page(user_id, after)
+
+
+def fetch_first_account_page(user_id):
+    """
+    Returns the change version of a user's entries and the first page of accounts. The version is read first,
+    so a change made while the page loads is found by the next fetch_changes.
+    """
+    write_behind.flush()
+    with DataBase() as db:
+        version = db.storage_data_version(user_id)
+        return version, db.storage_fetch_account_page(user_id)
+
+
+def fetch_changes(user_id, version):
+    """
+    Returns the current change version and the entries changed after the given version.
+    """
+    write_behind.flush()
+    with DataBase() as db:
+        return db.storage_changes_since(user_id, version)
+
+
+def build_search_index(user_id):
+    """
+    Returns a PrefixIndex over every entry of a user.
+    """
+    write_behind.flush()
+    with DataBase() as db:
+        rows = db.storage_fetch_search_fields(user_id)
+    search_index = PrefixIndex()
+    search_index.build(rows)
+    logger.info(f"Search index of user {user_id} built with {len(search_index)} entries.")
+    return search_index
+
+
+def search_full_text(user_id, query):
+    """
+    Returns the entry IDs matching a query in the full-text index of the database.
+    """
+    write_behind.flush()
+    with DataBase() as db:
+        return db.search_entries(user_id, query)
+
+
+def fetch_details(session, user_id, entry_ids):
+    """
+    Fetches and decrypts the details of the given entries.
+
+    Returns:
+        dict: The (name, username, password, website) of every entry found, keyed by entry ID.
+    """
+    write_behind.flush()
+    with DataBase() as db:
+        rows = [(entry_id, db.storage_fetch_details(entry_id, user_id)) for entry_id in entry_ids]
+
+    details = {}
+    for entry_id, row in rows:
+        if row:
+            name, username, encrypted_password, website, iv = row
+            details[entry_id] = (name, username, session.decrypt(iv, encrypted_password), website)
+    return details
+
+
+def prefetch_details(detail_cache, session, user_id, entry_ids):
+    """
+    Fetches and decrypts the details of the given entries into the detail cache.
+    Records fetched while an entry was changed are dropped by the cache, a closed session stops the prefetch.
+    """
+    generation = detail_cache.generation
+    try:
+        for entry_id, account_details in fetch_details(session, user_id, entry_ids).items():
+            detail_cache.put(entry_id, account_details, generation)
+    except RuntimeError:
+        logger.debug("Prefetch stopped, the session was closed.")
+
+
+def save_details(session, entry_id, name, username, password, website):
+    """
+    Encrypts the password and writes the details of an entry through the write-behind queue.
+    """
+    iv, encrypted_password = session.encrypt(password)
+    write_behind.update((name, username, encrypted_password, website, iv, entry_id))
+    logger.info(f"Details of entry {entry_id} saved.")
+
+
+def delete_entry(entry_id):
+    """
+    Deletes an entry through the write-behind queue.
+    """
+    write_behind.delete(entry_id)
+
+
+def close_session(session):
+    """
+    Writes the buffered saves and closes the session, used at log out. It runs on the write lane, after every
+    save that still encrypts with the session's key.
+    """
+    write_behind.flush()
+    if session is not None:
+        session.close()
+
 
 class Storage(ctk.CTkFrame):
     """
@@ -51,32 +169,51 @@ class Storage(ctk.CTkFrame):
     This class includes features such as:
          creating, updating, and displaying user account details, a password generator.
 
+    Database, crypto and clipboard work runs on the application's TaskScheduler, its result is applied to
+    the widgets on the Tk thread. A newer request cancels an unfinished one of the same kind, such as the
+    details of a previously clicked account.
+
     Attributes:
         - user_id (int): The unique identifier for the current user, retrieved from login auth.
+        - session (Session): The session of the current user, holding the cached encryption key.
+        - scheduler (TaskScheduler): Runs the background work of the frame.
         - new_item (ctk.CTkButton): Button for creating a new user account entry.
         - pw_generator (ctk.CTkButton): Button for launching the password generator.
         - log_out (ctk.CTkButton): Button for logging out of the application.
-        - scrollable_frame (ctk.CTkScrollableFrame): Scrollable frame for displaying
-          user account buttons.
+        - account_list (AccountList): Virtualized, scrollable list of user account buttons.
+        - search_index (PrefixIndex): In-memory index of the user's entries, built on the first search.
+        - search_query (str): The active search, empty while the full list is shown.
+        - detail_cache (DetailCache): Decrypted details of recently shown and prefetched entries.
+        - list_version (int): Change version of the user's entries the account list is at, None while loading.
+        - list_user_id (int): The user whose accounts the account list holds.
         - details_frame (ctk.CTkFrame): Frame for displaying and editing account details.
 
     Methods:
         - open_toplevel(): Opens the password generator window.
         - open_entry_frame(): Opens the window for creating a new user account entry.
-        - create_account_buttons(): Retrieves and displays user account buttons.
-        - create_entry_widgets(account_name): Creates entry widgets based on account details.
-        - destroy_entry_widgets(): Destroys entry widgets in the details frame.
-        - destroy_account_buttons(): Destroys user account buttons in the scrollable frame.
-        - show_details(account_index): Displays details for a selected user account.
+        - create_account_buttons(): Retrieves and displays the first page of user account buttons.
+        - refresh_account_buttons(): Applies the entries changed since the account list was loaded.
+        - apply_changes(changes): Applies changed entries to the account list, search index and detail cache.
+        - load_next_account_page(): Retrieves the next page of accounts into the account list.
+        - append_account_page(accounts): Appends a loaded page of accounts to the account list.
+        - search_accounts(query): Shows the accounts matching a search, or the full list for an empty one.
+        - account_added(entry_id, name, username, website): Adds a saved entry to the list and search index.
+        - destroy_entry_widgets(): Hides entry widgets in the details frame.
+        - destroy_account_buttons(): Removes every account from the account list.
+        - show_details(entry_id): Displays details for a selected user account.
+        - display_details(entry_id, account_details): Fills the detail fields with the details of an entry.
         - create_entry_fields_and_buttons(): Creates entry fields and buttons for details.
-        - fetch_and_display_details(account_index): Fetches and displays account details.
-        - get_id_for_update(current_id): Retrieves the database ID for updating details.
+        - prefetch_neighbours(entry_id): Loads the details of the neighbouring accounts in the background.
         - update_details(): Updates user account details in the database.
+        - details_saved(entry_id, name, username, password, website): Applies saved details to the display.
+        - delete_details(): Deletes the shown account from the database.
+        - details_deleted(entry_id): Removes a deleted account from the display.
         - copy_username(): Copies the username to the clipboard.
         - copy_password(): Copies the password to the clipboard.
         - open_website(): Opens the website associated with the selected account.
         - open_new_entry_frame(): Opens the window for creating a new user account entry.
         - set_user_id(user_id): Sets the user_id attribute.
+        - set_session(session): Sets the session attribute.
 
     Usage:
         Instantiate this class within a customtkinter application to integrate a password
@@ -98,7 +235,16 @@ class Storage(ctk.CTkFrame):
         sidebar.label("Storage Module")
 
         self.user_id = user_id
+        self.session = None
+        self.scheduler = controller.scheduler
         self.db_path = const.DATABASE_PATH
+        self.search_index = None
+        self.search_query = ""
+        self.detail_cache = DetailCache()
+        self.list_version = None
+        self.list_user_id = None
+        self.current_id = None
+        self.entry_widgets = {}
 
         self.new_item = ctk.CTkButton(sidebar.frame, text="New Entry",
                                       command=self.open_entry_frame)
@@ -114,18 +260,37 @@ class Storage(ctk.CTkFrame):
                                      command=lambda: self.log_out_button_press(controller))
         self.log_out.grid(row=5, column=0, padx=20, pady=10)
 
-        self.scrollable_frame = ctk.CTkScrollableFrame(self, label_text="Accounts")
-        self.scrollable_frame.grid(row=0, column=1, padx=20, pady=(20, 0), sticky="ns")
-        self.scrollable_frame.grid_columnconfigure(1, weight=1)
+        # Further account pages are loaded when the list is scrolled close to its end
+        self.account_list = AccountList(self, command=self.show_details,
+                                        load_more=self.load_next_account_page,
+                                        on_search=self.search_accounts)
+        self.account_list.grid(row=0, column=1, padx=20, pady=(20, 0), sticky="ns")
 
         self.details_frame = ctk.CTkFrame(self, width=400, height=500)
         self.details_frame.grid(row=0, column=2, padx=20, pady=20, sticky="nsew")
 
     def log_out_button_press(self, controller):
         """
-        Deletes all the buttons when the logout button is pressed
+        Deletes all the buttons and closes the session when the logout button is pressed
         """
+        for key in USER_TASK_KEYS:
+            self.scheduler.cancel(key)
+        # Queued or running saves of this window and of the new entry window still need the key, the write lane
+        # closes the session once they are done
+        self.scheduler.submit(close_session, self.session, serial=True)
+        self.session = None
         self.destroy_entry_widgets()
+        self.search_index = None
+        self.search_query = ""
+        # The list may show search results, so the next log in loads it again instead of applying changes
+        self.list_version = None
+        self.list_user_id = None
+        self.account_list.clear_search()
+        logger.info(f"Detail cache cleared at log out with stats: {self.detail_cache.stats()}")
+        self.detail_cache.clear()
+        self.current_id = None
+        for entry in self.entry_widgets.values():
+            entry.delete(0, "end")
         controller.show_frame("Login")
 
     def open_toplevel(self):
@@ -142,239 +307,379 @@ class Storage(ctk.CTkFrame):
         Opens the window for creating a new user account entry.
         """
         if self.entry_window is None or not self.entry_window.winfo_exists():
-            self.entry_window = EntryFrame(self, self.create_account_buttons, self.user_id)
+            self.entry_window = EntryFrame(self, self.account_added, self.user_id, self.session)
         else:
             self.entry_window.focus()
 
     def create_account_buttons(self):
         """
-        Retrieves data and creates account entry buttons.
+        Clears the account list and loads the first page of accounts into it.
         """
 
         logger.debug("The value inside Storage is: %s", self.user_id)
 
-        with DataBase() as db:
-            account_names = db.storage_create_account_buttons(self.user_id)
-
         self.destroy_account_buttons()
+        self.account_list.exhausted = False
+        self.list_version = None
+        self.list_user_id = self.user_id
+        self.scheduler.submit(fetch_first_account_page, self.user_id, key="account-page",
+                              on_done=self.first_account_page_loaded)
 
-        for i, account_name in enumerate(account_names):
-            button = ctk.CTkButton(master=self.scrollable_frame, text=account_name[0],
-                                    command=lambda i=i: self.show_details(i))
-            button.grid(row=i, column=0, padx=10, pady=(0, 20))
-
-            # When the button is clicked, create entry widgets
-            button.bind("<Button-1>", lambda event, account_name=account_name[0]:
-                        self.create_entry_widgets(account_name))
-
-    def create_entry_widgets(self, account_name):
+    def first_account_page_loaded(self, result):
         """
-        Creates entry widgets based on account details.
-
-        Parameters:
-            - account_name: The name of the user account.
+        Keeps the change version the account list was loaded at and shows the first page of accounts.
         """
-        # Destroy previous widgets in the details frame
-        self.destroy_entry_widgets()
-        # Fetch account details based on the provided account_name
-        with DataBase() as db:
-            account_details = db.storage_fetch_user_data(account_name, self.user_id)
-            encryption_key_tuple = db.storage_retrieve_encryption_key(self.user_id)
-
-            encrypted_password = account_details[3]
-            iv = account_details[5]
-            encryption_key = encryption_key_tuple[0]
-            encryption_manager = EncryptionManager(encryption_key)
-            password = encryption_manager.decrypt(iv, encrypted_password)
+        self.list_version, accounts = result
+        self.append_account_page(accounts)
 
+    def refresh_account_buttons(self):
+        """
+        Brings the account list up to date when the frame is shown. A list of the same user is only sent the
+        entries changed since it was loaded, when nothing changed this costs a single cheap query.
+        """
+        if self.list_version is None or self.list_user_id != self.user_id:
+            self.create_account_buttons()
+            return
 
+        self.scheduler.submit(fetch_changes, self.user_id, self.list_version, key="changes", coalesce=True,
+                              on_done=self.apply_changes)
 
-        if account_details:
-            self.current_id = account_details[0]
+    def apply_changes(self, changes):
+        """
+        Applies the entries changed by other windows or processes to the account list, the search index and
+        the detail cache. Too many changes reload the account list, or rerun the active search, instead.
 
-            self.name_entry = ctk.CTkEntry(self.details_frame)
-            self.name_entry.grid(row=0, column=1, padx=10, pady=10, sticky="e")
-            self.name_entry.insert(0, account_details[1])
+        Parameters:
+            - changes: The current change version and the (entry_id, name, username, website) tuples of the
+              changed entries, name is None for a deleted entry.
+        """
+        version, changed = changes
+        if len(changed) > const.CHANGES_RELOAD_THRESHOLD:
+            self.search_index = None
+            self.detail_cache.clear()
+            if not self.search_query:
+                self.create_account_buttons()
+                return
+            # The full list is reloaded when the search is cleared, until then the search runs on a new index
+            self.list_version = version
+            self.search_index_changed()
+            return
+
+        self.list_version = version
+        for entry_id, name, username, website in changed:
+            self.detail_cache.invalidate(entry_id)
+            if name is None:
+                if self.search_index is not None:
+                    self.search_index.remove(entry_id)
+                self.account_list.remove_account(entry_id)
+                if self.current_id == entry_id:
+                    self.destroy_entry_widgets()
+                    self.current_id = None
+                continue
+            if self.search_index is not None:
+                self.search_index.update(entry_id, name, username, website)
+            # An active search is refreshed below, the full list is reloaded when the search is cleared
+            if not self.search_query:
+                self.account_list.update_account(entry_id, name)
+
+        if changed:
+            logger.info(f"Applied {len(changed)} changed entries, the account list is at version {version}.")
+            if self.search_query:
+                self.search_index_changed()
+
+    def load_next_account_page(self):
+        """
+        Retrieves the next page of accounts in the background and appends it to the account list.
+        Repeated requests for the same page while it loads are coalesced.
+        """
+        # The first page is loaded by create_account_buttons together with the change version
+        if self.account_list.exhausted or self.list_version is None:
+            return
+
+        self.scheduler.submit(fetch_account_page, self.user_id, self.account_list.loaded_until,
+                              key="account-page", coalesce=True, on_done=self.append_account_page)
+
+    def append_account_page(self, accounts):
+        """
+        Appends a loaded page of accounts to the account list, unless a search replaced the list meanwhile.
+        """
+        if not self.search_query:
+            self.account_list.append_accounts(accounts, exhausted=len(accounts) < const.ACCOUNT_PAGE_SIZE)
+
+    def search_accounts(self, query):
+        """
+        Shows the accounts matching a search in the account list, called once typing in the search box pauses.
+        The search index is built in the background on the first search of a session, a query without prefix
+        matches falls back to the full-text index of the database.
 
-            self.username_entry = ctk.CTkEntry(self.details_frame)
-            self.username_entry.grid(row=1, column=1, padx=10, pady=10, sticky="e")
-            self.username_entry.insert(0, account_details[2])
+        Parameters:
+            - query: The text of the search box, an empty query shows the full account list again.
+        """
+        if not query and not self.search_query:
+            return
+        self.search_query = query
+        self.scheduler.cancel("search")
+        if not query:
+            self.create_account_buttons()
+            return
 
-            self.password_entry = ctk.CTkEntry(self.details_frame, show="*")
-            self.password_entry.grid(row=2, column=1, padx=10, pady=10, sticky="e")
-            self.password_entry.insert(0, password)
+        self.scheduler.cancel("account-page")
+        if self.search_index is None:
+            self.scheduler.submit(build_search_index, self.user_id, key="search-index", coalesce=True,
+                                  on_done=self.search_index_built)
+            return
 
-            self.website_entry = ctk.CTkEntry(self.details_frame)
-            self.website_entry.grid(row=3, column=1, padx=10, pady=10, sticky="e")
-            self.website_entry.insert(0, account_details[4])
+        accounts = self.search_index.search(query)
+        if accounts:
+            self.account_list.set_accounts(accounts, exhausted=True)
+            return
 
-            self.save_button = ctk.CTkButton(self.details_frame, text="Save",
-                                             command=self.update_details)
-            self.save_button.grid(row=4, column=0, columnspan=2, pady=10)
+        # Substring matches inside words are left to the full-text index of the database
+        self.scheduler.submit(search_full_text, self.user_id, query, key="search",
+                              on_done=self.show_full_text_results)
 
-            self.delete_button = ctk.CTkButton(self.details_frame, text="Delete",
-                                               command=self.delete_details)
-            self.delete_button.grid(row=6, column=0, columnspan=2, pady=10)
+    def search_index_built(self, search_index):
+        """
+        Keeps the search index built in the background and runs the search that is waiting for it.
+        """
+        self.search_index = search_index
+        if self.search_query:
+            self.search_accounts(self.search_query)
 
-            self.copy_username_button = ctk.CTkButton(self.details_frame, text="Copy Username",
-                                                      command=self.copy_username)
-            self.copy_username_button.grid(row=1, column=2, padx=10, pady=10)
+    def show_full_text_results(self, entry_ids):
+        """
+        Shows the accounts found by the full-text index, sorted like the rest of the account list.
+        """
+        accounts = sorted(((entry_id, self.search_index.entries[entry_id][0]) for entry_id in entry_ids
+                           if entry_id in self.search_index.entries), key=lambda account: (account[1], account[0]))
+        self.account_list.set_accounts(accounts, exhausted=True)
 
-            self.copy_password_button = ctk.CTkButton(self.details_frame, text="Copy Password",
-                                                      command=self.copy_password)
-            self.copy_password_button.grid(row=2, column=2, padx=10, pady=10)
+    def search_index_changed(self):
+        """
+        Refreshes an active search after an entry changed. A search index that is still being built may have
+        missed the change, so its build is restarted.
+        """
+        if self.search_index is None:
+            self.scheduler.cancel("search-index")
+        if self.search_query:
+            self.search_accounts(self.search_query)
 
-            self.open_website_button = ctk.CTkButton(self.details_frame, text="Open Website",
-                                                     command=self.open_website)
-            self.open_website_button.grid(row=3, column=2, padx=10, pady=10)
+    def account_added(self, entry_id, name, username, website):
+        """
+        Adds a saved entry to the account list and the search index.
 
-            self.details_frame.grid_propagate(False)
+        Parameters:
+            - entry_id: The database ID of the new entry.
+            - name: The name of the new entry.
+            - username: The username of the new entry.
+            - website: The website of the new entry.
+        """
+        if self.search_index is not None:
+            self.search_index.add(entry_id, name, username, website)
+        if self.search_query:
+            self.search_index_changed()
+        else:
+            self.account_list.insert_account(entry_id, name)
 
     def destroy_entry_widgets(self):
         """
-        Destroys entry widgets in the details frame.
+        Hides the entry widgets in the details frame.
         """
         for widget in self.details_frame.winfo_children():
             widget.grid_remove()
 
     def destroy_account_buttons(self):
         """
-        Destroys user account buttons in the scrollable frame.
+        Removes every account from the account list.
         """
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
+        self.account_list.clear()
 
-    def show_details(self, account_index):
+    def show_details(self, entry_id):
         """
-        Displays details for a selected user account.
+        Displays details for a selected user account, from the detail cache or loaded in the background.
+        Selecting another account before the details arrived cancels their loading.
 
         Parameters:
-            - account_index: The index of the selected user entry.
+            - entry_id: The database ID of the selected user entry.
         """
+        account_details = self.detail_cache.get(entry_id)
+        if account_details is not None:
+            self.scheduler.cancel("details")
+            self.display_details(entry_id, account_details)
+            return
+
+        generation = self.detail_cache.generation
+
+        def details_loaded(details):
+            if entry_id not in details:
+                logger.error("No account details found for the selected entry ID")
+                return
+            self.detail_cache.put(entry_id, details[entry_id], generation)
+            self.display_details(entry_id, details[entry_id])
+
+        self.scheduler.submit(fetch_details, self.session, self.user_id, (entry_id,), key="details", coalesce=True,
+                              on_done=details_loaded)
+
+    def display_details(self, entry_id, account_details):
+        """
+        Fills the detail fields with the details of an entry and prefetches the accounts listed around it.
+
+        Parameters:
+            - entry_id: The database ID of the entry.
+            - account_details: The name, username, password and website of the entry.
+        """
+        self.current_id = entry_id
         self.create_entry_fields_and_buttons()
-        self.fetch_and_display_details(account_index)
+        name, username, password, website = account_details
+        for field, value in (("name", name), ("username", username), ("password", password), ("website", website)):
+            self.entry_widgets[field].delete(0, "end")
+            self.entry_widgets[field].insert(0, value)
+
+        self.prefetch_neighbours(entry_id)
 
     def create_entry_fields_and_buttons(self):
         """
-        Creates entry fields and buttons for details.
+        Creates entry fields and buttons for details the first time an account is shown, and shows them again
+        afterwards.
         """
-        for widget in self.details_frame.winfo_children():
-            widget.destroy()
-
-        self.entry_widgets = {}
+        if self.entry_widgets:
+            for widget in self.details_frame.winfo_children():
+                widget.grid()
+            return
 
         fields = ["name", "username", "password", "website"]
         for i, field in enumerate(fields):
             label = ctk.CTkLabel(self.details_frame, text=field.capitalize() + ":")
             label.grid(row=i, column=0, padx=10, pady=10, sticky="e")
 
-            entry = ctk.CTkEntry(self.details_frame)
+            entry = ctk.CTkEntry(self.details_frame, show="*" if field == "password" else "")
             entry.grid(row=i, column=1, padx=10, pady=10, sticky="e")
 
             self.entry_widgets[field] = entry
 
+        self.name_entry = self.entry_widgets["name"]
+        self.username_entry = self.entry_widgets["username"]
+        self.password_entry = self.entry_widgets["password"]
+        self.website_entry = self.entry_widgets["website"]
+
         self.save_button = ctk.CTkButton(self.details_frame, text="Save",
-                                        command=self.update_details)
+                                         command=self.update_details)
         self.save_button.grid(row=len(fields), column=0, columnspan=2, pady=10)
 
-        self.details_frame.grid_propagate(False)
-
-    def fetch_and_display_details(self, account_index=None):
-        """
-        Fetches and displays account details.
-
-        Parameters:
-            - account_index: The index of the selected user entry.
-        """
-
-        if account_index is not None:
-            with DataBase() as db:
-                account_details = db.storage_fetch_details(account_index)
-                encryption_key_tuple = db.storage_retrieve_encryption_key(self.user_id)
+        self.delete_button = ctk.CTkButton(self.details_frame, text="Delete",
+                                           command=self.delete_details)
+        self.delete_button.grid(row=len(fields) + 2, column=0, columnspan=2, pady=10)
 
-            if account_details:
-                self.create_entry_fields_and_buttons()
+        self.copy_username_button = ctk.CTkButton(self.details_frame, text="Copy Username",
+                                                  command=self.copy_username)
+        self.copy_username_button.grid(row=1, column=2, padx=10, pady=10)
 
-                name, username, encrypted_password, website, iv = account_details
-                encryption_key = encryption_key_tuple[0]
-                encryption_manager = EncryptionManager(encryption_key)
-                password = encryption_manager.decrypt(iv, encrypted_password)
+        self.copy_password_button = ctk.CTkButton(self.details_frame, text="Copy Password",
+                                                  command=self.copy_password)
+        self.copy_password_button.grid(row=2, column=2, padx=10, pady=10)
 
-                # Update the entry widgets with fetched details
-                self.entry_widgets["name"].delete(0, "end")
-                self.entry_widgets["name"].insert(0, name)
+        self.open_website_button = ctk.CTkButton(self.details_frame, text="Open Website",
+                                                 command=self.open_website)
+        self.open_website_button.grid(row=3, column=2, padx=10, pady=10)
 
-                self.entry_widgets["username"].delete(0, "end")
-                self.entry_widgets["username"].insert(0, username)
+        self.details_frame.grid_propagate(False)
 
-                self.entry_widgets["password"].delete(0, "end")
-                self.entry_widgets["password"].insert(0, password)
+    def prefetch_neighbours(self, entry_id):
+        """
+        Loads the details of the accounts listed around an entry into the detail cache in the background,
+        so moving through the list with the arrow keys does not wait for the database or the decryption.
 
-                self.entry_widgets["website"].delete(0, "end")
-                self.entry_widgets["website"].insert(0, website)
-            else:
-                logger.error("No account details found for the selected account index")
+        Parameters:
+            - entry_id: The database ID of the shown entry.
+        """
+        entry_ids = [neighbour for neighbour in self.account_list.neighbours(entry_id, const.DETAIL_PREFETCH_NEIGHBORS)
+                     if neighbour not in self.detail_cache]
+        if entry_ids:
+            self.scheduler.submit(prefetch_details, self.detail_cache, self.session, self.user_id, entry_ids,
+                                  key="prefetch")
 
     def update_details(self):
         """
-        Updates user account details in the database.
+        Updates user account details in the database, in the background.
         """
         name = self.name_entry.get()
         username = self.username_entry.get()
         password = self.password_entry.get()
         website = self.website_entry.get()
 
-        if self.current_id is not None:
-            with DataBase() as db:
-                encryption_key_tuple = db.storage_retrieve_encryption_key(self.user_id)
-                encryption_key = encryption_key_tuple[0]
-                encryption_manager = EncryptionManager(encryption_key)
-                iv, encrypted_password = encryption_manager.encrypt(password)
-
-                data = (name, username, encrypted_password, website, iv, self.current_id)
-                db.storage_update_user_data(data)
-                logger.info("Details updated successfully to the db.")
+        if self.current_id is None:
+            logger.error("Record not found for the given ID.")
+            return
 
-            self.create_account_buttons()
+        entry_id = self.current_id
+        # Invalidating first drops any prefetch of the old details that is still running
+        self.detail_cache.invalidate(entry_id)
+        self.scheduler.submit(save_details, self.session, entry_id, name, username, password, website, serial=True,
+                              on_done=lambda _: self.details_saved(entry_id, name, username, password, website))
 
+    def details_saved(self, entry_id, name, username, password, website):
+        """
+        Applies saved details to the detail cache, the search index and the account list.
+        """
+        self.detail_cache.put(entry_id, (name, username, password, website))
+        if self.search_index is not None:
+            self.search_index.update(entry_id, name, username, website)
+        if self.search_query:
+            self.search_index_changed()
         else:
-            logger.error("Record not found for the given ID.")
+            self.account_list.update_account(entry_id, name)
 
     def delete_details(self):
-
+        """
+        Deletes the shown account from the database, in the background.
+        """
         if self.current_id is not None:
-            with DataBase() as db:
-                db.storage_delete_details(self.current_id)
-            self.create_account_buttons()
+            entry_id = self.current_id
+            # On the write lane the delete runs after every save of the entry submitted before it
+            self.scheduler.submit(delete_entry, entry_id, serial=True,
+                                  on_done=lambda _: self.details_deleted(entry_id))
+
+    def details_deleted(self, entry_id):
+        """
+        Removes a deleted entry from the detail cache, the search index and the account list.
+        """
+        self.detail_cache.invalidate(entry_id)
+        if self.search_index is not None:
+            self.search_index.remove(entry_id)
+        elif self.search_query:
+            self.search_index_changed()
+        self.account_list.remove_account(entry_id)
+        if self.current_id == entry_id:
             self.destroy_entry_widgets()
+            self.current_id = None
 
     def copy_username(self):
         """
         Copies the username to the clipboard.
         """
         username = self.username_entry.get()
-        pyperclip.copy(username)
+        self.scheduler.submit(pyperclip.copy, username, key="clipboard")
 
     def copy_password(self):
         """
         Copies the password to the clipboard.
         """
         password = self.password_entry.get()
-        pyperclip.copy(password)
+        self.scheduler.submit(pyperclip.copy, password, key="clipboard")
 
     def open_website(self):
         """
         Opens the website associated with the selected account.
         """
         website = self.website_entry.get()
-        webbrowser.open(website)
+        self.scheduler.submit(webbrowser.open, website, key="browser")
 
     def open_new_entry_frame(self):
         """
         Opens the window for creating a new user account entry.
         It uses EntryFrame Class from the generator module
         """
-        EntryFrame(self, self.create_account_buttons, self.user_id)
+        EntryFrame(self, self.account_added, self.user_id, self.session)
 
     def set_user_id(self, user_id):
         """
@@ -385,3 +690,11 @@ class Storage(ctk.CTkFrame):
         """
         self.user_id = user_id
 
+    def set_session(self, session):
+        """
+        Used inside the main module to set the session created by the login authentication.
+
+        Parameters:
+            - session: The session holding the user's cached encryption key.
+        """
+        self.session = session
@@ -0,0 +1,359 @@
+"""
+unlock_agent.py
+
+This module defines the UnlockAgent, an ssh-agent style background process that keeps the encryption keys of
+unlocked users in memory, so scripts and repeated CLI calls read their entries without paying the bcrypt check
+of a login every time. A user is unlocked once with their password, later requests only name the user.
+
+The agent serves the JSON-RPC protocol of the vault daemon on a Unix socket inside a directory that only its
+owner may enter. The socket itself is owner only, and on Linux every connection is checked with SO_PEERCRED
+and refused unless it comes from the user running the agent.
+
+An unlocked key is zeroized when its TTL ends, when the user is locked, when the agent stops, and for every
+user at once when no request arrived for const.UNLOCK_AGENT_IDLE_LOCK seconds.
+
+Methods of the API:
+    - unlock(username, password, ttl): Checks the password once and keeps the user's key for ttl seconds.
+    - lock(username): Zeroizes the key of a user, or of every user when no username is given.
+    - status(): Returns the unlocked users and the seconds left on their keys.
+    - list(username, after, limit): Returns a page of (entry_id, name) pairs of an unlocked user.
+    - fetch(username, entry_id): Returns the decrypted details of an entry of an unlocked user.
+    - stop(): Zeroizes every key and stops the agent.
+
+Classes:
+    - UnlockedKey: The encryption key of an unlocked user, zeroized when it is evicted.
+    - UnlockAgent: Serves the unlocked keys on a private Unix socket.
+
+Functions:
+    - agent_socket(): Returns the socket path clients connect to.
+    - call(method, socket_path, **params): Sends one request to the agent and returns its result.
+
+Usage:
+    eval "$(python unlock_agent.py start)"
+    python unlock_agent.py unlock alice --ttl 600
+    python unlock_agent.py get alice 42 --field password
+    python unlock_agent.py lock
+"""
+import argparse
+import asyncio
+import getpass
+import json
+import logging
+import os
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+import constants as const
+from auth import auth_service, AUTH_OK
+from encryption import EncryptionManager
+from vault_daemon import VaultDaemon, RpcError, check_param, INVALID_PARAMS, UNAUTHORIZED
+
+logging.basicConfig(level=logging.INFO, filename=const.LOGGING_PATH,
+                    format="%(asctime)s -  %(levelname)s - Module: %(module)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# JSON-RPC error code of a request for a user whose key is not unlocked
+LOCKED = -32003
+
+
+class UnlockedKey:
+    """
+    The encryption key of an unlocked user, kept in a bytearray so it can be overwritten with zeros.
+
+    Attributes:
+        user_id (int): The ID of the unlocked user.
+        expires_at (float): time.monotonic() at which the key is zeroized.
+
+    Methods:
+        decrypt(iv, ciphertext): Decrypts a password with the key.
+        close(): Zeroizes the key.
+    """
+    def __init__(self, user_id, encryption_key, ttl):
+        self.user_id = user_id
+        self.expires_at = time.monotonic() + ttl
+        self._key = bytearray(encryption_key)
+        self._encryption_manager = EncryptionManager(self._key)
+        # Held while the key is used, so it is never zeroized in the middle of a decryption
+        self._lock = threading.Lock()
+
+    def decrypt(self, iv, ciphertext):
+        """
+        Decrypts a password with the key.
+
+        Raises:
+            RpcError: LOCKED if the key has been zeroized.
+        """
+        with self._lock:
+            if self._encryption_manager is None:
+                raise RpcError(LOCKED, "The user is locked")
+            return self._encryption_manager.decrypt(iv, ciphertext)
+
+    def close(self):
+        """
+        Overwrites the key with zeros and drops the encryption manager using it.
+        """
+        with self._lock:
+            self._key[:] = bytes(len(self._key))
+            self._encryption_manager = None
+
+
+def peer_uid(connection):
+    """
+    Returns the user ID of the process at the other end of a Unix socket, None where SO_PEERCRED is missing.
+    """
+    if connection is None or not hasattr(socket, "SO_PEERCRED"):
+        return None
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", credentials)
+    return uid
+
+
+def prepare_socket_folder(folder):
+    """
+    Creates the socket folder with owner only permissions, and refuses a folder that other users could
+    enter or that belongs to someone else.
+    """
+    folder.mkdir(mode=0o700, parents=True, exist_ok=True)
+    info = folder.lstat()
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) & 0o077:
+        raise PermissionError(f"{folder} must be a directory owned by the current user with mode 0700")
+
+
+class UnlockAgent(VaultDaemon):
+    """
+    Serves the unlocked keys on a private Unix socket. Requests are read and answered like those of the
+    VaultDaemon, unlocked users take the place of its tokens.
+
+    Attributes:
+        idle_lock (float): Seconds without requests after which every key is zeroized.
+
+    Methods:
+        unlock(username, password, ttl): Unlocks a user.
+        lock(username): Locks a user, or every user.
+        status(): Returns the unlocked users.
+        list_entries(username, after, limit): Returns a page of the entries of an unlocked user.
+        fetch(username, entry_id): Returns the decrypted details of an entry.
+        stop(): Stops the agent.
+    """
+    def __init__(self, socket_path=const.UNLOCK_AGENT_SOCKET, idle_lock=const.UNLOCK_AGENT_IDLE_LOCK):
+        super().__init__(socket_path)
+        self.idle_lock = idle_lock
+        self._last_request = time.monotonic()
+        self._serve_task = None
+        self._methods = {
+            "unlock": self.unlock,
+            "lock": self.lock,
+            "status": self.status,
+            "list": self.list_entries,
+            "fetch": self.fetch,
+            "stop": self.stop,
+        }
+
+    async def serve_forever(self):
+        """
+        Serves the agent until it is stopped.
+        """
+        prepare_socket_folder(self.socket_path.parent)
+        self._serve_task = asyncio.current_task()
+        await super().serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves a connection of the user running the agent, and closes any other.
+        """
+        uid = peer_uid(writer.get_extra_info("socket"))
+        if uid is not None and uid != os.getuid():
+            logger.warning(f"Unlock agent refused a connection from user ID {uid}")
+            writer.close()
+            return
+        await super().handle_connection(reader, writer)
+
+    async def dispatch(self, line):
+        self._last_request = time.monotonic()
+        return await super().dispatch(line)
+
+    def _session(self, username):
+        """
+        Returns the unlocked key of a user.
+        """
+        check_param("username", username, str)
+        unlocked, _ = self._sessions.get(username, (None, 0.0))
+        if unlocked is None or unlocked.expires_at <= time.monotonic():
+            raise RpcError(LOCKED, f"{username} is locked, unlock it first")
+        return unlocked
+
+    def _evict(self, username, reason):
+        unlocked, _ = self._sessions.pop(username)
+        unlocked.close()
+        logger.info(f"Unlock agent zeroized the key of user {unlocked.user_id} ({reason})")
+
+    async def _expire_sessions(self):
+        """
+        Zeroizes the keys whose TTL ended, and every key once the agent is idle, once a second.
+        """
+        while True:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            idle = now - self._last_request > self.idle_lock
+            for username, (unlocked, _) in list(self._sessions.items()):
+                if idle or unlocked.expires_at <= now:
+                    self._evict(username, "idle lock" if idle else "TTL ended")
+
+    async def unlock(self, username, password, ttl=const.UNLOCK_AGENT_KEY_TTL):
+        check_param("username", username, str)
+        check_param("password", password, str)
+        if isinstance(ttl, bool) or not isinstance(ttl, (int, float)):
+            raise RpcError(INVALID_PARAMS, "ttl must be a number of seconds")
+        result = await asyncio.wrap_future(auth_service.authenticate_async(username, password))
+        if result.status != AUTH_OK:
+            raise RpcError(UNAUTHORIZED, "Invalid username or password")
+        ttl = max(1, min(float(ttl), const.UNLOCK_AGENT_MAX_KEY_TTL))
+        if username in self._sessions:
+            self._evict(username, "unlocked again")
+        self._sessions[username] = (UnlockedKey(result.user_id, result.encryption_key, ttl), time.monotonic())
+        logger.info(f"Unlock agent unlocked user {result.user_id} for {ttl:.0f}s")
+        return {"user_id": result.user_id, "expires_in": ttl}
+
+    async def lock(self, username=None):
+        if username is not None:
+            check_param("username", username, str)
+        usernames = list(self._sessions) if username is None else [username] if username in self._sessions else []
+        for locked in usernames:
+            self._evict(locked, "locked by client")
+        return {"locked": usernames}
+
+    async def status(self):
+        now = time.monotonic()
+        return {"unlocked": {username: round(unlocked.expires_at - now)
+                             for username, (unlocked, _) in self._sessions.items()},
+                "idle_lock_in": round(max(0.0, self.idle_lock - (now - self._last_request)))}
+
+    async def list_entries(self, username, after=None, limit=const.ACCOUNT_PAGE_SIZE):
+        return await super().list_entries(username, after, limit)
+
+    async def fetch(self, username, entry_id):
+        unlocked = self._session(username)
+        name, entry_username, encrypted_password, website, iv = await self._owned_entry(unlocked, entry_id)
+        password = await self._crypto_call(unlocked.decrypt, iv, encrypted_password)
+        return {"entry_id": entry_id, "name": name, "username": entry_username, "password": password,
+                "website": website}
+
+    async def stop(self):
+        # Cancelled after this response was sent, serve_forever then zeroizes every key
+        asyncio.get_running_loop().call_later(0.1, self._serve_task.cancel)
+        return True
+
+
+def agent_socket():
+    """
+    Returns the socket path clients connect to, taken from the environment when it is set.
+    """
+    return Path(os.environ.get(const.UNLOCK_AGENT_SOCKET_ENV) or const.UNLOCK_AGENT_SOCKET)
+
+
+def call(method, socket_path=None, **params):
+    """
+    Sends one request to the agent and returns its result.
+
+    Parameters:
+        method (str): The API method.
+        socket_path (Path): The agent socket, defaults to agent_socket().
+        **params: The parameters of the method.
+
+    Raises:
+        RpcError: The error returned by the agent.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(str(socket_path or agent_socket()))
+        request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        response = json.loads(client.makefile("rb").readline())
+    if "error" in response:
+        raise RpcError(response["error"]["code"], response["error"]["message"])
+    return response["result"]
+
+
+def start(socket_path, foreground):
+    """
+    Runs the agent, in the background unless foreground is set, and prints the shell line exporting its
+    socket path.
+    """
+    if foreground:
+        try:
+            asyncio.run(UnlockAgent(socket_path).serve_forever())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+        return
+
+    prepare_socket_folder(socket_path.parent)
+    subprocess.Popen([sys.executable, str(Path(__file__).resolve()), "--socket", str(socket_path),
+                      "start", "--foreground"], start_new_session=True, stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while not socket_path.is_socket():
+        if time.monotonic() > deadline:
+            raise SystemExit("The unlock agent did not start.")
+        time.sleep(0.05)
+    print(f"{const.UNLOCK_AGENT_SOCKET_ENV}={socket_path}; export {const.UNLOCK_AGENT_SOCKET_ENV};")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keeps unlocked vault keys in memory for CLI access.")
+    parser.add_argument("--socket", type=Path, default=None)
+    commands = parser.add_subparsers(dest="command", required=True)
+    start_parser = commands.add_parser("start", help="start the agent")
+    start_parser.add_argument("--foreground", action="store_true")
+    unlock_parser = commands.add_parser("unlock", help="unlock a user, the password is prompted")
+    unlock_parser.add_argument("username")
+    unlock_parser.add_argument("--ttl", type=float, default=const.UNLOCK_AGENT_KEY_TTL)
+    lock_parser = commands.add_parser("lock", help="lock a user, or every user")
+    lock_parser.add_argument("username", nargs="?")
+    commands.add_parser("status", help="show the unlocked users")
+    list_parser = commands.add_parser("list", help="list the entries of an unlocked user")
+    list_parser.add_argument("username")
+    get_parser = commands.add_parser("get", help="show an entry of an unlocked user")
+    get_parser.add_argument("username")
+    get_parser.add_argument("entry_id", type=int)
+    get_parser.add_argument("--field", choices=["name", "username", "password", "website"])
+    commands.add_parser("stop", help="zeroize every key and stop the agent")
+    args = parser.parse_args()
+
+    socket_path = args.socket or agent_socket()
+    if args.command == "start":
+        start(socket_path, args.foreground)
+        return
+
+    try:
+        if args.command == "unlock":
+            password = getpass.getpass(f"Password for {args.username}: ")
+            result = call("unlock", socket_path, username=args.username, password=password, ttl=args.ttl)
+            print(f"{args.username} unlocked for {result['expires_in']:.0f}s")
+        elif args.command == "lock":
+            print(f"locked: {', '.join(call('lock', socket_path, username=args.username)['locked']) or 'nobody'}")
+        elif args.command == "status":
+            print(json.dumps(call("status", socket_path), indent=2))
+        elif args.command == "list":
+            after = None
+            while True:
+                page = call("list", socket_path, username=args.username, after=after)
+                for entry_id, name in page["accounts"]:
+                    print(f"{entry_id}\t{name}")
+                after = page["next"]
+                if after is None:
+                    break
+        elif args.command == "get":
+            entry = call("fetch", socket_path, username=args.username, entry_id=args.entry_id)
+            print(entry[args.field] if args.field else json.dumps(entry, indent=2))
+        elif args.command == "stop":
+            call("stop", socket_path)
+    except (RpcError, OSError) as e:
+        raise SystemExit(f"unlock agent: {e}")
+
+
+if __name__ == "__main__":
+    main()
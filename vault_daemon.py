@@ -0,0 +1,406 @@
+"""
+vault_daemon.py
+
+This module defines the VaultDaemon, a headless service that lets other local tools look up and manage
+credentials without the Tk GUI. It speaks JSON-RPC 2.0 over a Unix domain socket, one JSON object per line.
+
+A client may pipeline up to const.VAULT_DAEMON_MAX_IN_FLIGHT requests on a connection without waiting for
+the responses, which are written as soon as they are ready and matched to their requests by ID. Database
+operations run on the AsyncDataBase facade, reads concurrently on pooled connections and writes serialized
+on one writer thread, and encryption runs on a bounded pool of const.VAULT_DAEMON_WORKERS threads.
+
+Methods of the API, every method but login and stats takes the token returned by login:
+    - login(username, password): Checks the credentials, returns a token and the user ID.
+    - logout(token): Ends the session of the token.
+    - list(token, after, limit): Returns a page of (entry_id, name) pairs ordered by name, after is the
+      "next" value of the previous page.
+    - fetch(token, entry_id): Returns the decrypted details of an entry.
+    - create(token, name, username, password, website): Creates an entry, returns its entry ID.
+    - update(token, entry_id, name, username, password, website): Replaces the details of an entry.
+    - delete(token, entry_id): Deletes an entry.
+    - stats(): Returns the request counters of the daemon.
+
+Classes:
+    - RpcError: An error returned to the client as a JSON-RPC error object.
+    - VaultDaemon: Serves the API on a Unix socket.
+
+Functions:
+    - check_param(name, value, expected): Rejects a param of the wrong type with an invalid params error.
+
+Usage:
+    python vault_daemon.py --socket /path/to/vault.sock
+
+    echo '{"jsonrpc": "2.0", "id": 1, "method": "login", "params": {"username": "alice", "password": "..."}}' \\
+        | socat - UNIX-CONNECT:/path/to/vault.sock
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import constants as const
+from async_database import AsyncDataBase
+from auth import auth_service, AUTH_OK
+from database import is_lock_error
+from session import Session
+
+logging.basicConfig(level=logging.INFO, filename=const.LOGGING_PATH,
+                    format="%(asctime)s -  %(levelname)s - Module: %(module)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# JSON-RPC 2.0 error codes, the codes from -32000 down are defined by the daemon
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+DATABASE_BUSY = -32000
+UNAUTHORIZED = -32001
+NOT_FOUND = -32002
+
+
+class RpcError(Exception):
+    """
+    An error returned to the client as a JSON-RPC error object.
+
+    Attributes:
+        code (int): The JSON-RPC error code.
+        message (str): A short description of the error.
+    """
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def check_param(name, value, expected):
+    """
+    Rejects a param of the wrong type before it reaches the database or the encryption, where it would fail
+    as an internal error. A boolean is not accepted as an integer.
+
+    Parameters:
+        name (str): The name of the param, used in the error message.
+        value: The value sent by the client.
+        expected (type): The type the value must have.
+
+    Raises:
+        RpcError: An INVALID_PARAMS error if the value has another type.
+    """
+    if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+        raise RpcError(INVALID_PARAMS, f"{name} must be of type {expected.__name__}")
+
+
+class VaultDaemon:
+    """
+    Serves the vault API on a Unix socket.
+
+    Attributes:
+        socket_path (Path): Path of the Unix socket.
+        workers (int): Number of threads encrypting and decrypting.
+        max_in_flight (int): Requests a connection may pipeline before the daemon stops reading it.
+        session_timeout (float): Seconds without requests after which a token expires.
+
+    Methods:
+        serve_forever(): Serves the API until the task is cancelled.
+        handle_connection(reader, writer): Reads, dispatches and answers the requests of one connection.
+        dispatch(line): Runs one request line and returns its response.
+        stats(): Returns the request counters.
+        close(): Ends every session and stops the worker threads.
+    """
+    def __init__(self, socket_path=const.VAULT_DAEMON_SOCKET, workers=const.VAULT_DAEMON_WORKERS,
+                 max_in_flight=const.VAULT_DAEMON_MAX_IN_FLIGHT, session_timeout=const.SESSION_IDLE_TIMEOUT):
+        self.socket_path = Path(socket_path)
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.session_timeout = session_timeout
+        self.db = AsyncDataBase()
+        self._crypto = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vault-crypto")
+        # token -> (Session, monotonic time of its last request)
+        self._sessions = {}
+        self._counters = {"connections": 0, "requests": 0, "errors": 0}
+        self._methods = {
+            "login": self.login,
+            "logout": self.logout,
+            "list": self.list_entries,
+            "fetch": self.fetch_entry,
+            "create": self.create_entry,
+            "update": self.update_entry,
+            "delete": self.delete_entry,
+            "stats": self.rpc_stats,
+        }
+
+    async def serve_forever(self):
+        """
+        Creates the socket, readable and writable by the owner only, and serves the API until cancelled.
+        """
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.is_socket():
+            self.socket_path.unlink()
+
+        # The umask keeps the socket private from the moment it is bound
+        previous_umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle_connection, path=str(self.socket_path),
+                                                     limit=const.VAULT_DAEMON_MAX_REQUEST_BYTES)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"Vault daemon listening on {self.socket_path}")
+        expiry = asyncio.create_task(self._expire_sessions())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            expiry.cancel()
+            self.socket_path.unlink(missing_ok=True)
+            await self.close()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Reads the request lines of a connection and answers each one as soon as it is done. Reading pauses
+        while max_in_flight requests of the connection are unanswered.
+        """
+        self._counters["connections"] += 1
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+
+        async def answer(line):
+            try:
+                response = await self.dispatch(line)
+                if response is not None:
+                    writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                in_flight.release()
+
+        try:
+            while True:
+                await in_flight.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The line is longer than the stream limit, the rest of the connection cannot be parsed
+                    writer.write(json.dumps(self._error(None, INVALID_REQUEST, "Request too large")).encode() + b"\n")
+                    break
+                if not line:
+                    break
+                task = asyncio.create_task(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, line):
+        """
+        Runs one JSON-RPC request.
+
+        Parameters:
+            line (bytes): The request, a JSON object.
+
+        Returns:
+            dict: The response, None for a notification (a request without an ID).
+        """
+        self._counters["requests"] += 1
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return self._error(None, PARSE_ERROR, "Parse error")
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return self._error(None, INVALID_REQUEST, "Invalid request")
+
+        request_id = request.get("id")
+        method = self._methods.get(request["method"])
+        params = request.get("params", {})
+        try:
+            if method is None:
+                raise RpcError(METHOD_NOT_FOUND, f"Method not found: {request['method']}")
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "Params must be an object")
+            try:
+                inspect.signature(method).bind(**params)
+            except TypeError as e:
+                raise RpcError(INVALID_PARAMS, str(e)) from e
+            result = await method(**params)
+        except RpcError as e:
+            return self._error(request_id, e.code, e.message) if "id" in request else None
+        except Exception as e:
+            if is_lock_error(e):
+                error = self._error(request_id, DATABASE_BUSY, "The database is busy, try again")
+            else:
+                logger.error(f"Request {request['method']} failed: {e!r}")
+                error = self._error(request_id, INTERNAL_ERROR, "Internal error")
+            # A notification is never answered, not even with an error
+            return error if "id" in request else None
+
+        if "id" not in request:
+            return None
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    def _error(self, request_id, code, message):
+        self._counters["errors"] += 1
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+    def _session(self, token):
+        """
+        Returns the session of a token and marks it as used, a token idle for longer than the session
+        timeout is ended.
+        """
+        check_param("token", token, str)
+        session, last_used = self._sessions.get(token, (None, 0.0))
+        if session is None:
+            raise RpcError(UNAUTHORIZED, "Unknown or expired token")
+        if time.monotonic() - last_used > self.session_timeout:
+            del self._sessions[token]
+            session.close()
+            raise RpcError(UNAUTHORIZED, "Unknown or expired token")
+        self._sessions[token] = (session, time.monotonic())
+        return session
+
+    async def _expire_sessions(self):
+        """
+        Ends the sessions of tokens that were not used for the session timeout, once a second, so tokens
+        that are never used again do not keep their keys.
+        """
+        while True:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            for token, (session, last_used) in list(self._sessions.items()):
+                if now - last_used > self.session_timeout:
+                    del self._sessions[token]
+                    session.close()
+
+    async def _crypto_call(self, function, *args):
+        """
+        Runs encryption work, which may reload an evicted key from the database, on the crypto pool.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._crypto, function, *args)
+
+    async def _owned_entry(self, session, entry_id):
+        """
+        Returns the stored row of an entry of the session's user, the write methods of DataBase are not
+        scoped to a user.
+        """
+        check_param("entry_id", entry_id, int)
+        row = await self.db.storage_fetch_details(entry_id, session.user_id)
+        if row is None:
+            raise RpcError(NOT_FOUND, f"No entry with ID {entry_id}")
+        return row
+
+    @staticmethod
+    def _check_details(name, username, password, website):
+        for param_name, value in (("name", name), ("username", username), ("password", password),
+                                  ("website", website)):
+            check_param(param_name, value, str)
+
+    async def login(self, username, password):
+        check_param("username", username, str)
+        check_param("password", password, str)
+        result = await asyncio.wrap_future(auth_service.authenticate_async(username, password))
+        if result.status != AUTH_OK:
+            # Whether the username or the password was wrong is not revealed
+            raise RpcError(UNAUTHORIZED, "Invalid username or password")
+        token = secrets.token_urlsafe(32)
+        # The token expiry sweep zeroizes the key, so the session runs no idle timer of its own
+        self._sessions[token] = (Session(result.user_id, result.encryption_key, idle_timeout=None), time.monotonic())
+        logger.info(f"Vault daemon session started for user {result.user_id}")
+        return {"token": token, "user_id": result.user_id}
+
+    async def logout(self, token):
+        session = self._session(token)
+        del self._sessions[token]
+        session.close()
+        return True
+
+    async def list_entries(self, token, after=None, limit=const.ACCOUNT_PAGE_SIZE):
+        session = self._session(token)
+        if after is not None:
+            check_param("after", after, list)
+            if len(after) != 2:
+                raise RpcError(INVALID_PARAMS, "after must be the [name, entry_id] next value of a page")
+            check_param("after name", after[0], str)
+            check_param("after entry_id", after[1], int)
+            after = tuple(after)
+        check_param("limit", limit, int)
+        limit = max(1, min(limit, 1000))
+        accounts = await self.db.storage_fetch_account_page(session.user_id, after, limit)
+        next_after = [accounts[-1][1], accounts[-1][0]] if len(accounts) == limit else None
+        return {"accounts": [list(account) for account in accounts], "next": next_after}
+
+    async def fetch_entry(self, token, entry_id):
+        session = self._session(token)
+        name, username, encrypted_password, website, iv = await self._owned_entry(session, entry_id)
+        password = await self._crypto_call(session.decrypt, iv, encrypted_password)
+        return {"entry_id": entry_id, "name": name, "username": username, "password": password,
+                "website": website}
+
+    async def create_entry(self, token, name, username, password, website=""):
+        session = self._session(token)
+        self._check_details(name, username, password, website)
+        iv, encrypted_password = await self._crypto_call(session.encrypt, password)
+        entry_id = await self.db.generator_save_user_data(
+            (name, username, encrypted_password, website, iv, session.user_id))
+        return {"entry_id": entry_id}
+
+    async def update_entry(self, token, entry_id, name, username, password, website=""):
+        session = self._session(token)
+        self._check_details(name, username, password, website)
+        await self._owned_entry(session, entry_id)
+        iv, encrypted_password = await self._crypto_call(session.encrypt, password)
+        await self.db.storage_update_user_data((name, username, encrypted_password, website, iv, entry_id))
+        return True
+
+    async def delete_entry(self, token, entry_id):
+        session = self._session(token)
+        await self._owned_entry(session, entry_id)
+        await self.db.storage_delete_details(entry_id)
+        return True
+
+    async def rpc_stats(self):
+        return self.stats()
+
+    def stats(self):
+        """
+        Returns the request counters.
+
+        Returns:
+            dict: Connections accepted, requests and errors answered, open sessions and database operations.
+        """
+        return {**self._counters, "sessions": len(self._sessions), "database": self.db.stats()}
+
+    async def close(self):
+        """
+        Ends every session, zeroizing its key, and stops the worker threads.
+        """
+        for session, _ in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+        await self.db.close()
+        self._crypto.shutdown(wait=False)
+        logger.info(f"Vault daemon stopped with stats: {self.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves the vault API on a Unix socket.")
+    parser.add_argument("--socket", type=Path, default=const.VAULT_DAEMON_SOCKET)
+    parser.add_argument("--workers", type=int, default=const.VAULT_DAEMON_WORKERS)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(VaultDaemon(args.socket, args.workers).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+write_behind.py
+
+This module defines the WriteBehindQueue, an optional buffer between the Storage frame and the database for
+entry updates and deletes. Without it every save is its own transaction and its own fsync. With it, saves are
+kept in memory, repeated saves of the same entry are merged into the latest one, and the buffer is written in
+a single transaction when:
+
+    - const.WRITE_BEHIND_FLUSH_INTERVAL seconds have passed since the oldest buffered write,
+    - const.WRITE_BEHIND_MAX_PENDING entries are buffered,
+    - the user logs out, the window is closed or the process exits,
+    - a read needs the current data (flush() is called before Storage reads the database).
+
+Durability:
+    Write-behind is off unless const.WRITE_BEHIND_ENABLED is True, every save is then written through at once.
+    When it is on, a save that the GUI already shows as done exists only in memory until the next flush.
+    A crash, a power loss or a killed process loses at most the writes of the last
+    const.WRITE_BEHIND_FLUSH_INTERVAL seconds, a clean exit or log out loses nothing. Once flushed, the
+    durability of the transaction is that of the SQLite profile's `synchronous` setting.
+
+    New entries are not buffered, their entry ID is assigned by the insert. A buffered delete is final, an
+    update of the entry buffered after it is dropped instead of bringing the entry back.
+
+Classes:
+    - WriteBehindQueue: Buffers, merges and flushes entry updates and deletes.
+
+Module Variables:
+    - write_behind: The queue shared by the GUI frames.
+"""
+import atexit
+import logging
+import threading
+import time
+import constants as const
+from database import DataBase
+
+logging.basicConfig(level=logging.INFO, filename=const.LOGGING_PATH,
+                    format="%(asctime)s -  %(levelname)s - Module: %(module)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Values of the buffered operations
+UPDATE = "update"
+DELETE = "delete"
+
+
+class WriteBehindQueue:
+    """
+    Buffers entry updates and deletes in memory and writes them in grouped transactions.
+
+    Attributes:
+        enabled (bool): False writes every operation through immediately.
+        flush_interval (float): Maximum seconds a buffered write waits, the maximum data loss window.
+        max_pending (int): Number of buffered entries that triggers a flush.
+
+    Methods:
+        update(data): Buffers the update of an entry, merging it with a buffered write of the same entry.
+        delete(entry_id): Buffers the delete of an entry, replacing a buffered update of it.
+            A later update of a deleted entry is dropped.
+        flush(): Writes every buffered operation in one transaction.
+        close(): Flushes and stops the flush timer.
+        stats(): Returns the queue counters.
+    """
+    def __init__(self, enabled=const.WRITE_BEHIND_ENABLED, flush_interval=const.WRITE_BEHIND_FLUSH_INTERVAL,
+                 max_pending=const.WRITE_BEHIND_MAX_PENDING):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.Lock()
+        # Held for the whole flush, so two flushes never write out of order
+        self._flush_lock = threading.Lock()
+        self._counters = {"buffered": 0, "merged": 0, "flushes": 0, "flushed_rows": 0, "failed_flushes": 0}
+
+    def update(self, data):
+        """
+        Buffers the update of an entry.
+
+        Parameters:
+            data (tuple): The arguments of DataBase.storage_update_user_data, the entry ID is the last item.
+        """
+        self._write(data[-1], UPDATE, data)
+
+    def delete(self, entry_id):
+        """
+        Buffers the delete of an entry.
+
+        Parameters:
+            entry_id (int): ID of the entry to delete.
+        """
+        self._write(entry_id, DELETE, None)
+
+    def _write(self, entry_id, operation, data):
+        """
+        Buffers an operation, or writes it through when write-behind is disabled.
+        """
+        if not self.enabled:
+            with DataBase() as db:
+                self._apply(db, operation, entry_id, data)
+            return
+
+        with self._lock:
+            buffered = self._pending.get(entry_id)
+            if buffered is not None:
+                self._counters["merged"] += 1
+                if buffered[0] == DELETE:
+                    return
+            self._pending[entry_id] = (operation, data)
+            self._counters["buffered"] += 1
+            full = len(self._pending) >= self.max_pending
+            if not full and self._timer is None:
+                # The timer starts with the oldest buffered write, which bounds how long any write waits
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    @staticmethod
+    def _apply(db, operation, entry_id, data):
+        if operation == UPDATE:
+            db.storage_update_user_data(data)
+        else:
+            db.storage_delete_details(entry_id)
+
+    def flush(self):
+        """
+        Writes every buffered operation in one transaction, a failing operation rolls back the whole batch.
+        A failed flush puts its operations back into the
+        buffer, unless a newer write of the same entry was buffered meanwhile, and is retried by the timer.
+        A delete of the failed batch always stays, an update buffered after it is dropped.
+
+        Returns:
+            int: The number of entries written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                with DataBase() as db, db.transaction(immediate=True):
+                    for entry_id, (operation, data) in batch.items():
+                        self._apply(db, operation, entry_id, data)
+            except Exception as e:
+                logger.error(f"Write-behind flush of {len(batch)} entries failed, retrying later: {e}")
+                with self._lock:
+                    self._counters["failed_flushes"] += 1
+                    self._pending = {**batch, **self._pending}
+                    for entry_id, (operation, data) in batch.items():
+                        if operation == DELETE:
+                            self._pending[entry_id] = (operation, data)
+                    if self._timer is None:
+                        self._timer = threading.Timer(self.flush_interval, self.flush)
+                        self._timer.daemon = True
+                        self._timer.start()
+                return 0
+
+            with self._lock:
+                self._counters["flushes"] += 1
+                self._counters["flushed_rows"] += len(batch)
+            logger.info(f"Write-behind flushed {len(batch)} entries in {(time.perf_counter() - start) * 1000:.1f}ms")
+            return len(batch)
+
+    def close(self):
+        """
+        Flushes the buffered operations and stops the flush timer, used when the application exits.
+        """
+        self.flush()
+        logger.info(f"Write-behind queue closed with stats: {self.stats()}")
+
+    def stats(self):
+        """
+        Returns the queue counters.
+
+        Returns:
+            dict: Operations buffered and merged, flushes done and failed, rows flushed and rows still pending.
+        """
+        with self._lock:
+            return {**self._counters, "pending": len(self._pending)}
+
+
+write_behind = WriteBehindQueue()
+atexit.register(write_behind.close)